@@ -0,0 +1,159 @@
+# Name:    bench_nansat.py
+# Purpose: Benchmarks of the core Nansat pipeline
+# Licence:
+# This file is part of NANSAT.
+# NANSAT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+# http://www.gnu.org/licenses/gpl-3.0.html
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+"""Benchmarks of the core Nansat pipeline (run with airspeed velocity: `asv run`)
+
+Methods with prefix time_ measure run time, methods with prefix peakmem_
+measure peak memory (resident set size) of the process.
+
+"""
+from __future__ import absolute_import, division
+
+import os
+import shutil
+import tempfile
+import datetime
+
+from .synthetic import (SIZES, KINDS, get_scene_filename, get_geolocation_scene,
+                        get_lonlat_domain)
+
+from nansat import Nansat
+
+
+class Base(object):
+    """Common setup: synthetic scene (created at first use) and directory for output"""
+    timeout = 600
+    params = [KINDS, SIZES]
+    param_names = ['scene', 'size']
+
+    def setup(self, kind, size):
+        self.filename = get_scene_filename(kind, size)
+        self.n = Nansat(self.filename, mapper='generic', log_level=40)
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def teardown(self, *args):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+class InPlace(Base):
+    """Base for operations which modify self.n: one call per sample (setup creates a
+    fresh Nansat before each sample), statistics from up to 10 samples in 60 s"""
+    number = 1
+    repeat = (1, 10, 60.0)
+
+
+class Open(Base):
+    """Nansat() with generic mapper and with search for mapper"""
+    params = [KINDS, SIZES, ['generic', '']]
+    param_names = ['scene', 'size', 'mapper']
+
+    def setup(self, kind, size, mapper):
+        Base.setup(self, kind, size)
+
+    def time_open(self, kind, size, mapper):
+        Nansat(self.filename, mapper=mapper, log_level=40)
+
+
+class GetItem(Base):
+    def time_getitem(self, kind, size):
+        self.n[1]
+
+    def peakmem_getitem(self, kind, size):
+        self.n[1]
+
+
+class Reproject(InPlace):
+    """Reprojection onto lon/lat Domain from GeoTransform, GCPs (with and without TPS)
+    and geolocation arrays"""
+    params = [['stere', 'gcps', 'gcps_tps', 'geolocation'], SIZES]
+
+    def setup(self, source, size):
+        self.tmp_dir = tempfile.mkdtemp()
+        if source == 'geolocation':
+            self.n = get_geolocation_scene(size)
+        else:
+            self.n = Nansat(get_scene_filename(source.split('_')[0], size), mapper='generic',
+                            log_level=40)
+        self.tps = source.endswith('tps')
+        self.dst_domain = get_lonlat_domain(self.n, size)
+
+    def time_reproject(self, source, size):
+        self.n.reproject(self.dst_domain, tps=self.tps)
+        self.n[1]
+
+    def peakmem_reproject(self, source, size):
+        self.n.reproject(self.dst_domain, tps=self.tps)
+        self.n[1]
+
+
+class Resize(InPlace):
+    def time_resize(self, kind, size):
+        self.n.resize(0.5, resample_alg=1)
+        self.n[1]
+
+    def peakmem_resize(self, kind, size):
+        self.n.resize(0.5, resample_alg=1)
+        self.n[1]
+
+
+class Crop(InPlace):
+    def time_crop(self, kind, size):
+        rows, cols = self.n.shape()
+        self.n.crop(cols // 4, rows // 4, cols // 2, rows // 2)
+        self.n[1]
+
+
+class Transect(Base):
+    def setup(self, kind, size):
+        Base.setup(self, kind, size)
+        lon, lat = self.n.get_corners()
+        self.points = [[lon[0], lon[3]], [lat[0], lat[3]]]
+
+    def time_get_transect(self, kind, size):
+        self.n.get_transect(self.points, [1])
+
+
+class Export(Base):
+    def time_export(self, kind, size):
+        self.n.export(os.path.join(self.tmp_dir, 'export.nc'))
+
+    def peakmem_export(self, kind, size):
+        self.n.export(os.path.join(self.tmp_dir, 'export.nc'))
+
+
+class Export2Thredds(Base):
+    """export2thredds requires projected data: scenes are reprojected first"""
+    def setup(self, kind, size):
+        Base.setup(self, kind, size)
+        self.n.reproject(get_lonlat_domain(self.n, size))
+        self.bands = {self.n.get_metadata('name', 1): {'type': '>i2'}}
+
+    def time_export2thredds(self, kind, size):
+        self.n.export2thredds(os.path.join(self.tmp_dir, 'thredds.nc'), self.bands,
+                              time=datetime.datetime(2020, 1, 1))
+
+    def peakmem_export2thredds(self, kind, size):
+        self.n.export2thredds(os.path.join(self.tmp_dir, 'thredds.nc'), self.bands,
+                              time=datetime.datetime(2020, 1, 1))
+
+
+class WriteFigure(Base):
+    params = [KINDS, SIZES, [None, 'hist']]
+    param_names = ['scene', 'size', 'clim']
+
+    def setup(self, kind, size, clim):
+        Base.setup(self, kind, size)
+
+    def time_write_figure(self, kind, size, clim):
+        self.n.write_figure(os.path.join(self.tmp_dir, 'figure.png'), 1, clim=clim)
+
+    def peakmem_write_figure(self, kind, size, clim):
+        self.n.write_figure(os.path.join(self.tmp_dir, 'figure.png'), 1, clim=clim)
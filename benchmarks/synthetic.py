@@ -0,0 +1,107 @@
+# Name:    synthetic.py
+# Purpose: Generation of synthetic scenes for benchmarks
+# Licence:
+# This file is part of NANSAT.
+# NANSAT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+# http://www.gnu.org/licenses/gpl-3.0.html
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+"""Synthetic scenes of configurable size generated from nansat/tests/data
+
+Scenes are upsampled copies of the test files, so the benchmarks run offline.
+They are written once into NANSAT_BENCHMARK_DIR (system temporary directory by
+default) and reused by all benchmarks. Sizes (largest dimension in pixels) are
+configured with NANSAT_BENCHMARK_SIZES (comma separated, default '500,2000').
+
+"""
+from __future__ import absolute_import, division
+
+import os
+import tempfile
+
+import numpy as np
+
+from nansat import Domain, Nansat
+from nansat.tests import nansat_test_data as ntd
+
+SIZES = [int(size) for size in os.getenv('NANSAT_BENCHMARK_SIZES', '500,2000').split(',')]
+DATA_DIR = os.getenv('NANSAT_BENCHMARK_DIR',
+                     os.path.join(tempfile.gettempdir(), 'nansat_benchmarks'))
+
+# source test file, output driver and extension for each kind of scene
+SOURCES = {
+    'gcps': ('gcps.tif', 'GTiff', 'tif'),  # georeference with GCPs
+    'stere': ('stere.tif', 'GTiff', 'tif'),  # georeference with GeoTransform
+    'netcdf': ('arctic.nc', 'netCDF', 'nc'),  # netCDF file
+}
+KINDS = sorted(SOURCES)
+
+
+def get_scene_filename(kind, size):
+    """Get name of the file with synthetic scene (create if it does not exist)
+
+    Parameters
+    -----------
+    kind : str
+        'gcps', 'stere' or 'netcdf' (see SOURCES)
+    size : int
+        largest dimension of the scene (pixels)
+
+    Returns
+    --------
+    filename : str
+
+    """
+    source, driver, extension = SOURCES[kind]
+    filename = os.path.join(DATA_DIR, '%s_%d.%s' % (kind, size, extension))
+    if os.path.exists(filename):
+        return filename
+    if not os.path.exists(DATA_DIR):
+        os.makedirs(DATA_DIR)
+
+    n = Nansat(os.path.join(ntd.test_data_path, source), mapper='generic', log_level=40)
+    n.resize(size / float(max(n.shape())), resample_alg=1)
+    tmp_filename = '%s.%d.tmp.%s' % (filename, os.getpid(), extension)
+    n.export(tmp_filename, driver=driver)
+    os.rename(tmp_filename, filename)
+    return filename
+
+
+def get_geolocation_scene(size):
+    """Get synthetic scene with georeference given by geolocation arrays only
+
+    Parameters
+    -----------
+    size : int
+        largest dimension of the scene (pixels)
+
+    Returns
+    --------
+    n : Nansat
+
+    """
+    n = Nansat(get_scene_filename('stere', size), mapper='generic', log_level=40)
+    lon, lat = n.get_geolocation_grids()
+    d = Domain.from_lonlat(lon, lat, add_gcps=False)
+    return Nansat.from_domain(d, n[1].astype(np.float32), {'name': 'L_645'})
+
+
+def get_lonlat_domain(n, size):
+    """Get regular lon/lat Domain which covers the scene"""
+    min_lon, max_lon, min_lat, max_lat = n.get_min_max_lon_lat()
+    return Domain(4326, '-te %f %f %f %f -ts %d %d' % (min_lon, min_lat, max_lon, max_lat,
+                                                       size, size))
+
+
+def create_all():
+    """Create all synthetic scenes in advance"""
+    for kind in KINDS:
+        for size in SIZES:
+            get_scene_filename(kind, size)
+
+
+if __name__ == '__main__':
+    create_all()
@@ -37,7 +37,8 @@ from nansat.nsr import NSR
 from nansat.domain import Domain
 from nansat.nansat import Nansat
 from nansat.figure import Figure
+from nansat.profiler import Profiler
 
-__all__ = ['NSR', 'Domain', 'Nansat', 'Figure']
+__all__ = ['NSR', 'Domain', 'Nansat', 'Figure', 'Profiler']
 
 os.environ['LOG_LEVEL'] = '30'
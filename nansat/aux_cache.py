@@ -0,0 +1,191 @@
+# Name:    aux_cache.py
+# Purpose: Container of AuxCache class
+# Licence:
+# This file is part of NANSAT.
+# NANSAT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+# http://www.gnu.org/licenses/gpl-3.0.html
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+from __future__ import absolute_import
+
+import os
+import sys
+import json
+import hashlib
+import tempfile
+
+import numpy as np
+
+from nansat.utils import add_logger, gdal, numpy_to_gdal_type, remove_keys
+
+
+class AuxCache(object):
+    """On-disk cache of static auxiliary layers reprojected onto a Domain
+
+    Each entry is a flat binary file with all bands of the reprojected layer and
+    a JSON file with shape, data types and band metadata. Entries are keyed on the
+    georeference of the destination Domain, name of the layer, source file
+    (name and modification time), resampling and other reprojection parameters.
+    The binary file is used directly as a source of VRTRawRasterBand, so the cached
+    layer is read from disk only when the band is accessed.
+
+    Parameters
+    -----------
+    cache_dir : str or None
+        directory with cached layers. If None, environment variable NANSAT_AUX_CACHE
+        is used. If it is not set, caching is switched off.
+
+    """
+    ENV_VAR = 'NANSAT_AUX_CACHE'
+    IGNORED_METADATA = ['SourceFilename', 'SourceBand', 'dataType']
+
+    def __init__(self, cache_dir=None):
+        if cache_dir is None:
+            cache_dir = os.getenv(self.ENV_VAR)
+        self.cache_dir = cache_dir
+        self.logger = add_logger('Nansat')
+
+    @property
+    def enabled(self):
+        """Is caching switched on?"""
+        return self.cache_dir is not None
+
+    def get_key(self, dst_domain, layer, src_filename, **kwargs):
+        """Get key of the cache entry
+
+        Parameters
+        -----------
+        dst_domain : Domain
+            destination Domain
+        layer : str
+            name of the auxiliary layer (e.g. 'watermask')
+        src_filename : str
+            name of the source file
+        **kwargs : dict
+            reprojection parameters (resample_alg, tps, etc.)
+
+        Returns
+        --------
+        key : str
+            name of the layer and SHA1 digest of all parameters
+
+        """
+        try:
+            src_mtime = os.path.getmtime(src_filename)
+        except OSError:
+            src_mtime = None
+        parameters = (dst_domain._get_georeference_key(), layer,
+                      os.path.abspath(src_filename), src_mtime, sorted(kwargs.items()))
+        return '%s_%s' % (layer, hashlib.sha1(repr(parameters).encode()).hexdigest())
+
+    def _get_filenames(self, key):
+        """Get names of the binary and JSON files of the cache entry"""
+        filename = os.path.join(self.cache_dir, key)
+        return filename + '.raw', filename + '.json'
+
+    def get(self, key):
+        """Get band sources and metadata of a cached layer
+
+        Parameters
+        -----------
+        key : str
+            key of the cache entry (see AuxCache.get_key)
+
+        Returns
+        --------
+        metadata_dict : list of dict or None
+            'src' and 'dst' parameters for VRT.create_bands for each band,
+            None if the layer is not in the cache
+
+        """
+        raw_filename, json_filename = self._get_filenames(key)
+        try:
+            with open(json_filename) as json_file:
+                entry = json.load(json_file)
+        except (IOError, ValueError):
+            return None
+
+        try:
+            y_size, x_size = entry['shape']
+            dtypes = [np.dtype(dtype) for dtype in entry['dtypes']]
+            bands = entry['bands']
+        except (KeyError, TypeError, ValueError):
+            self.logger.warning('Cached layer %s is corrupted' % json_filename)
+            return None
+        image_offsets = np.cumsum([0] + [x_size * y_size * dtype.itemsize for dtype in dtypes])
+        if (len(bands) != len(dtypes) or not os.path.exists(raw_filename) or
+                os.path.getsize(raw_filename) != image_offsets[-1]):
+            self.logger.warning('Cached layer %s is corrupted' % raw_filename)
+            return None
+
+        byte_order = {'little': 'LSB', 'big': 'MSB'}[sys.byteorder]
+        return [{'src': {'SourceFilename': raw_filename,
+                         'SourceBand': 0,
+                         'SourceType': 'RawRasterBand',
+                         'DataType': gdal.GetDataTypeByName(numpy_to_gdal_type[dtype.name]),
+                         'ImageOffset': int(image_offset),
+                         'PixelOffset': dtype.itemsize,
+                         'LineOffset': dtype.itemsize * x_size,
+                         'ByteOrder': byte_order,
+                         'xSize': x_size,
+                         'ySize': y_size},
+                 'dst': parameters}
+                for parameters, dtype, image_offset in zip(bands, dtypes,
+                                                           image_offsets)]
+
+    def put(self, key, n, raw=False):
+        """Write all bands of a reprojected layer into the cache
+
+        Files are first written under temporary names and then renamed, so
+        concurrent processes never read incomplete entries.
+
+        Parameters
+        -----------
+        key : str
+            key of the cache entry (see AuxCache.get_key)
+        n : Nansat
+            reprojected layer
+        raw : bool
+            if True, data of GDAL bands is stored as is, with the data type of each band.
+            If False, output of Nansat.__getitem__ is stored with the data type of the
+            first band.
+
+        """
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        raw_filename, json_filename = self._get_filenames(key)
+        bands = []
+        dtypes = []
+        raw_fd, raw_tmp_filename = tempfile.mkstemp(dir=self.cache_dir, suffix='.raw')
+        tmp_filenames = [raw_tmp_filename]
+        try:
+            with os.fdopen(raw_fd, 'wb') as raw_file:
+                for band_id in range(1, n.vrt.dataset.RasterCount + 1):
+                    if raw:
+                        array = n.vrt.dataset.GetRasterBand(band_id).ReadAsArray()
+                    else:
+                        array = n[band_id]
+                    if raw or len(dtypes) == 0:
+                        dtypes.append(array.dtype)
+                    else:
+                        dtypes.append(dtypes[0])
+                    np.ascontiguousarray(array, dtype=dtypes[-1]).tofile(raw_file)
+                    bands.append(remove_keys(n.get_metadata(band_id=band_id),
+                                             self.IGNORED_METADATA))
+
+            json_fd, json_tmp_filename = tempfile.mkstemp(dir=self.cache_dir, suffix='.json')
+            tmp_filenames.append(json_tmp_filename)
+            with os.fdopen(json_fd, 'w') as json_file:
+                json.dump({'shape': n.shape(), 'dtypes': [dtype.name for dtype in dtypes],
+                           'bands': bands}, json_file)
+
+            os.rename(raw_tmp_filename, raw_filename)
+            os.rename(json_tmp_filename, json_filename)
+        finally:
+            # remove temporary files if writing failed
+            for tmp_filename in tmp_filenames:
+                if os.path.exists(tmp_filename):
+                    os.remove(tmp_filename)
@@ -0,0 +1,323 @@
+# Name:    catalog.py
+# Purpose: Container of Catalog class
+# Licence:
+# This file is part of NANSAT.
+# NANSAT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+# http://www.gnu.org/licenses/gpl-3.0.html
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+from __future__ import absolute_import, print_function
+
+import os
+import sqlite3
+import datetime
+from multiprocessing import Pool
+
+from nansat.nansat import Nansat
+from nansat.utils import add_logger, ogr, parse_time
+
+try:
+    UTC = datetime.timezone.utc
+except AttributeError:
+    from dateutil.tz import tzutc
+    UTC = tzutc()
+
+
+def _format_time(time_value):
+    """Convert datetime or string into ISO string in UTC without timezone (for comparison)"""
+    if not isinstance(time_value, datetime.datetime):
+        time_value = parse_time(time_value)
+    if time_value.tzinfo is not None:
+        time_value = time_value.astimezone(UTC).replace(tzinfo=None)
+    return time_value.isoformat()
+
+
+def _get_footprint(args):
+    """Open file with Nansat and get its footprint (used by Catalog.add in subprocesses)
+
+    Parameters
+    -----------
+    args : tuple
+        filename and dictionary with kwargs for Nansat
+
+    Returns
+    --------
+    footprint : tuple or None
+        (filename, mtime, mapper, time_coverage_start, time_coverage_end, border WKT)
+        None if the file cannot be opened
+
+    """
+    filename, kwargs = args
+    logger = add_logger('Nansat')
+    try:
+        mtime = os.path.getmtime(filename)
+        n = Nansat(filename, **kwargs)
+        border = n.get_border_wkt()
+    except Exception as e:
+        logger.warning('Cannot get footprint of %s: %s' % (filename, e))
+        return None
+
+    times = []
+    for key in ['time_coverage_start', 'time_coverage_end']:
+        try:
+            times.append(_format_time(n.get_metadata(key)))
+        except (ValueError, TypeError):
+            times.append(None)
+
+    # files with one time stamp only
+    if times[1] is None:
+        times[1] = times[0]
+
+    return (filename, mtime, n.mapper) + tuple(times) + (border,)
+
+
+class Catalog(object):
+    """Catalog of footprints of files stored in a SQLite database
+
+    For each added file the border WKT, time coverage and name of the mapper are
+    extracted once and stored together with the modification time of the file.
+    Bounding boxes of the borders are indexed with an R-tree (if the SQLite
+    R*Tree module is available), so searching for files which intersect or
+    contain a Domain does not require opening any file.
+
+    Parameters
+    -----------
+    filename : str
+        name of the SQLite database file. By default the catalog is kept in memory.
+
+    Examples
+    --------
+        >>> c = Catalog('/data/catalog.sqlite')
+        >>> c.add(glob.glob('/data/*.nc'), processes=8)
+        >>> filenames = c.search(dst_domain, start_time='2020-01-01', end_time='2020-01-31')
+
+    """
+    PREDICATES = {
+        'intersects': 'Intersects',
+        'contains': 'Contains',
+        'within': 'Within',
+        'overlaps': 'Overlaps',
+    }
+
+    def __init__(self, filename=':memory:'):
+        self.filename = filename
+        self.logger = add_logger('Nansat')
+        self.connection = sqlite3.connect(filename)
+        self.connection.execute('''CREATE TABLE IF NOT EXISTS footprints (
+                                   id INTEGER PRIMARY KEY,
+                                   filename TEXT UNIQUE,
+                                   mtime REAL,
+                                   mapper TEXT,
+                                   time_coverage_start TEXT,
+                                   time_coverage_end TEXT,
+                                   border TEXT,
+                                   min_lon REAL, max_lon REAL,
+                                   min_lat REAL, max_lat REAL)''')
+        try:
+            self.connection.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS footprints_rtree
+                                       USING rtree(id, min_lon, max_lon, min_lat, max_lat)''')
+        except sqlite3.OperationalError:
+            self.logger.info('SQLite R*Tree module is not available. Bounding boxes are not indexed')
+            self.has_rtree = False
+        else:
+            self.has_rtree = True
+        self.connection.commit()
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM footprints').fetchone()[0]
+
+    def __contains__(self, filename):
+        return self._get_mtime(filename) is not None
+
+    def close(self):
+        """Close connection to the database"""
+        self.connection.close()
+
+    def _get_mtime(self, filename):
+        """Get modification time of the file stored in the catalog (or None)"""
+        row = self.connection.execute('SELECT mtime FROM footprints WHERE filename=?',
+                                      (filename,)).fetchone()
+        if row is None:
+            return None
+        return row[0]
+
+    def add(self, filenames, processes=1, **kwargs):
+        """Add footprints of files to the catalog
+
+        Files which are already in the catalog and were not modified since are skipped.
+        Footprints of modified files are replaced.
+
+        Parameters
+        -----------
+        filenames : str or list of str
+            names of files to add
+        processes : int
+            number of processes for opening of files
+        **kwargs : additional arguments for Nansat (e.g. mapper)
+
+        Returns
+        --------
+        added : list of str
+            names of the added (or updated) files
+
+        """
+        if not isinstance(filenames, (list, tuple)):
+            filenames = [filenames]
+        filenames = [filename for filename in filenames if self._is_modified(filename)]
+
+        if processes > 1 and len(filenames) > 1:
+            pool = Pool(processes)
+            try:
+                footprints = pool.map(_get_footprint, [(filename, kwargs)
+                                                       for filename in filenames])
+            finally:
+                pool.close()
+        else:
+            footprints = [_get_footprint((filename, kwargs)) for filename in filenames]
+
+        added = []
+        for footprint in footprints:
+            if footprint is not None:
+                self._insert(*footprint)
+                added.append(footprint[0])
+        self.connection.commit()
+
+        return added
+
+    def _is_modified(self, filename):
+        """Check if file is not in the catalog or was modified since it was added
+        (False if the file cannot be accessed)"""
+        try:
+            mtime = os.path.getmtime(filename)
+        except OSError as e:
+            self.logger.warning('Cannot get footprint of %s: %s' % (filename, e))
+            return False
+        return self._get_mtime(filename) != mtime
+
+    def _insert(self, filename, mtime, mapper, time_coverage_start, time_coverage_end, border):
+        """Insert (or replace) footprint of a file into the tables"""
+        self.remove(filename, commit=False)
+        min_lon, max_lon, min_lat, max_lat = ogr.CreateGeometryFromWkt(border).GetEnvelope()
+        cursor = self.connection.execute('''INSERT INTO footprints
+            (filename, mtime, mapper, time_coverage_start, time_coverage_end, border,
+             min_lon, max_lon, min_lat, max_lat) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+            (filename, mtime, mapper, time_coverage_start, time_coverage_end, border,
+             min_lon, max_lon, min_lat, max_lat))
+        if self.has_rtree:
+            self.connection.execute('INSERT INTO footprints_rtree VALUES (?, ?, ?, ?, ?)',
+                                    (cursor.lastrowid, min_lon, max_lon, min_lat, max_lat))
+
+    def remove(self, filename, commit=True):
+        """Remove footprint of a file from the catalog
+
+        Parameters
+        -----------
+        filename : str
+            name of the file
+        commit : bool
+            commit changes to the database
+
+        """
+        row = self.connection.execute('SELECT id FROM footprints WHERE filename=?',
+                                      (filename,)).fetchone()
+        if row is not None:
+            self.connection.execute('DELETE FROM footprints WHERE id=?', row)
+            if self.has_rtree:
+                self.connection.execute('DELETE FROM footprints_rtree WHERE id=?', row)
+        if commit:
+            self.connection.commit()
+
+    def get_footprint(self, filename):
+        """Get stored footprint of a file
+
+        Parameters
+        -----------
+        filename : str
+            name of the file
+
+        Returns
+        --------
+        footprint : dict
+            with keys filename, mtime, mapper, time_coverage_start, time_coverage_end, border
+
+        Raises
+        -------
+        KeyError : if the file is not in the catalog
+
+        """
+        cursor = self.connection.execute('''SELECT filename, mtime, mapper, time_coverage_start,
+            time_coverage_end, border FROM footprints WHERE filename=?''', (filename,))
+        row = cursor.fetchone()
+        if row is None:
+            raise KeyError('%s is not in the catalog' % filename)
+        return dict(zip([column[0] for column in cursor.description], row))
+
+    def search(self, domain=None, start_time=None, end_time=None, predicate='intersects'):
+        """Find files with footprints matching given Domain and time window
+
+        Candidates are selected by bounding boxes (using the R-tree index) and
+        time coverage in the database. Then the predicate is tested on the
+        border geometries.
+
+        Parameters
+        -----------
+        domain : Domain or None
+            Domain to search for. If None, only time is used.
+        start_time, end_time : datetime or str or None
+            time window. Files with time coverage overlapping the window are found.
+            Files without time coverage are not found if time window is given.
+        predicate : str
+            'intersects' : footprint intersects the domain
+            'contains' : footprint fully covers the domain
+            'within' : footprint is fully inside the domain
+            'overlaps' : footprint overlaps the domain
+
+        Returns
+        --------
+        filenames : list of str
+            names of found files sorted by start time
+
+        """
+        if predicate not in self.PREDICATES:
+            raise ValueError('Predicate must be one of %s' % ', '.join(sorted(self.PREDICATES)))
+
+        query = 'SELECT footprints.filename, footprints.border FROM footprints'
+        conditions = []
+        parameters = []
+
+        if domain is not None:
+            domain_geometry = domain.get_border_geometry()
+            min_lon, max_lon, min_lat, max_lat = domain_geometry.GetEnvelope()
+            if self.has_rtree:
+                query += ' JOIN footprints_rtree ON footprints.id = footprints_rtree.id'
+                table = 'footprints_rtree'
+            else:
+                table = 'footprints'
+            conditions += ['%s.max_lon >= ?' % table, '%s.min_lon <= ?' % table,
+                           '%s.max_lat >= ?' % table, '%s.min_lat <= ?' % table]
+            parameters += [min_lon, max_lon, min_lat, max_lat]
+
+        if start_time is not None:
+            conditions.append('footprints.time_coverage_end >= ?')
+            parameters.append(_format_time(start_time))
+
+        if end_time is not None:
+            conditions.append('footprints.time_coverage_start <= ?')
+            parameters.append(_format_time(end_time))
+
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY footprints.time_coverage_start, footprints.filename'
+
+        filenames = []
+        for filename, border in self.connection.execute(query, parameters):
+            if domain is not None:
+                geometry = ogr.CreateGeometryFromWkt(border)
+                if not getattr(geometry, self.PREDICATES[predicate])(domain_geometry):
+                    continue
+            filenames.append(filename)
+
+        return filenames
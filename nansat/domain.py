@@ -22,9 +22,10 @@ from xml.etree.ElementTree import ElementTree
 
 import numpy as np
 
-from nansat.utils import add_logger, initial_bearing, haversine, gdal, osr, ogr
+from nansat.utils import add_logger, haversine, gdal, osr, ogr
 from nansat.nsr import NSR
 from nansat.vrt import VRT
+from nansat.lut import AzimuthLUT
 from nansat.exceptions import NansatProjectionError
 from nansat.warnings import NansatFutureWarning
 
@@ -129,10 +130,22 @@ class Domain(object):
     {content}
     </kml>'''
 
+    # number of tie points for computing azimuth (see Domain.azimuth_y)
+    AZIMUTH_TIE_POINTS = 50
+
     # instance attributes
     vrt = None
     logger = None
     name = None
+    _border_geometry_cache = None
+
+    # OGR methods for spatial predicates in Domain.check_domains
+    PREDICATES = {
+        'intersects': 'Intersects',
+        'overlaps': 'Overlaps',
+        'contains': 'Contains',
+        'within': 'Within',
+    }
 
     def __init__(self, srs=None, ext=None, ds=None, **kwargs):
         """Create Domain from GDALDataset or string options or lat/lon grids"""
@@ -602,13 +615,47 @@ class Domain(object):
     def get_border_geometry(self, *args, **kwargs):
         """ Get OGR Geometry of the border Polygon
 
+        The geometry is cached and computed again only if arguments or
+        georeference of the Domain (see Domain._get_georeference_key) change.
+
         Returns
         -------
         OGR Geometry : Polygon
 
         """
 
-        return ogr.CreateGeometryFromWkt(self.get_border_wkt(*args, **kwargs))
+        return self._get_cached_border_geometry(*args, **kwargs).Clone()
+
+    def _get_cached_border_geometry(self, *args, **kwargs):
+        """ Get cached OGR Geometry of the border Polygon (not to be modified)
+
+        Returns
+        -------
+        OGR Geometry : Polygon
+
+        """
+        key = (self._get_georeference_key(), args, tuple(sorted(kwargs.items())))
+        if self._border_geometry_cache is None or self._border_geometry_cache[0] != key:
+            geometry = ogr.CreateGeometryFromWkt(self.get_border_wkt(*args, **kwargs))
+            self._border_geometry_cache = (key, geometry)
+        return self._border_geometry_cache[1]
+
+    def _get_georeference_key(self):
+        """ Get tuple with all parameters of georeference of self.vrt.dataset
+
+        Returns
+        -------
+        key : tuple
+            raster size, geotransform, projection, GCPs and geolocation metadata
+
+        """
+        dataset = self.vrt.dataset
+        gcps = tuple((gcp.GCPPixel, gcp.GCPLine, gcp.GCPX, gcp.GCPY)
+                     for gcp in dataset.GetGCPs())
+        geolocation = dataset.GetMetadata('GEOLOCATION') or {}
+        return (dataset.RasterXSize, dataset.RasterYSize,
+                tuple(dataset.GetGeoTransform()), dataset.GetProjection(),
+                dataset.GetGCPProjection(), gcps, tuple(sorted(geolocation.items())))
 
     def get_border_geojson(self, *args, **kwargs):
         """Create border of the Polygon in GeoJson format
@@ -656,6 +703,44 @@ class Domain(object):
 
         return self.get_border_geometry().Contains(anotherDomain.get_border_geometry())
 
+    def check_domains(self, domains, predicate='intersects'):
+        """ Check spatial relation between this Domain and many other Domains
+
+        Border geometries of all Domains are cached, and Domains with
+        not overlapping envelopes are rejected without testing the geometries.
+
+        Parameters
+        ----------
+        domains : list of Domain
+            other Domains
+        predicate : str
+            'intersects', 'overlaps', 'contains' (this Domain fully covers
+            another Domain) or 'within' (this Domain is fully inside another Domain)
+
+        Returns
+        -------
+        result : numpy array of bool
+            result of <predicate> for each Domain from <domains>
+
+        """
+        if predicate not in self.PREDICATES:
+            raise ValueError('Predicate must be one of %s' % ', '.join(sorted(self.PREDICATES)))
+
+        geometry = self._get_cached_border_geometry()
+        test_predicate = getattr(geometry, self.PREDICATES[predicate])
+        min_x, max_x, min_y, max_y = geometry.GetEnvelope()
+
+        result = np.zeros(len(domains), bool)
+        for i, domain in enumerate(domains):
+            other_geometry = domain._get_cached_border_geometry()
+            other_min_x, other_max_x, other_min_y, other_max_y = other_geometry.GetEnvelope()
+            if (other_min_x > max_x or other_max_x < min_x or
+                    other_min_y > max_y or other_max_y < min_y):
+                continue
+            result[i] = test_predicate(other_geometry)
+
+        return result
+
     def get_border_postgis(self, **kwargs):
         """ Get PostGIS formatted string of the border Polygon
 
@@ -681,17 +766,174 @@ class Domain(object):
         row_vec = [0, self.vrt.dataset.RasterYSize, 0, self.vrt.dataset.RasterYSize]
         return self.transform_points(col_vec, row_vec)
 
-    def get_min_max_lon_lat(self):
+    def get_min_max_lon_lat(self, n_points=100, tolerance=0.):
         """Get minimum and maximum of longitude and latitude geolocation grids
 
+        Longitude and latitude have no local extremes inside a Domain unless
+        it contains a pole. Therefore the extremes are searched only on the
+        border: pixels on the border are sampled, and the sampling is refined
+        around each extreme until neighbouring pixels are reached (or the
+        extreme changes by less than <tolerance>). If a pole is inside the
+        Domain, pixels around the pole are added. If the Domain crosses the
+        dateline, pixels along the dateline are added. If the Domain has
+        geolocation arrays, they are used directly.
+
+        Parameters
+        -----------
+        n_points : int
+            Number of points on each side of the border for initial sampling
+        tolerance : float
+            Stop refinement if extremes change less than this value, degrees
+
         Returns
         --------
         min_lon, max_lon, min_lat, max_lat, : float
             min/max lon/lat values for the Domain
 
         """
-        lon_grd, lat_grd = self.get_geolocation_grids()
-        return lon_grd.min(), lon_grd.max(), lat_grd.min(), lat_grd.max(),
+        if self.vrt.geolocation is not None and len(self.vrt.geolocation.data) > 0:
+            lon_grd, lat_grd = self.vrt.geolocation.get_geolocation_grids()
+            return (float(lon_grd.min()), float(lon_grd.max()),
+                    float(lat_grd.min()), float(lat_grd.max()))
+
+        x_size, y_size = self.shape()[::-1]
+        cols, rows = Domain._get_perimeter_pixels(x_size, y_size)
+        n_perimeter = cols.size
+
+        # initial sampling of the border (including corners)
+        step = max(1, int(n_perimeter / (4 * n_points)))
+        corners = np.cumsum([0, x_size - 1, y_size - 1, x_size - 1]) % n_perimeter
+        indices = np.union1d(np.arange(0, n_perimeter, step), corners)
+        lon, lat = self.transform_points(cols[indices], rows[indices])
+        lon, lat = np.asarray(lon, float), np.asarray(lat, float)
+
+        # refine around extremes of -lon, +lon, -lat, +lat
+        best = None
+        while True:
+            values = [lon, -lon, lat, -lat]
+            new_best = np.array([np.nanmin(value) for value in values])
+            if (best is not None and tolerance > 0 and
+                    np.all(np.abs(new_best - best) <= tolerance)):
+                break
+            best = new_best
+            new_indices = [np.zeros(0, int)]
+            for value in values:
+                new_indices += Domain._get_refined_indices(indices, value, n_perimeter,
+                                                           2 * n_points + 1)
+            new_indices = np.setdiff1d(np.concatenate(new_indices) % n_perimeter, indices)
+            if new_indices.size == 0:
+                break
+            new_lon, new_lat = self.transform_points(cols[new_indices], rows[new_indices])
+            indices = np.concatenate([indices, new_indices])
+            lon = np.concatenate([lon, np.asarray(new_lon, float)])
+            lat = np.concatenate([lat, np.asarray(new_lat, float)])
+            order = np.argsort(indices)
+            indices, lon, lat = indices[order], lon[order], lat[order]
+
+        # add pixels around poles and along the dateline within the Domain
+        crosses_dateline = np.nanmax(np.abs(np.diff(np.append(lon, lon[0])))) > 180
+        pole_lon, pole_lat = self._get_lonlat_around_points([0, 0], [90, -90], x_size, y_size)
+        lon = np.append(lon, pole_lon)
+        lat = np.append(lat, pole_lat)
+        if crosses_dateline:
+            dateline_lat = np.linspace(np.nanmin(lat), np.nanmax(lat), x_size + y_size)
+            dateline_lon, dateline_lat = self._get_lonlat_around_points(
+                np.zeros(dateline_lat.size) + 180, dateline_lat, x_size, y_size)
+            lon = np.append(lon, dateline_lon)
+            lat = np.append(lat, dateline_lat)
+
+        return (float(np.nanmin(lon)), float(np.nanmax(lon)),
+                float(np.nanmin(lat)), float(np.nanmax(lat)))
+
+    def _get_lonlat_around_points(self, lon, lat, x_size, y_size):
+        """Get lon/lat of pixels around given points which are inside the Domain
+
+        Parameters
+        -----------
+        lon, lat : array-like
+            coordinates of the points
+        x_size, y_size : int
+            size of the Domain
+
+        Returns
+        --------
+        lon, lat : numpy.ndarray
+            coordinates of the 3x3 pixels around each point inside the Domain
+
+        """
+        col, row = self.transform_points(lon, lat, DstToSrc=1)
+        col, row = np.asarray(col, float), np.asarray(row, float)
+        inside = np.isfinite(col) * np.isfinite(row)
+        inside[inside] = ((col[inside] >= 0) * (col[inside] <= x_size) *
+                          (row[inside] >= 0) * (row[inside] <= y_size))
+        if not inside.any():
+            return np.array([]), np.array([])
+        col_offsets, row_offsets = np.meshgrid([-1, 0, 1], [-1, 0, 1])
+        cols = (np.floor(col[inside])[:, None] + col_offsets.flatten()).flatten()
+        rows = (np.floor(row[inside])[:, None] + row_offsets.flatten()).flatten()
+        valid = (cols >= 0) * (cols < x_size) * (rows >= 0) * (rows < y_size)
+        lon, lat = self.transform_points(cols[valid], rows[valid])
+        return np.asarray(lon, float), np.asarray(lat, float)
+
+    @staticmethod
+    def _get_refined_indices(indices, value, n_perimeter, n_new, n_candidates=4):
+        """Get indices of border pixels for refinement around local minima of value
+
+        Parameters
+        -----------
+        indices : numpy array
+            sorted indices of sampled pixels on the border
+        value : numpy array
+            values at the sampled pixels
+        n_perimeter : int
+            number of pixels on the border
+        n_new : int
+            number of new samples around each local minimum
+        n_candidates : int
+            number of smallest local minima to refine
+
+        Returns
+        --------
+        new_indices : list of numpy arrays
+            indices of pixels to sample (may exceed [0, n_perimeter))
+
+        """
+        value = np.where(np.isnan(value), np.inf, value)
+        prev_value, next_value = np.roll(value, 1), np.roll(value, -1)
+        # local minima which are not inside a plateau
+        candidates = np.nonzero((value <= prev_value) * (value <= next_value) *
+                                ((value < prev_value) + (value < next_value)))[0]
+        if candidates.size == 0:
+            candidates = np.array([np.argmin(value)])
+        candidates = candidates[np.argsort(value[candidates])[:n_candidates]]
+
+        new_indices = []
+        for k in candidates:
+            left = indices[k - 1] - (n_perimeter if k == 0 else 0)
+            right = indices[(k + 1) % indices.size] + (n_perimeter if k == indices.size - 1 else 0)
+            if right - left > 2:
+                new_indices.append(np.linspace(left, right, n_new).round().astype(int))
+        return new_indices
+
+    @staticmethod
+    def _get_perimeter_pixels(x_size, y_size):
+        """Get columns and rows of all pixels on the border going clockwise
+
+        Parameters
+        -----------
+        x_size, y_size : int
+            raster size
+
+        Returns
+        --------
+        cols, rows : numpy arrays
+
+        """
+        x_vec = np.arange(x_size)
+        y_vec = np.arange(1, y_size)
+        cols = np.hstack([x_vec, [x_size - 1] * y_vec.size, x_vec[-2::-1], [0] * max(0, y_size - 2)])
+        rows = np.hstack([[0] * x_size, y_vec, [y_size - 1] * (x_size - 1), y_vec[-2::-1]])
+        return cols.astype(int), rows.astype(int)
 
     def get_pixelsize_meters(self):
         """Returns the pixelsize (deltaX, deltaY) of the domain
@@ -846,13 +1088,21 @@ class Domain(object):
         azimuth : numpy array
             Values of azimuth in degrees in range 0 - 360
 
-        """
+        Note
+        -----
+        Azimuth is computed on a coarse grid of tie points (at most AZIMUTH_TIE_POINTS
+        along the shorter side) and interpolated to the output grid (see AzimuthLUT)
 
-        lon_grd, lat_grd = self.get_geolocation_grids(reductionFactor)
-        a = initial_bearing(lon_grd[1:, :], lat_grd[1:, :], lon_grd[:-1:, :], lat_grd[:-1:, :])
-        # Repeat last row once to match size of lon-lat grids
-        a = np.vstack((a, a[-1, :]))
-        return a
+        """
+        y_size, x_size = self.shape()
+        step = max(1, min(y_size, x_size) // self.AZIMUTH_TIE_POINTS)
+        lon_grd, lat_grd = self.get_geolocation_grids(step)
+        azimuth = AzimuthLUT.get_azimuth(lon_grd, lat_grd, axis=0, offset=180)
+        rows = np.arange(0, y_size, step) / reductionFactor
+        cols = np.arange(0, x_size, step) / reductionFactor
+        lut = AzimuthLUT(rows, cols, azimuth, extrapolate=True)
+        return lut.get_block(0, 0, len(range(0, x_size, reductionFactor)),
+                             len(range(0, y_size, reductionFactor)), np.float64)
 
     def shape(self):
         """Return Numpy-like shape of Domain object (ySize, xSize)
@@ -29,6 +29,7 @@ from nansat.node import Node
 from nansat.utils import NUMPY_TO_GDAL_TYPE_MAP
 
 from nansat.exceptions import NansatGDALError
+from nansat.profiler import profiled, span
 
 
 class Exporter(object):
@@ -39,8 +40,9 @@ class Exporter(object):
     UNWANTED_METADATA = ['dataType', 'SourceFilename', 'SourceBand', '_Unsigned', 'FillValue',
                                 'time', '_FillValue', 'type', 'scale', 'offset']
 
+    @profiled('Exporter.export')
     def export(self, filename='', bands=None, rm_metadata=None, add_geolocation=True,
-               driver='netCDF', options=None, hardcopy=False):
+               driver='netCDF', options=None, hardcopy=False, overviews=None):
         """Export Nansat object into netCDF or GTiff file
 
         Parameters
@@ -63,6 +65,9 @@ class Exporter(object):
             See also http://www.gdal.org/frmt_netcdf.html
         hardcopy : bool
             Evaluate all bands just before export?
+        overviews : list of int
+            reduction factors of internal overviews (e.g. [2, 4, 8, 16]).
+            Only for GTiff driver.
 
         Returns
         -------
@@ -96,34 +101,46 @@ class Exporter(object):
             options = []
         if type(options) == str:
             options = [options]
+        if overviews and driver != 'GTiff':
+            raise ValueError('Overviews can be added only to GTiff files')
 
         # temporary VRT for exporting
-        export_vrt = self.vrt.copy()
-        export_vrt.leave_few_bands(bands)
-        export_vrt.split_complex_bands()
-        if add_geolocation:
-            export_vrt.create_geolocation_bands()
-        export_vrt.fix_band_metadata(rm_metadata)
-        export_vrt.fix_global_metadata(rm_metadata)
-
-        # if output filename is the same as input one
-        if self.filename == filename or hardcopy:
-            export_vrt.hardcopy_bands()
-
-        if driver == 'GTiff':
-            add_gcps = export_vrt.prepare_export_gtiff()
-        else:
-            add_gcps = export_vrt.prepare_export_netcdf()
+        with span('Exporter.prepare_vrt'):
+            export_vrt = self.vrt.copy()
+            export_vrt.leave_few_bands(bands)
+            export_vrt.split_complex_bands()
+            if add_geolocation:
+                export_vrt.create_geolocation_bands()
+            export_vrt.fix_band_metadata(rm_metadata)
+            export_vrt.fix_global_metadata(rm_metadata)
+
+            # if output filename is the same as input one
+            if self.filename == filename or hardcopy:
+                export_vrt.hardcopy_bands()
+
+            if driver == 'GTiff':
+                add_gcps = export_vrt.prepare_export_gtiff()
+            else:
+                add_gcps = export_vrt.prepare_export_netcdf()
 
         # Create output file using GDAL
-        dataset = gdal.GetDriverByName(driver).CreateCopy(filename, export_vrt.dataset, options=options)
-        del dataset
+        with span('Exporter.CreateCopy', driver=driver):
+            dataset = gdal.GetDriverByName(driver).CreateCopy(filename, export_vrt.dataset,
+                                                              options=options)
+            del dataset
+        if overviews:
+            with span('Exporter.BuildOverviews'):
+                dataset = gdal.Open(filename, gdal.GA_Update)
+                dataset.BuildOverviews(str('AVERAGE'), list(overviews))
+                del dataset
+
         # add GCPs into netCDF file as separate float variables
         if add_gcps:
             Exporter._add_gcps(filename, export_vrt.dataset.GetGCPs())
 
         self.logger.debug('Export - OK!')
 
+    @profiled('Exporter.export2thredds')
     def export2thredds(self,
         filename,
         bands=None,
@@ -312,6 +329,7 @@ class Exporter(object):
 
         return grid_mapping_name, grid_mapping_var_name
 
+    @profiled('Exporter._post_proc_thredds')
     def _post_proc_thredds(self,
         tmp_filename, out_filename, bands, band_metadata, time, global_metadata, zlib):
         """ Convert temporary file into a netCDF file with time variable using netCDF4 lib
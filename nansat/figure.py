@@ -72,6 +72,11 @@ class Figure(object):
         2, coefficient for tone curve udjustment
     subsetArraySize : int
         100000, size of the subset array which is used to get histogram
+    histBins : int
+        1000, number of bins of histograms used for estimation of clim
+    histStep : int
+        1, step for decimation of the array when clim is estimated from
+        histogram. Values > 1 speed up clim_from_histogram on large arrays
     numOfColor : int
         250, number of colors for use of the palette.
         254th is black and 255th is white.
@@ -163,6 +168,12 @@ class Figure(object):
         0.1, title offset X relative to legend width
     TITLE_LOCATION_Y :
         0.3, title  offset Y relative to legend height
+    HIST_BLOCK_SIZE : int
+        1000000, number of pixels processed at once in clim_from_histogram
+    HIST_PASSES : int
+        3, maximum number of histogram passes over a band in clim_from_histogram
+    BLOCK_SIZE : int
+        1000000, number of pixels processed at once in process()
     DEFAULT_EXTENSION : string
         '.png'
 
@@ -173,6 +184,8 @@ class Figure(object):
     cmax = [1.]
     gamma = 2.
     subsetArraySize = 100000
+    histBins = 1000
+    histStep = 1
     numOfColor = 250
     cmapName = 'jet'
     ratio = 1.0
@@ -209,6 +222,9 @@ class Figure(object):
     CAPTION_LOCATION_Y = 0.25
     TITLE_LOCATION_X = 0.1
     TITLE_LOCATION_Y = 0.05
+    HIST_BLOCK_SIZE = 1000000
+    HIST_PASSES = 3
+    BLOCK_SIZE = 1000000
     DEFAULT_EXTENSION = '.png'
 
     palette = None
@@ -222,6 +238,7 @@ class Figure(object):
 
     # instance attributes
     array = None
+    reprojMask = None
     def __init__(self, nparray, **kwargs):
         """ Set attributes
 
@@ -280,12 +297,24 @@ class Figure(object):
 
         # apply logarithm/gamme correction to pixel values
         for iBand in range(self.array.shape[0]):
-            self.array[iBand, :, :] = (
-                (np.power((self.array[iBand, :, :] - self.cmin[iBand]) /
-                         (self.cmax[iBand] - self.cmin[iBand]),
-                          (1.0 / self.gamma))) *
-                (self.cmax[iBand] - self.cmin[iBand]) +
-                self.cmin[iBand])
+            self._apply_logarithm_block(iBand, self.array[iBand, :, :])
+
+    def _apply_logarithm_block(self, iBand, block):
+        """Apply the tone curve to a block of one band inplace
+
+        Parameters
+        -----------
+        iBand : int
+            index of the band (for cmin and cmax)
+        block : numpy array
+            view of self.array to modify
+
+        """
+        block[:] = (np.power((block - self.cmin[iBand]) /
+                             (self.cmax[iBand] - self.cmin[iBand]),
+                             (1.0 / self.gamma)) *
+                    (self.cmax[iBand] - self.cmin[iBand]) +
+                    self.cmin[iBand])
 
     def apply_mask(self, **kwargs):
         """Apply mask for coloring land, clouds, etc
@@ -310,28 +339,65 @@ class Figure(object):
         # modify default parameters
         self._set_defaults(kwargs)
 
+        maskColors = self._get_mask_colors()
+        for rows in self._get_row_blocks():
+            for iBand in range(self.array.shape[0]):
+                self._apply_mask_block(iBand, self.array[iBand, rows, :],
+                                       self.mask_array[rows], maskColors)
+
+    def _get_mask_colors(self):
+        """Get palette indices and colors for values of mask_lut
+
+        The palette is updated with colors of mask_lut at the free indices
+        (after numOfColor)
+
+        **Modifies:** self.palette
+
+        Returns
+        --------
+        maskColors : list
+            (maskValue, palette index, color) for each used value of mask_lut
+
+        """
         # get values of free indices in the palette
         availIndices = range(self.numOfColor, 255 - 1)
 
         # for all lut color indices
-        for i, maskValue in enumerate(self.mask_lut):
-            if i < len(availIndices):
-                # get color for that index
-                maskColor = self.mask_lut[maskValue]
-                # get indices for that index
-                maskIndices = self.mask_array == maskValue
-                # exchange colors
-                if self.array.shape[0] == 1:
-                    # in a indexed image
-                    self.array[0][maskIndices] = availIndices[i]
-                elif self.array.shape[0] == 3:
-                    # in RGB image
-                    for c in range(0, 3):
-                        self.array[c][maskIndices] = maskColor[c]
-
-                # exchange palette
-                self.palette[(availIndices[i] * 3):
-                             (availIndices[i] * 3 + 3)] = maskColor
+        maskColors = []
+        for maskValue, availIndex in zip(self.mask_lut, availIndices):
+            # get color for that index
+            maskColor = self.mask_lut[maskValue]
+            maskColors.append((maskValue, availIndex, maskColor))
+            # exchange palette
+            self.palette[(availIndex * 3):(availIndex * 3 + 3)] = maskColor
+
+        return maskColors
+
+    def _apply_mask_block(self, iBand, block, maskBlock, maskColors):
+        """Replace masked pixels in a block of one band inplace
+
+        Parameters
+        -----------
+        iBand : int
+            index of the band
+        block : numpy array
+            view of uint8 self.array to modify
+        maskBlock : numpy array
+            corresponding block of the mask array
+        maskColors : list
+            output from self._get_mask_colors()
+
+        """
+        for maskValue, availIndex, maskColor in maskColors:
+            # get indices for that index
+            maskIndices = maskBlock == maskValue
+            # exchange colors
+            if self.array.shape[0] == 1:
+                # in a indexed image
+                block[maskIndices] = availIndex
+            elif self.array.shape[0] == 3:
+                # in RGB image
+                block[maskIndices] = maskColor[iBand]
 
     def add_logo(self, **kwargs):
         """Insert logo into the PIL image
@@ -579,6 +645,17 @@ class Figure(object):
         Then get rid of (1.0-ratio)/2 from the both sides and
         return the minimum and maximum values.
 
+        The array is read in blocks of HIST_BLOCK_SIZE pixels and both
+        percentiles are found from histograms of histBins bins which are
+        narrowed down until the remaining values fit into one block. The
+        band is read at most HIST_PASSES + 2 times (range, histograms,
+        collection of the remaining values) and no sorted copy of the band
+        is created. If the values fit into one block within HIST_PASSES
+        histograms the result is equal to np.percentile of the (decimated by
+        histStep) valid pixels. Otherwise the percentile is interpolated
+        within the last bin and the error is below the bin width
+        (max - min) / histBins ** HIST_PASSES.
+
         Parameters
         -----------
         **kwargs : dict
@@ -594,13 +671,6 @@ class Figure(object):
         self._set_defaults(kwargs)
         ratio = self.ratio
 
-        # find masked pixels if mask_array and mask_lut provided
-        masked = None
-        if self.mask_array is not None and self.mask_lut is not None:
-            masked = np.zeros(self.mask_array.shape, 'bool')
-            for lutVal in self.mask_lut:
-                masked = masked + (self.mask_array == lutVal)
-
         # create a ratio list for each band
         if not (isinstance(ratio, float) or isinstance(ratio, int)):
             raise ValueError('Incorrect input ratio %s' % str(ratio))
@@ -612,24 +682,188 @@ class Figure(object):
         # create a 2D array and set min and max values
         clim = [[0] * self.array.shape[0], [0] * self.array.shape[0]]
         for iBand in range(self.array.shape[0]):
-            bandArray = self.array[iBand, :, :]
-            # remove masked data
-            if masked is not None:
-                bandArray = bandArray[masked == 0]
-            # remove nan, inf
-            bandArray = bandArray[np.isfinite(bandArray)]
-            # get percentile
-            percentileMin = 100 * (1 - ratio) / 2.
-            percentileMax = 100 * (1 - (1 - ratio) / 2.)
-            if bandArray.size > 0:
-                clim[0][iBand] = np.percentile(bandArray, percentileMin)
-                clim[1][iBand] = np.percentile(bandArray, percentileMax)
-            else:
+            # first pass: number of valid pixels and their range
+            count, vmin, vmax = 0, np.inf, -np.inf
+            for values in self._iter_valid_values(iBand):
+                if values.size > 0:
+                    count += values.size
+                    vmin = min(vmin, values.min())
+                    vmax = max(vmax, values.max())
+            if count == 0:
                 clim[0][iBand], clim[1][iBand] = 0, 1
+                continue
+            if ratio == 1 or vmin == vmax:
+                clim[0][iBand], clim[1][iBand] = float(vmin), float(vmax)
+                continue
+
+            # get percentile (linear interpolation between closest ranks)
+            percentiles = [(1 - ratio) / 2., 1 - (1 - ratio) / 2.]
+            ranks = set()
+            for percentile in percentiles:
+                rank = percentile * (count - 1)
+                ranks.update([int(floor(rank)), min(int(floor(rank)) + 1,
+                                                    count - 1)])
+            values = self._get_order_statistics(iBand, sorted(ranks),
+                                                vmin, vmax)
+            for i, percentile in enumerate(percentiles):
+                rank = percentile * (count - 1)
+                lower = values[int(floor(rank))]
+                upper = values[min(int(floor(rank)) + 1, count - 1)]
+                clim[i][iBand] = float(lower + (rank - floor(rank)) *
+                                       (upper - lower))
 
         self.color_limits = clim
         return clim
 
+    def _iter_valid_values(self, iBand):
+        """Yield 1D arrays with finite and not masked values of a band
+
+        The band is decimated by histStep along both axes and read in blocks
+        of approximately HIST_BLOCK_SIZE pixels.
+
+        Parameters
+        -----------
+        iBand : int
+            index of the band in self.array
+
+        """
+        step = max(1, int(self.histStep))
+        bandArray = self.array[iBand, ::step, ::step]
+        maskArray = None
+        if self.mask_array is not None and self.mask_lut is not None:
+            maskArray = np.asarray(self.mask_array)[::step, ::step]
+            maskValues = list(self.mask_lut)
+
+        blockRows = max(1, self.HIST_BLOCK_SIZE // max(1, bandArray.shape[1]))
+        for row in range(0, bandArray.shape[0], blockRows):
+            block = bandArray[row:row + blockRows]
+            valid = np.isfinite(block)
+            if maskArray is not None:
+                maskBlock = maskArray[row:row + blockRows]
+                valid &= ~np.isin(maskBlock, maskValues)
+            yield block[valid]
+
+    @staticmethod
+    def _get_bin_indices(values, edges):
+        """Find indices of bins [edges[i], edges[i+1]) containing values
+
+        Indices are computed arithmetically and then corrected by comparison
+        with the edges, which is much faster than np.searchsorted
+
+        Parameters
+        -----------
+        values : 1D numpy array
+            values within [edges[0], edges[-1])
+        edges : 1D numpy array
+            monotonically increasing edges of the bins
+
+        Returns
+        --------
+        indices : 1D numpy array
+            indices of the bins
+
+        """
+        bins = edges.size - 1
+        with np.errstate(over='ignore', divide='ignore'):
+            scale = bins / (edges[-1] - edges[0])
+        if np.isfinite(scale) and np.unique(edges).size == edges.size:
+            indices = ((values - edges[0]) * scale).astype(np.intp)
+            np.clip(indices, 0, bins - 1, out=indices)
+            for _ in range(2):
+                below = values < edges[indices]
+                above = values >= edges[indices + 1]
+                if not (below.any() or above.any()):
+                    return indices
+                indices -= below
+                indices += above
+        # interval is too narrow for arithmetic estimate
+        return np.searchsorted(edges, values, 'right') - 1
+
+    def _get_order_statistics(self, iBand, ranks, vmin, vmax):
+        """Find values of given ranks in valid pixels of a band
+
+        For each rank the interval [lo, hi) containing the value is narrowed
+        by histograms with histBins bins. When an interval contains no more
+        than HIST_BLOCK_SIZE values they are collected and sorted. All
+        unresolved ranks are processed in one pass over the band. After
+        HIST_PASSES histograms the values of unresolved ranks are linearly
+        interpolated within their bins.
+
+        Parameters
+        -----------
+        iBand : int
+            index of the band in self.array
+        ranks : list of int
+            zero-based ranks of the sorted valid values
+        vmin, vmax : float
+            minimum and maximum of the valid values
+
+        Returns
+        --------
+        values : dict
+            values of the given ranks
+
+        """
+        vmin, vmax = float(vmin), float(vmax)
+        bins = max(2, int(self.histBins))
+        # state of each rank: [lo, hi, number of values below lo]
+        states = dict((rank, (vmin, np.nextafter(vmax, np.inf), 0))
+                      for rank in ranks)
+        values = {}
+        passes = 0
+        while states:
+            passes += 1
+            intervals = sorted(set(states.values()))
+            edges = [np.linspace(lo, hi, bins + 1) for lo, hi, _ in intervals]
+            for intervalEdges, (lo, hi, _) in zip(edges, intervals):
+                intervalEdges[0], intervalEdges[-1] = lo, hi
+            hists = [np.zeros(bins, 'int64') for _ in intervals]
+            for blockValues in self._iter_valid_values(iBand):
+                for hist, intervalEdges, (lo, hi, _) in zip(hists, edges,
+                                                             intervals):
+                    inside = blockValues[(blockValues >= lo) &
+                                         (blockValues < hi)]
+                    hist += np.bincount(self._get_bin_indices(
+                                            inside, intervalEdges),
+                                        minlength=bins)
+
+            collect = {}
+            for rank, state in list(states.items()):
+                iInterval = intervals.index(state)
+                cumsum = np.cumsum(hists[iInterval])
+                iBin = np.searchsorted(cumsum, rank - state[2], 'right')
+                below = state[2] + (cumsum[iBin - 1] if iBin > 0 else 0)
+                lo, hi = edges[iInterval][iBin], edges[iInterval][iBin + 1]
+                if np.nextafter(lo, np.inf) >= hi:
+                    # only one representable value in the bin
+                    values[rank] = lo
+                    del states[rank]
+                elif hists[iInterval][iBin] <= self.HIST_BLOCK_SIZE:
+                    collect.setdefault((lo, hi, below), []).append(rank)
+                    del states[rank]
+                elif passes >= self.HIST_PASSES:
+                    # error is below the bin width
+                    values[rank] = lo + (hi - lo) * ((rank - below + 0.5) /
+                                                     hists[iInterval][iBin])
+                    del states[rank]
+                else:
+                    states[rank] = (lo, hi, below)
+
+            if collect:
+                collected = dict((interval, []) for interval in collect)
+                for blockValues in self._iter_valid_values(iBand):
+                    for lo, hi, below in collected:
+                        collected[(lo, hi, below)].append(
+                            blockValues[(blockValues >= lo) &
+                                        (blockValues < hi)])
+                for interval, intervalRanks in collect.items():
+                    sortedValues = np.sort(np.concatenate(
+                                                    collected[interval]))
+                    for rank in intervalRanks:
+                        values[rank] = sortedValues[rank - interval[2]]
+
+        return values
+
     def clip(self, **kwargs):
         """Convert self.array to values between cmin and cmax
 
@@ -651,17 +885,36 @@ class Figure(object):
         self._set_defaults(kwargs)
 
         for iBand in range(self.array.shape[0]):
-            # if clipping integer matrix, make clipping ranges valid
-            if self.array.dtype in ['int8', 'uint8', 'int16', 'uint16']:
-                self.cmin[iBand] = np.ceil(self.cmin[iBand])
-                self.cmin[iBand] = np.floor(self.cmin[iBand])
-
-            # Clipping, allowing for reversed colorscale (cmin > cmax)
-            clipMin = np.min([self.cmin[iBand], self.cmax[iBand]])
-            clipMax = np.max([self.cmin[iBand], self.cmax[iBand]])
+            clipMin, clipMax = self._get_clip_limits(iBand)
             self.array[iBand, :, :] = np.clip(self.array[iBand, :, :],
                                               clipMin, clipMax)
 
+    def _get_clip_limits(self, iBand):
+        """Get min and max values for clipping of one band
+
+        **Modifies:** self.cmin : made valid for integer arrays
+
+        Parameters
+        -----------
+        iBand : int
+            index of the band
+
+        Returns
+        --------
+        clipMin, clipMax : float
+            lower and upper limits
+
+        """
+        # if clipping integer matrix, make clipping ranges valid
+        if self.array.dtype in ['int8', 'uint8', 'int16', 'uint16']:
+            self.cmin[iBand] = np.ceil(self.cmin[iBand])
+            self.cmin[iBand] = np.floor(self.cmin[iBand])
+
+        # Clipping, allowing for reversed colorscale (cmin > cmax)
+        clipMin = np.min([self.cmin[iBand], self.cmax[iBand]])
+        clipMax = np.max([self.cmin[iBand], self.cmax[iBand]])
+        return clipMin, clipMax
+
     def convert_palettesize(self, **kwargs):
         """Convert self.array to palette color size in uint8
 
@@ -677,13 +930,77 @@ class Figure(object):
         self._set_defaults(kwargs)
 
         for iBand in range(self.array.shape[0]):
-            self.array[iBand, :, :] = (
-                (self.array[iBand, :, :].astype('float32') -
-                 self.cmin[iBand]) *
+            self.array[iBand, :, :] = self._scale_block(
+                                                iBand, self.array[iBand, :, :])
+
+        self.array = self.array.astype(np.uint8)
+
+    def _scale_block(self, iBand, block):
+        """Scale a block of one band from cmin..cmax to 0..numOfColor-1
+
+        Parameters
+        -----------
+        iBand : int
+            index of the band
+        block : numpy array
+            block of self.array
+
+        Returns
+        --------
+        scaled : numpy array (float32)
+
+        """
+        return ((block.astype('float32') - self.cmin[iBand]) *
                 (self.numOfColor - 1) /
                 (self.cmax[iBand] - self.cmin[iBand]))
 
-        self.array = self.array.astype(np.uint8)
+    def _get_row_blocks(self):
+        """Get slices of rows of self.array with about BLOCK_SIZE pixels
+
+        Returns
+        --------
+        rows : list of slice
+
+        """
+        height, width = self.array.shape[1:]
+        blockRows = max(1, self.BLOCK_SIZE // max(1, width))
+        return [slice(row, row + blockRows)
+                for row in range(0, height, blockRows)]
+
+    def _map_to_palette(self):
+        """Convert self.array to palette indices (or RGB) in one pass
+
+        Equivalent to clip(), apply_logarithm() (if self.logarithm),
+        convert_palettesize() and apply_mask() (if mask_array and mask_lut
+        are given) but each block of rows is processed by all steps at once
+        and written into a single uint8 output array. The palette has to be
+        created before.
+
+        **Modifies:** self.array (numpy array), converted to uint8
+
+        **Modifies:** self.palette, colors of mask_lut are added
+
+        **Modifies:** self.cmin, self.cmax : allowed min/max values
+
+        """
+        maskColors = None
+        if self.mask_array is not None and self.mask_lut is not None:
+            maskColors = self._get_mask_colors()
+
+        clipLimits = [self._get_clip_limits(iBand)
+                      for iBand in range(self.array.shape[0])]
+        indices = np.empty(self.array.shape, np.uint8)
+        for rows in self._get_row_blocks():
+            for iBand, (clipMin, clipMax) in enumerate(clipLimits):
+                block = self.array[iBand, rows, :]
+                block[:] = np.clip(block, clipMin, clipMax)
+                if self.logarithm:
+                    self._apply_logarithm_block(iBand, block)
+                indices[iBand, rows, :] = self._scale_block(iBand, block)
+                if maskColors is not None:
+                    self._apply_mask_block(iBand, indices[iBand, rows, :],
+                                           self.mask_array[rows], maskColors)
+        self.array = indices
 
     def create_legend(self, **kwargs):
         """self.legend is replaced from None to PIL image
@@ -827,11 +1144,10 @@ class Figure(object):
         """Do all common operations for preparation of a figure for saving
 
         #. Modify default values of parameters by the provided ones (if any)
-        #. Clip to min/max
-        #. Apply logarithm if required
-        #. Convert data to uint8
         #. Create palette
-        #. Apply mask for colouring land, clouds, etc if required
+        #. Clip to min/max, apply logarithm if required, convert data to
+           uint8 and apply mask for colouring land, clouds, etc if required
+           (in one pass over blocks of rows)
         #. Create legend if required
         #. Create PIL image
         #. Add logo if required
@@ -863,22 +1179,13 @@ class Figure(object):
         # we replace them with mask before creating PIL Image
         self.reprojMask = self.array[0, :, :] == 0
 
-        # clip values to min/max
-        self.clip()
-
-        # apply logarithm
-        if self.logarithm:
-            self.apply_logarithm()
-
-        # convert to uint8
-        self.convert_palettesize()
-
         # create the paletter
         self._create_palette()
 
-        # apply colored mask (land mask, cloud mask and something else)
-        if self.mask_array is not None and self.mask_lut is not None:
-            self.apply_mask()
+        # clip values to min/max, apply logarithm if required, convert to
+        # uint8 and apply colored mask (land mask, cloud mask and something
+        # else) block by block
+        self._map_to_palette()
 
         # add lat/lon grids lines if latGrid and lonGrid are given
         self.add_latlon_grids()
@@ -904,24 +1211,22 @@ class Figure(object):
         **Modifies:** self.pilImg (PIL image), Adds transparency to PIL image
 
         """
-        self.pilImg = self.pilImg.convert('RGBA')
-        datas = self.pilImg.getdata()
-        newData = list()
-
-        for item in datas:
-            if (item[0] == self.transparency[0] and
-                    item[1] == self.transparency[1] and
-                    item[2] == self.transparency[2]):
-                newData.append((255, 255, 255, 0))
-            else:
-                newData.append(item)
+        img = np.array(self.pilImg.convert('RGBA'))
 
-        self.pilImg.putdata(newData)
+        # replace the transparency color by transparent white
+        if self.transparency is not None:
+            transparency = np.broadcast_to(self.transparency, (3,))
+            transparent = img[:, :, 0] == transparency[0]
+            transparent &= img[:, :, 1] == transparency[1]
+            transparent &= img[:, :, 2] == transparency[2]
+            img[transparent] = (255, 255, 255, 0)
 
         # The alphaMask is set in process() before clip() the Image
-        img = np.array(self.pilImg)
-        img[:, :, 3][self.reprojMask] = 0
-        self.pilImg = Image.fromarray(np.uint8(img))
+        # (it covers only the data part of the image, without legend)
+        if self.reprojMask is not None:
+            mask_rows, mask_cols = self.reprojMask.shape
+            img[:mask_rows, :mask_cols, 3][self.reprojMask] = 0
+        self.pilImg = Image.fromarray(img)
 
     def save(self, fileName, **kwargs):
         """Save self.pilImg to a physical file
@@ -0,0 +1,110 @@
+# Name:    lazy_band.py
+# Purpose: Container of LazyBand class
+# Licence:
+# This file is part of NANSAT.
+# NANSAT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+# http://www.gnu.org/licenses/gpl-3.0.html
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+from __future__ import absolute_import
+
+import threading
+
+import numpy as np
+
+from nansat.utils import gdal
+
+
+class LazyBand(object):
+    """Array-like read-only access to a band of a Nansat object by windows
+
+    Only the requested window is read from the band (with the same handling of
+    expression, _FillValue and swathmask as in Nansat.__getitem__). Each thread
+    opens its own GDAL dataset from the VRT file of the Nansat object, so windows
+    can be read in parallel (e.g. by dask.array.from_array with the threaded
+    scheduler). Since the VRT files are kept in memory (/vsimem/), LazyBand can
+    be used only in the process where the Nansat object was created.
+
+    Parameters
+    -----------
+    n : Nansat
+        Nansat object with the band
+    band_id : int or str
+        number or name of the band
+
+    """
+    ndim = 2
+
+    def __init__(self, n, band_id):
+        self.n = n
+        self.band_number = n.get_band_number(band_id)
+        self.swathmask_number = None
+        if n.has_band('swathmask'):
+            self.swathmask_number = n.get_band_number('swathmask')
+        n.vrt.dataset.FlushCache()
+        self.filename = n.vrt.filename
+        self.shape = n.shape()
+        self._local = threading.local()
+        self.dtype = self[:1, :1].dtype
+
+    def _get_dataset(self):
+        """Get GDAL dataset opened in the current thread"""
+        dataset = getattr(self._local, 'dataset', None)
+        if dataset is None:
+            dataset = gdal.Open(self.filename)
+            self._local.dataset = dataset
+        return dataset
+
+    def __getitem__(self, key):
+        """Read window of the band
+
+        Parameters
+        -----------
+        key : tuple
+            rows and columns (int or slice)
+
+        Returns
+        --------
+        a : numpy.ndarray
+
+        """
+        if not isinstance(key, tuple):
+            key = (key,)
+        key = (key + (slice(None),) * 2)[:2]
+        offsets, sizes, steps = [], [], []
+        for index, size in zip(key, self.shape):
+            if isinstance(index, slice):
+                start, stop, step = index.indices(size)
+            else:
+                start = int(index) + size if int(index) < 0 else int(index)
+                stop, step = start + 1, 1
+            if step < 0:
+                raise IndexError('Negative steps are not supported')
+            offsets.append(start)
+            sizes.append(max(0, stop - start))
+            steps.append(step)
+
+        if 0 in sizes:
+            return np.zeros(sizes, getattr(self, 'dtype', np.float32))
+
+        dataset = self._get_dataset()
+        swathmask = None
+        if self.swathmask_number is not None:
+            swathmask = dataset.GetRasterBand(self.swathmask_number)
+        window = (offsets[1], offsets[0], sizes[1], sizes[0])
+        data = self.n._read_band(dataset.GetRasterBand(self.band_number), swathmask, window)
+        data = data[::steps[0], ::steps[1]]
+
+        squeeze = tuple(axis for axis, index in enumerate(key) if not isinstance(index, slice))
+        if squeeze:
+            data = np.squeeze(data, axis=squeeze)
+        return data
+
+    def __array__(self, dtype=None, copy=None):
+        data = self[:, :]
+        if dtype is not None:
+            data = data.astype(dtype)
+        return data
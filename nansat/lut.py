@@ -0,0 +1,302 @@
+# Name:    lut.py
+# Purpose: Container of LUT class
+# Licence:
+# This file is part of NANSAT.
+# NANSAT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+# http://www.gnu.org/licenses/gpl-3.0.html
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+from __future__ import absolute_import, division
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from nansat.utils import initial_bearing
+
+
+class LUT(object):
+    """Look-up table on a grid of tie points expanded to full resolution by blocks
+
+    Values are interpolated separably: first along rows (only the tie point
+    columns), then along columns. Indices and weights of the tie points for each
+    axis depend only on offset and size of the block and are cached, so
+    expansion of a block costs a few multiply-adds per output pixel.
+
+    Parameters
+    -----------
+    rows : 1D array
+        row (line) coordinates of the tie points (ascending)
+    cols : 1D array
+        column (pixel) coordinates of the tie points (ascending)
+    values : 2D array
+        values at the tie points, shape (rows.size, cols.size). Complex values are
+        interpolated as complex.
+    order : int
+        1 - bilinear, 3 - cubic (Hermite spline) interpolation
+    cache_size : int
+        number of cached indices and weights (for one offset and size along one axis)
+    extrapolate : bool
+        extrapolate values outside the range of the tie points from the edge intervals.
+        If False, values are extended from the edge tie points.
+
+    """
+    def __init__(self, rows, cols, values, order=1, cache_size=64, extrapolate=False):
+        self.rows = np.asarray(rows, dtype=np.float64)
+        self.cols = np.asarray(cols, dtype=np.float64)
+        if np.iscomplexobj(values):
+            self.values = np.asarray(values, dtype=np.complex128)
+        else:
+            self.values = np.asarray(values, dtype=np.float64)
+        if self.values.shape != (self.rows.size, self.cols.size):
+            raise ValueError('Shape of values %s does not match number of tie points (%d, %d)'
+                             % (str(self.values.shape), self.rows.size, self.cols.size))
+        if order not in [1, 3]:
+            raise ValueError('Order of interpolation must be 1 or 3 (got %s)' % str(order))
+        self.order = order
+        self.cache_size = cache_size
+        self.extrapolate = extrapolate
+        self._weights = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_tie_points(cls, lines, pixels, values, **kwargs):
+        """Create LUT from 2D arrays of tie point coordinates (e.g. from S1 annotation)
+
+        Parameters
+        -----------
+        lines, pixels : 2D arrays
+            line and pixel coordinates of the tie points. Lines are taken from the
+            first column, pixels from the first row.
+        values : 2D array
+            values at the tie points
+        **kwargs : dict
+            parameters for LUT()
+
+        Returns
+        --------
+        lut : LUT
+
+        """
+        return cls(np.asarray(lines)[:, 0], np.asarray(pixels)[0, :], values, **kwargs)
+
+    def get_block(self, x_offset, y_offset, x_size, y_size, dtype=np.float32):
+        """Interpolate values onto block of the full resolution grid
+
+        Parameters
+        -----------
+        x_offset, y_offset : int
+            column and row of the upper left pixel of the block
+        x_size, y_size : int
+            number of columns and rows in the block
+        dtype : numpy dtype
+            data type of the output
+
+        Returns
+        --------
+        block : 2D array, shape (y_size, x_size)
+
+        """
+        row_indices, row_weights = self._get_weights('rows', y_offset, y_size)
+        col_indices, col_weights = self._get_weights('cols', x_offset, x_size)
+        return self._interpolate(row_indices, row_weights, col_indices, col_weights, dtype)
+
+    def get_grid(self, rows, cols, dtype=np.float32):
+        """Interpolate values onto a grid of arbitrary (e.g. fractional) rows and columns
+
+        Parameters
+        -----------
+        rows, cols : 1D arrays
+            coordinates of rows and columns of the grid
+        dtype : numpy dtype
+            data type of the output
+
+        Returns
+        --------
+        grid : 2D array, shape (rows.size, cols.size)
+
+        """
+        row_indices, row_weights = self._compute_weights(self.rows, rows)
+        col_indices, col_weights = self._compute_weights(self.cols, cols)
+        return self._interpolate(row_indices, row_weights, col_indices, col_weights, dtype)
+
+    def _interpolate(self, row_indices, row_weights, col_indices, col_weights, dtype):
+        """Interpolate values separably with indices and weights of tie points"""
+        # interpolate along rows on tie point columns only
+        values_cols = np.zeros((row_indices.shape[0], self.cols.size), dtype=self.values.dtype)
+        for i in range(row_indices.shape[1]):
+            values_cols += row_weights[:, i:i+1] * self.values[row_indices[:, i]]
+
+        # interpolate along columns
+        block = np.zeros((row_indices.shape[0], col_indices.shape[0]), dtype=self.values.dtype)
+        for i in range(col_indices.shape[1]):
+            block += col_weights[None, :, i] * values_cols[:, col_indices[:, i]]
+
+        return block.astype(dtype)
+
+    def _get_weights(self, axis, offset, size):
+        """Get (cached) indices and weights of tie points for each pixel along one axis
+
+        Parameters
+        -----------
+        axis : str
+            'rows' or 'cols'
+        offset, size : int
+            first pixel and number of pixels along the axis
+
+        Returns
+        --------
+        indices : 2D array, shape (size, order + 1)
+            indices of tie points used for each pixel
+        weights : 2D array, shape (size, order + 1)
+            weights of the tie points
+
+        """
+        key = (axis, offset, size)
+        with self._lock:
+            if key in self._weights:
+                self._weights[key] = self._weights.pop(key)
+                return self._weights[key]
+
+        indices, weights = self._compute_weights(
+            getattr(self, axis), np.arange(offset, offset + size, dtype=np.float64))
+
+        with self._lock:
+            self._weights[key] = (indices, weights)
+            while len(self._weights) > self.cache_size:
+                self._weights.popitem(last=False)
+        return indices, weights
+
+    def _compute_weights(self, tie_points, coords):
+        """Compute indices and weights of tie points for given coordinates along one axis
+
+        Parameters
+        -----------
+        tie_points : 1D array
+            coordinates of the tie points along the axis
+        coords : 1D array
+            coordinates of pixels along the axis
+
+        Returns
+        --------
+        indices, weights : 2D arrays, shape (coords.size, order + 1)
+
+        """
+        coords = np.asarray(coords, dtype=np.float64)
+        size = coords.size
+        last = tie_points.size - 1
+        if last == 0:
+            indices = np.zeros((size, 1), dtype=np.intp)
+            weights = np.ones((size, 1))
+        else:
+            # interval between tie points and position within the interval
+            index0 = np.clip(np.searchsorted(tie_points, coords, side='right') - 1, 0, last - 1)
+            t = (coords - tie_points[index0]) / (tie_points[index0 + 1] - tie_points[index0])
+            if not self.extrapolate:
+                t = np.clip(t, 0, 1)
+            if self.order == 1:
+                indices = np.column_stack([index0, index0 + 1])
+                weights = np.column_stack([1 - t, t])
+            else:
+                # cubic Hermite spline with tangents from neighbouring tie points
+                # (Catmull-Rom for regular tie points, one-sided tangents at edges)
+                index_l = np.maximum(index0 - 1, 0)
+                index_r = np.minimum(index0 + 2, last)
+                h = tie_points[index0 + 1] - tie_points[index0]
+                tangent0 = h / (tie_points[index0 + 1] - tie_points[index_l])
+                tangent1 = h / (tie_points[index_r] - tie_points[index0])
+                t2 = t * t
+                t3 = t2 * t
+                h00 = 2 * t3 - 3 * t2 + 1
+                h10 = t3 - 2 * t2 + t
+                h01 = -2 * t3 + 3 * t2
+                h11 = t3 - t2
+                indices = np.column_stack([index_l, index0, index0 + 1, index_r])
+                weights = np.column_stack([-h10 * tangent0,
+                                           h00 - h11 * tangent1,
+                                           h01 + h10 * tangent0,
+                                           h11 * tangent1])
+        return indices, weights
+
+
+class AzimuthLUT(LUT):
+    """Look-up table of azimuth (direction, degrees clockwise from North)
+
+    Azimuth is interpolated as a unit vector (complex number exp(i * azimuth)), so
+    interpolation is correct across 0 / 360 degrees. Parameters are the same as for
+    LUT but values are azimuths in degrees.
+
+    Examples
+    ---------
+    >>> # look direction of a right-looking SAR on the grid of geolocation tie points
+    >>> azimuth = AzimuthLUT.get_azimuth(longitude, latitude, axis=0, offset=90)
+    >>> lut = AzimuthLUT.from_tie_points(lines, pixels, azimuth)
+    >>> look_direction = lut.get_block(0, 0, 1000, 500)
+
+    """
+    def __init__(self, rows, cols, values, **kwargs):
+        values = np.exp(1j * np.radians(values))
+        super(AzimuthLUT, self).__init__(rows, cols, values, **kwargs)
+
+    def _interpolate(self, row_indices, row_weights, col_indices, col_weights, dtype):
+        """Interpolate unit vectors and convert them to azimuth in degrees (0 - 360)"""
+        block = super(AzimuthLUT, self)._interpolate(row_indices, row_weights,
+                                                     col_indices, col_weights, np.complex128)
+        return np.mod(np.degrees(np.angle(block)), 360).astype(dtype)
+
+    def get_components(self):
+        """Get LUTs of eastward (sine) and northward (cosine) components of azimuth
+
+        Bilinear interpolation of the components gives the same unit vectors as
+        interpolation of azimuth with AzimuthLUT, so direction computed from the
+        components (e.g. by pixel function UVToDirectionTo) is equal to azimuth.
+
+        Returns
+        --------
+        u_lut, v_lut : LUT
+
+        """
+        return [LUT(self.rows, self.cols, values, order=self.order, cache_size=self.cache_size,
+                    extrapolate=self.extrapolate)
+                for values in [self.values.imag, self.values.real]]
+
+    @staticmethod
+    def get_azimuth(lon, lat, axis=0, offset=0):
+        """Get azimuth of the direction of increasing rows or columns of a lon/lat grid
+
+        At each grid point bearings towards the next point and from the previous point
+        along the axis are computed on a sphere and averaged (only one of them is
+        available at the edges).
+
+        Parameters
+        -----------
+        lon, lat : 2D arrays
+            longitude and latitude of the grid points
+        axis : int
+            0 - direction of increasing rows, 1 - direction of increasing columns
+        offset : float
+            angle added to the azimuth (e.g. 90 for look direction of right-looking SAR)
+
+        Returns
+        --------
+        azimuth : 2D array
+            azimuth in degrees in range 0 - 360
+
+        """
+        lon = np.asarray(lon, dtype=np.float64)
+        lat = np.asarray(lat, dtype=np.float64)
+        if axis == 1:
+            lon, lat = lon.T, lat.T
+        forward = initial_bearing(lon[:-1], lat[:-1], lon[1:], lat[1:])
+        backward = initial_bearing(lon[1:], lat[1:], lon[:-1], lat[:-1]) + 180
+        vectors = np.zeros(lon.shape, dtype=np.complex128)
+        vectors[:-1] += np.exp(1j * np.radians(np.mod(forward + offset, 360)))
+        vectors[1:] += np.exp(1j * np.radians(np.mod(backward + offset, 360)))
+        azimuth = np.mod(np.degrees(np.angle(vectors)), 360)
+        if axis == 1:
+            azimuth = azimuth.T
+        return azimuth
@@ -0,0 +1,179 @@
+# Name:         fixed_record.py
+# Purpose:      Contains FixedRecordFile class definition
+# Licence:      This file is part of NANSAT. You can redistribute it or modify
+#               under the terms of GNU General Public License, v.3
+#               http://www.gnu.org/licenses/gpl-3.0.html
+from __future__ import absolute_import, division
+
+import os
+
+import numpy as np
+
+from nansat.lut import LUT
+
+
+class FixedRecordFile(object):
+    """Memory-mapped access to binary files with a header and fixed length records
+
+    Header and records are described by lists of fields (name, offset in bytes,
+    format and optional shape), e.g. ('lonlat', 640, '<i4', (51, 2)). Records are
+    mapped with np.memmap as an array of structured type, so reading a field or a
+    window of a field touches only the corresponding parts of the file.
+
+    Parameters
+    -----------
+    filename : str
+        name of the binary file
+    header_fields : list of tuples
+        (name, offset, format[, shape]) of fields in the header
+    record_fields : list of tuples
+        (name, offset, format[, shape]) of fields in each record
+    record_length : int
+        length of each record (bytes)
+    header_length : int
+        length of the header (bytes). The default is the record length.
+    n_records : int
+        number of records. The default is the number of full records in the file.
+
+    Raises
+    -------
+    ValueError : if the file is smaller than header and the requested records
+
+    Examples
+    ---------
+    >>> f = FixedRecordFile(filename, [('year', 84, '<u2')],
+    ...                     [('counts', 1264, '<u2', (2048, 5))], 22016)
+    >>> f.header['year']
+    >>> channel_1 = f.read_window('counts', (0, 0, 2048, 100), index=0)
+
+    """
+    def __init__(self, filename, header_fields, record_fields, record_length,
+                 header_length=None, n_records=None):
+        if header_length is None:
+            header_length = record_length
+        file_size = os.path.getsize(filename)
+        if file_size < header_length:
+            raise ValueError('%s: File is smaller than header (%d bytes)' %
+                             (filename, header_length))
+        if n_records is None:
+            n_records = (file_size - header_length) // record_length
+        if header_length + n_records * record_length > file_size:
+            raise ValueError('%s: File is smaller than %d records' % (filename, n_records))
+
+        self.filename = filename
+        self.header_dtype = self.get_dtype(header_fields, header_length)
+        self.record_dtype = self.get_dtype(record_fields, record_length)
+        self.header = np.fromfile(filename, self.header_dtype, count=1)[0]
+        self.records = np.memmap(filename, dtype=self.record_dtype, mode='r',
+                                 offset=header_length, shape=(n_records,))
+
+    @staticmethod
+    def get_dtype(fields, itemsize):
+        """Get structured numpy dtype from list of fields
+
+        Parameters
+        -----------
+        fields : list of tuples
+            (name, offset, format[, shape])
+        itemsize : int
+            total length of the structure (bytes)
+
+        Returns
+        --------
+        dtype : numpy.dtype
+
+        """
+        formats = [field[2] if len(field) == 3 else (field[2], field[3]) for field in fields]
+        return np.dtype({'names': [str(field[0]) for field in fields],
+                         'formats': formats,
+                         'offsets': [field[1] for field in fields],
+                         'itemsize': itemsize})
+
+    def __len__(self):
+        return self.records.shape[0]
+
+    def read_window(self, name, window=(), index=None, scale=1., offset=0., dtype=np.float32):
+        """Read window of a 2D field (row per record) and apply scaling
+
+        Parameters
+        -----------
+        name : str
+            name of the record field with shape (x_size,) or (x_size, n)
+        window : tuple
+            (x_offset, y_offset, x_size, y_size) or empty for the full field
+        index : int
+            index along the last dimension (e.g. channel) for 3D fields
+        scale, offset : float
+            data = raw * scale + offset
+        dtype : numpy dtype
+            data type of the output
+
+        Returns
+        --------
+        data : 2D array
+
+        """
+        field = self.records[name]
+        if index is not None:
+            field = field[..., index]
+        if window:
+            x_offset, y_offset, x_size, y_size = window
+            field = field[y_offset:y_offset + y_size, x_offset:x_offset + x_size]
+        data = field.astype(dtype)
+        if scale != 1:
+            data *= scale
+        if offset != 0:
+            data += offset
+        return data
+
+    def get_band_reader(self, name, index=None, scale=1., offset=0., dtype=np.float32):
+        """Get function for reading a window of the field in Nansat (see Nansat._read_band)
+
+        Parameters
+        -----------
+        name, index, scale, offset, dtype
+            see FixedRecordFile.read_window
+
+        Returns
+        --------
+        band_reader : function with GDAL band and window as input
+
+        """
+        def band_reader(band, window):
+            return self.read_window(name, window, index, scale, offset, dtype)
+        return band_reader
+
+    @staticmethod
+    def interpolate_tie_points(values, pixel_offset, pixel_step, x_size, longitude=False):
+        """Interpolate values from tie points along each row to all pixels of the row
+
+        Parameters
+        -----------
+        values : 2D array
+            values at tie points (row per record)
+        pixel_offset, pixel_step : int
+            pixel of the first tie point and step between tie points
+        x_size : int
+            number of pixels in a row
+        longitude : bool
+            values are longitudes (interpolated across the 180 meridian and
+            returned in the range [-180, 180))
+
+        Returns
+        --------
+        data : 2D array with shape (values.shape[0], x_size)
+
+        Note
+        -----
+        Values before the first and after the last tie point are extrapolated linearly.
+
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if longitude:
+            values = np.degrees(np.unwrap(np.radians(values), axis=1))
+        cols = pixel_offset + np.arange(values.shape[1]) * pixel_step
+        lut = LUT(np.arange(values.shape[0]), cols, values, extrapolate=True)
+        data = lut.get_block(0, 0, x_size, values.shape[0], np.float64)
+        if longitude:
+            data = np.mod(data + 180, 360) - 180
+        return data
@@ -7,24 +7,43 @@
 
 # Description of file format:
 # http://research.metoffice.gov.uk/research/interproj/nwpsaf/aapp/NWPSAF-MF-UD-003_Formats.pdf (page 120-)
-import sys
-import struct
 import datetime
-import warnings
+
+import numpy as np
 
 from nansat.exceptions import WrongMapperError
-from nansat.geolocation import Geolocation
 from nansat.vrt import VRT
+from nansat.utils import gdal
+from nansat.mappers.fixed_record import FixedRecordFile
 
 dataFormats = {1: 'LAC', 2: 'GAC', 3: 'HRPT'}
-dataSetQualityIndicatorOffset = 114
 recordLength = 29808
 headerLength = recordLength
 imageOffset = headerLength + 1092
 
+# (name, offset, format, shape) of fields in the header and in each scanline record
+headerFields = [('satID', 24, '<i4'),
+                ('year', 44, '<i4'),
+                ('dayOfYear', 48, '<i4'),
+                ('millisecondsOfDay', 52, '<i4'),
+                ('numScanLines', 72, '<i4'),
+                ('missingScanLines', 76, '<i4'),
+                ('numCalibratedScanLines', 80, '<i4'),
+                ('dataFormat', 88, '<i4')]
+recordFields = [('scanLineBits', 20, '<u4'),
+                ('lonlat', 676, '<i4', (51, 2)),  # latitude, longitude of tie points
+                ('counts', 1092, '<u2', (2048, 5))]
+
 
 class Mapper(VRT):
-    ''' VRT with mapping of WKV for AVHRR L1C output from AAPP '''
+    ''' VRT with mapping of WKV for AVHRR L1C output from AAPP
+
+    Header and scanline records are memory-mapped with FixedRecordFile (available
+    as self.aapp). Longitude and latitude are interpolated from tie points to full
+    swath and scaled albedo and brightness temperature are read by Nansat directly
+    from the file (see Nansat._read_band).
+
+    '''
 
     def __init__(self, filename, gdalDataset, gdalMetadata, **kwargs):
 
@@ -32,56 +51,39 @@ class Mapper(VRT):
         # Read metadata from binary file
         ########################################
         try:
-            fp = open(filename, 'rb')
-        except IOError:
-            raise WrongMapperError
-        fp.seek(24)
-        try:
-            satID = int(struct.unpack('<l', fp.read(4))[0])
-        except:
+            self.aapp = FixedRecordFile(filename, headerFields, recordFields, recordLength,
+                                        headerLength)
+        except (IOError, OSError, ValueError):
             raise WrongMapperError
+        header = self.aapp.header
+        satID = int(header['satID'])
 
         ##################
         # Read time
         ##################
-        fp.seek(44)
-        year = int(struct.unpack('<l', fp.read(4))[0])
-        dayofyear = int(struct.unpack('<l', fp.read(4))[0])
-        millisecondsOfDay = int(struct.unpack('<l', fp.read(4))[0])
         try:
-            time = (datetime.datetime(year, 1, 1) +
-                    datetime.timedelta(dayofyear - 1,
-                                       milliseconds=millisecondsOfDay))
-        except:
+            time = (datetime.datetime(int(header['year']), 1, 1) +
+                    datetime.timedelta(int(header['dayOfYear']) - 1,
+                                       milliseconds=int(header['millisecondsOfDay'])))
+        except (ValueError, OverflowError):
             raise WrongMapperError
 
-        fp.seek(72)
-        numScanLines = int(struct.unpack('<l', fp.read(4))[0])
-        missingScanLines = int(struct.unpack('<l', fp.read(4))[0])
-        numCalibratedScanLines = int(struct.unpack('<l', fp.read(4))[0])
+        numCalibratedScanLines = int(header['numCalibratedScanLines'])
+        if numCalibratedScanLines < 2 or numCalibratedScanLines > len(self.aapp):
+            raise WrongMapperError
+        missingScanLines = int(header['missingScanLines'])
         if missingScanLines != 0:
             print('WARNING: Missing scanlines: ' + str(missingScanLines))
 
-        fp.seek(88)
-        dataFormatNum = int(struct.unpack('<l', fp.read(4))[0])
+        dataFormatNum = int(header['dataFormat'])
+        if dataFormatNum not in dataFormats:
+            raise WrongMapperError
         dataFormat = dataFormats[dataFormatNum]
 
         # Determine if we have channel 3A (daytime) or channel 3B (nighttime)
-        def int2bitstring(s):
-            return str(s) if s <= 1 else int2bitstring(s >> 1) + str(s & 1)
-        fp.seek(headerLength + 20)
-        scanlinebitFirstline = int(struct.unpack('<L', fp.read(4))[0])
-        fp.seek(headerLength + recordLength*(numCalibratedScanLines-2) + 20)
-        scanlinebitLastline = int(struct.unpack('<L', fp.read(4))[0])
-
-        if int2bitstring(scanlinebitFirstline)[-1] == '0':
-            startsWith3A = True
-        else:
-            startsWith3A = False
-        if int2bitstring(scanlinebitLastline)[-1] == '0':
-            endsWith3A = True
-        else:
-            endsWith3A = False
+        # from the last bit of the scanline bit field in the first and last lines
+        scanLineBits = self.aapp.records['scanLineBits'][[0, numCalibratedScanLines - 2]]
+        startsWith3A, endsWith3A = (scanLineBits & 1) == 0
 
         if startsWith3A != endsWith3A:
             print('############################################')
@@ -92,71 +94,27 @@ class Mapper(VRT):
         ###########################
         # Make Geolocation Arrays
         ###########################
-        srcRasterYSize = numCalibratedScanLines
-
-        # Making VRT with raw (unscaled) lon and lat
-        # (smaller bands than full dataset)
-        self.band_vrts = {'RawGeolocVRT': VRT(srcRasterXSize=51,
-                                            srcRasterYSize=srcRasterYSize)}
-        RawGeolocMetaDict = []
-        for lonlatNo in range(1, 3):
-            RawGeolocMetaDict.append(
-                {'src': {'SourceFilename': filename,
-                         'SourceBand': 0,
-                         'SourceType': "RawRasterBand",
-                         'DataType': gdal.GDT_Int32,
-                         'ImageOffset': (headerLength + 676 +
-                                         (lonlatNo - 1) * 4),
-                         'PixelOffset': 8,
-                         'LineOffset': recordLength,
-                         'ByteOrder': 'LSB'},
-                 'dst': {}})
-
-        self.band_vrts['RawGeolocVRT'].create_bands(RawGeolocMetaDict)
-
-        # Make derived GeolocVRT with scaled lon and lat
-        self.band_vrts['GeolocVRT'] = VRT(srcRasterXSize=51,
-                                        srcRasterYSize=srcRasterYSize)
-        GeolocMetaDict = []
-        for lonlatNo in range(1, 3):
-            GeolocMetaDict.append(
-                {'src': {'SourceFilename': (self.band_vrts['RawGeolocVRT'].
-                                            filename),
-                         'SourceBand': lonlatNo,
-                         'ScaleRatio': 0.0001,
-                         'ScaleOffset': 0,
-                         'DataType': gdal.GDT_Int32},
-                 'dst': {}})
-
-        self.band_vrts['GeolocVRT'].create_bands(GeolocMetaDict)
-
-        GeolocObject = Geolocation(x_vrt=self.band_vrts['GeolocVRT'],
-                                        y_vrt=self.band_vrts['GeolocVRT'],
-                                        x_band=2, y_band=1,  # x = lon, y = lat
-                                        line_offset=0, pixel_offset=25,
-                                        line_step=1, pixel_step=40)
+        # scaled lon and lat from tie points (every 40th pixel from 25th)
+        # interpolated to full swath
+        lonlat = self.aapp.records['lonlat'][:numCalibratedScanLines] * 0.0001
+        lon = self.aapp.interpolate_tie_points(lonlat[:, :, 1], 25, 40, 2048, longitude=True)
+        lat = self.aapp.interpolate_tie_points(lonlat[:, :, 0], 25, 40, 2048)
 
         #######################
         # Initialize dataset
         #######################
         # create empty VRT dataset with geolocation only
         # (from Geolocation Array)
-        self._init_from_dataset_params(2048, numCalibratedScanLines,
-                                        (0,1,0,numCalibratedScanLines,0,-1),
-                                        GeolocObject.d['SRS'])
-        self._add_geolocation(GeolocObject)
-
+        self._init_from_lonlat(lon.astype(np.float32), lat.astype(np.float32), add_gcps=False)
 
         ##################
         # Create bands
         ##################
-        self.band_vrts['RawBandsVRT'] = VRT(
-            srcRasterXSize=2048,
-            srcRasterYSize=numCalibratedScanLines)
+        self.band_vrts['RawBandsVRT'] = VRT(2048, numCalibratedScanLines)
         RawMetaDict = []
         metaDict = []
 
-        centralWavelengths = [0.63, 0.86, np.NaN, 10.8, 12.0]
+        centralWavelengths = [0.63, 0.86, np.nan, 10.8, 12.0]
         if startsWith3A:
             centralWavelengths[2] = 1.6
             firstIRband = 4
@@ -220,16 +178,22 @@ class Mapper(VRT):
                          'units': 'kelvin',
                          'minmax': '-3 3'}})
 
-        self.self.band_vrts['RawBandsVRT'].create_bands(RawMetaDict)
-        self.create_bands(metaDict)
+        self.band_vrts['RawBandsVRT'].create_bands(RawMetaDict)
+
+        # scaled channels are read by Nansat directly from the file
+        self.band_readers = {}
+        for bandNo, bandDict in enumerate(metaDict[:5]):
+            name = self.create_band(bandDict['src'], bandDict['dst'])
+            self.band_readers[name] = self.aapp.get_band_reader('counts', bandNo, 0.01)
+        self.create_bands(metaDict[5:])
 
         globalMetadata = {}
         globalMetadata['satID'] = str(satID)
         globalMetadata['daytime'] = str(int(startsWith3A))
-        self.dataset.SetMetadata(globalMetadata)
+        globalMetadata['dataFormat'] = dataFormat
+        for key in globalMetadata:
+            self.dataset.SetMetadataItem(key, globalMetadata[key])
 
         # Adding valid time to dataset
         self.dataset.SetMetadataItem('time_coverage_start', time.isoformat())
         self.dataset.SetMetadataItem('time_coverage_end', time.isoformat())
-
-        return
@@ -25,8 +25,7 @@ class Mapper(ScatterometryMapper):
 
         super(Mapper, self).__init__(filename, gdal_dataset, metadata, quartile=quartile, *args, **kwargs)
 
-        lat = self.dataset.GetRasterBand(self._latitude_band_number(gdal_dataset)).ReadAsArray()
-        lon = self.dataset.GetRasterBand(self._longitude_band_number(gdal_dataset)).ReadAsArray()
+        lon, lat = self.read_geolocation(gdal_dataset)
         lon = ScatterometryMapper.shift_longitudes(lon)
         self.set_gcps(lon, lat, gdal_dataset)
 
@@ -18,13 +18,16 @@ from nansat.geolocation import Geolocation
 from nansat.vrt import VRT
 from nansat.utils import gdal, parse_time
 from nansat.exceptions import WrongMapperError
+from nansat.mappers.subdatasets import SubDatasets
 
 # TODO: remove WrongMapperError
 class Mapper(VRT):
+    SUPPORTS_HEADER_ONLY = True
+
     def __init__(self, inputFileName, gdalDataset, gdalMetadata, logLevel=30,
                  rmMetadatas=['NETCDF_VARNAME', '_Unsigned',
                               'ScaleRatio', 'ScaleOffset', 'dods_variable'],
-                 **kwargs):
+                 header_only=False, **kwargs):
         # Remove 'NC_GLOBAL#' and 'GDAL_' and 'NANSAT_'
         # from keys in gdalDataset
         tmpGdalMetadata = {}
@@ -43,11 +46,12 @@ class Mapper(VRT):
         fileExt = os.path.splitext(inputFileName)[1]
 
         # Get file names from dataset or subdataset
-        subDatasets = gdalDataset.GetSubDatasets()
+        subDatasets = SubDatasets(gdalDataset)
         if len(subDatasets) == 0:
             filenames = [inputFileName]
         else:
-            filenames = [f[0] for f in subDatasets]
+            filenames = subDatasets.names
+            subDatasets.open()
 
         # add bands with metadata and corresponding values to the empty VRT
         metaDict = []
@@ -56,7 +60,7 @@ class Mapper(VRT):
         firstXSize = 0
         firstYSize = 0
         for _, filename in enumerate(filenames):
-            subDataset = gdal.Open(filename)
+            subDataset = subDatasets[filename]
             # choose the first dataset whith grid
             if (firstXSize == 0 and firstYSize == 0 and
                     subDataset.RasterXSize >= 1 and subDataset.RasterYSize >= 1):
@@ -151,9 +155,9 @@ class Mapper(VRT):
         self._init_from_gdal_dataset(firstSubDataset, metadata=gdalMetadata)
 
         # add bands with metadata and corresponding values to the empty VRT
-        self.create_bands(metaDict)
-
-        self._create_complex_bands(filenames)
+        if not header_only:
+            self.create_bands(metaDict)
+            self._create_complex_bands(filenames)
 
         if len(projection) == 0:
             # projection was not set automatically
@@ -16,13 +16,24 @@ from nansat.utils import gdal, ogr
 from nansat.exceptions import WrongMapperError
 from nansat.vrt import VRT
 from nansat.mappers.hdf4_mapper import HDF4Mapper
+from nansat.mappers.subdatasets import SubDatasets
 
 
 class Mapper(HDF4Mapper):
     ''' VRT with mapping of WKV for MODIS Level 1 (QKM, HKM, 1KM) '''
 
-    def __init__(self, filename, gdalDataset, gdalMetadata, GCP_COUNT=30, **kwargs):
-        ''' Create MODIS_L1 VRT '''
+    def __init__(self, filename, gdalDataset, gdalMetadata, GCP_COUNT=30, GCP_MAX_ERROR=None,
+                 **kwargs):
+        ''' Create MODIS_L1 VRT
+
+        Parameters
+        ----------
+        GCP_COUNT : int
+            number of GCPs along each dimention
+        GCP_MAX_ERROR : float
+            if given, GCPs are added where lon/lat deviate from linear interpolation
+            between GCPs by more than GCP_MAX_ERROR meters (see VRT._lonlat2gcps)
+        '''
 
         #list of available modis names:resolutions
         modisResolutions = {'MYD02QKM': 250, 'MOD02QKM': 250,
@@ -38,7 +49,8 @@ class Mapper(HDF4Mapper):
         # get 1st subdataset and parse to VRT.__init__()
         # for retrieving geo-metadata
         try:
-            gdalSubDataset = gdal.Open(gdalDataset.GetSubDatasets()[0][0])
+            subDatasets = SubDatasets(gdalDataset)
+            gdalSubDataset = subDatasets[subDatasets.names[0]]
         except (AttributeError, IndexError):
             raise WrongMapperError
 
@@ -308,12 +320,16 @@ class Mapper(HDF4Mapper):
                       1000: metaDict1000SF,
                       }[mResolution]
 
-        # read all scales/offsets
+        # read all scales/offsets (open subdatasets and lon/lat concurrently)
+        lonSubdataset = subDatasets.find('Longitude')[0]
+        latSubdataset = subDatasets.find('Latitude')[0]
+        subDatasets.open([subDsString % (filename, sf) for sf in metaDictSF] +
+                         [lonSubdataset, latSubdataset])
         rScales = {}
         rOffsets = {}
         for sf in metaDictSF:
             dsName = subDsString % (filename, sf)
-            ds = gdal.Open(dsName)
+            ds = subDatasets[dsName]
             rScales[dsName] = list(map(float,
                                   ds.GetMetadataItem('radiance_scales').
                                   split(',')))
@@ -364,23 +380,21 @@ class Mapper(HDF4Mapper):
         self.dataset.SetMetadataItem('instrument', json.dumps(mm))
         self.dataset.SetMetadataItem('platform', json.dumps(ee))
 
-        lonSubdataset = [subdatasetName[0]
-                         for subdatasetName in gdalDataset.GetSubDatasets()
-                         if 'Longitude' in subdatasetName[1]][0]
-        latSubdataset = [subdatasetName[0]
-                         for subdatasetName in gdalDataset.GetSubDatasets()
-                         if 'Latitude' in subdatasetName[1]][0]
-        lons = gdal.Open(lonSubdataset).ReadAsArray()
-        lats = gdal.Open(latSubdataset).ReadAsArray()
-        gcps = []
-        rows = range(0, lons.shape[0], int(lons.shape[0]/GCP_COUNT))
-        cols = range(0, lons.shape[1], int(lons.shape[1]/GCP_COUNT))
-        factor = self.dataset.RasterYSize / lons.shape[0]
-        for r in rows:
-            for c in cols:
-                gcps.append(gdal.GCP(float(lons[r,c]),
-                                     float(lats[r,c]), 0,
-                                     factor*c+0.5,
-                                     factor*r+0.5))
+        lonDataset = subDatasets[lonSubdataset]
+        factor = self.dataset.RasterYSize / lonDataset.RasterYSize
+        # read only rows and columns of lon/lat at GCPs (unless GCPs are refined)
+        if GCP_MAX_ERROR is None:
+            steps = (max(1, int(float(lonDataset.RasterYSize) / GCP_COUNT)),
+                     max(1, int(float(lonDataset.RasterXSize) / GCP_COUNT)))
+            lons = subDatasets.read_decimated(lonSubdataset, steps)
+            lats = subDatasets.read_decimated(latSubdataset, steps)
+        else:
+            steps = (1, 1)
+            lons = lonDataset.ReadAsArray()
+            lats = subDatasets[latSubdataset].ReadAsArray()
+        gcps = VRT._lonlat2gcps(lons, lats, n_gcps=GCP_COUNT**2, max_error=GCP_MAX_ERROR,
+                                steps=(1, 1) if GCP_MAX_ERROR is None else None,
+                                pixel_step=factor * steps[1], line_step=factor * steps[0],
+                                pixel_offset=0.5, line_offset=0.5)
         self.dataset.SetGCPs(gcps, self.dataset.GetGCPProjection())
         self.tps = True
@@ -15,6 +15,7 @@ from netCDF4 import Dataset
 from nansat.vrt import VRT
 from nansat.nsr import NSR
 from nansat.utils import parse_time
+from nansat.mappers.subdatasets import SubDatasets
 
 from nansat.exceptions import WrongMapperError, NansatMissingProjectionError
 
@@ -29,6 +30,8 @@ class Mapper(VRT):
     """
     """
     input_filename = ''
+    SUPPORTS_HEADER_ONLY = True
+    _subdatasets = None
 
     def __init__(self, filename, gdal_dataset, gdal_metadata, *args, **kwargs):
 
@@ -67,22 +70,30 @@ class Mapper(VRT):
         #    # Probably Nansat generated netcdf of swath data - see issue #192
         #    raise WrongMapperError
 
+        # Subdatasets are opened once (concurrently) and reused by all methods below
+        self._subdatasets = SubDatasets(gdal_dataset)
+
         # Create empty VRT dataset with geo-reference
         self._create_empty(gdal_dataset, metadata)
 
         # Add bands with metadata and corresponding values to the empty VRT
-        self.create_bands(self._band_list(gdal_dataset, metadata, *args, **kwargs))
+        # (skipped if only metadata and georeference are requested)
+        if not kwargs.pop('header_only', False):
+            self.create_bands(self._band_list(gdal_dataset, metadata, *args, **kwargs))
 
-        # Check size?
-        #xsize, ysize = self.ds_size(sub0)
+            # Check size?
+            #xsize, ysize = self.ds_size(sub0)
 
-        # Create complex bands from *_real and *_imag bands (the function is in
-        # vrt.py)
-        self._create_complex_bands(self._get_sub_filenames(gdal_dataset))
+            # Create complex bands from *_real and *_imag bands (the function is in
+            # vrt.py)
+            self._create_complex_bands(self._get_sub_filenames(gdal_dataset))
 
         # Set GCMD/DIF compatible metadata if available
         self._set_time_coverage_metadata(metadata)
 
+        # Close subdatasets (they are cached only while the mapper is created)
+        self._subdatasets = None
+
         # Then add remaining GCMD/DIF compatible metadata in inheriting mappers
 
     def times(self):
@@ -195,10 +206,12 @@ class Mapper(VRT):
             "standard_name" or "metno_name", etc.
         '''
         metadictlist = []
-        for fn in self._get_sub_filenames(gdal_dataset):
-            if ('GEOLOCATION_X_DATASET' in fn or 'longitude' in fn or
-                    'GEOLOCATION_Y_DATASET' in fn or 'latitude' in fn):
-                continue
+        fns = [fn for fn in self._get_sub_filenames(gdal_dataset)
+               if not ('GEOLOCATION_X_DATASET' in fn or 'longitude' in fn or
+                       'GEOLOCATION_Y_DATASET' in fn or 'latitude' in fn)]
+        if self._subdatasets is not None and not bands:
+            self._subdatasets.open(fns)
+        for fn in fns:
             try:
                 metadictlist.append(self._get_band_from_subfile(fn, netcdf_dim=netcdf_dim, bands=bands))
             except ContinueI:
@@ -274,13 +287,20 @@ class Mapper(VRT):
 
         get_band_number()
 
-        subds = gdal.Open(fn)
+        subds = self._open_subdataset(fn)
         band = subds.GetRasterBand(Context.band_number)
         band_metadata = self._clean_band_metadata(band)
 
         return self._band_dict(fn, Context.band_number, subds, band=band,
                         band_metadata=band_metadata)
 
+    def _open_subdataset(self, fn):
+        """ Get subdataset opened in Mapper.__init__ or open it with GDAL
+        """
+        if self._subdatasets is None:
+            return gdal.Open(fn)
+        return self._subdatasets[fn]
+
     def _clean_band_metadata(self, band, remove = ['_Unsigned', 'ScaleRatio',
         'ScaleOffset', 'PixelFunctionType']):
 
@@ -394,7 +414,7 @@ class Mapper(VRT):
     def _create_empty_from_projection_variable(self, gdal_dataset, gdal_metadata,
             projection_variable='projection_lambert'):
         ds = Dataset(self.input_filename)
-        subdataset = gdal.Open(self._get_sub_filenames(gdal_dataset)[0])
+        subdataset = self._open_subdataset(self._get_sub_filenames(gdal_dataset)[0])
         self._init_from_dataset_params(
                     x_size = subdataset.RasterXSize,
                     y_size = subdataset.RasterYSize,
@@ -413,7 +433,7 @@ class Mapper(VRT):
         else:
             # Loop subdatasets and check for projection
             for fn in self._get_sub_filenames(gdal_dataset):
-                sub = gdal.Open(fn)
+                sub = self._open_subdataset(fn)
                 if sub.GetProjection():
                     no_projection = False
                     break
@@ -435,7 +455,7 @@ class Mapper(VRT):
         if  len(fn) == 0:
             subdataset = gdal_dataset
         else:
-            subdataset = gdal.Open(fn[0])
+            subdataset = self._open_subdataset(fn[0])
 
         self._init_from_dataset_params(
                     x_size = subdataset.RasterXSize,
@@ -2,6 +2,8 @@ from nansat.mappers.sentinel1 import Sentinel1
 from nansat.mappers.mapper_netcdf_cf import Mapper as NetCDF_CF_Mapper
 
 class Mapper(Sentinel1, NetCDF_CF_Mapper):
+    # calibrated bands are added in any case
+    SUPPORTS_HEADER_ONLY = False
 
     def __init__(self, filename, gdal_dataset, gdal_metadata, *args, **kwargs):
         NetCDF_CF_Mapper.__init__(self, filename, gdal_dataset, gdal_metadata, *args, **kwargs)
@@ -9,12 +9,14 @@ from math import ceil
 from dateutil.parser import parse
 
 import json
+import numpy as np
 import pythesint as pti
 
 from nansat.utils import gdal, ogr
 from nansat.vrt import VRT
 from nansat.nsr import NSR
 from nansat.mappers.obpg import OBPGL2BaseClass
+from nansat.mappers.subdatasets import SubDatasets
 
 from nansat.exceptions import WrongMapperError
 
@@ -27,12 +29,15 @@ class Mapper(OBPGL2BaseClass):
     '''
 
     def __init__(self, filename, gdalDataset, gdalMetadata,
-                 GCP_COUNT=10, **kwargs):
+                 GCP_COUNT=10, GCP_MAX_ERROR=None, **kwargs):
         ''' Create VRT
         Parameters
         ----------
         GCP_COUNT : int
             number of GCPs along each dimention
+        GCP_MAX_ERROR : float
+            if given, GCPs are added where lon/lat deviate from linear interpolation
+            between GCPs by more than GCP_MAX_ERROR meters (see VRT._lonlat2gcps)
         '''
 
         # should raise error in case of not obpg_l2 file
@@ -47,11 +52,12 @@ class Mapper(OBPGL2BaseClass):
         # get subdataset and parse to VRT.__init__()
         # for retrieving geo-metadata
         # but NOT from longitude or latitude because it can be smaller!
-        subDatasets = gdalDataset.GetSubDatasets()
+        subDatasets = SubDatasets(gdalDataset)
+        subDatasets.open()
         for subDataset in subDatasets:
             if ('longitude' not in subDataset[1] and
                     'latitude' not in subDataset[1]):
-                gdalSubDataset = gdal.Open(subDataset[0])
+                gdalSubDataset = subDatasets[subDataset[0]]
                 break
 
         if title is 'GOCI Level-2 Data':
@@ -134,7 +140,7 @@ class Mapper(OBPGL2BaseClass):
             if subBandName in allBandsDict:
                 # get name, slope, intercept
                 self.logger.debug('name: %s' % subBandName)
-                tmpSubDataset = gdal.Open(subDataset[0])
+                tmpSubDataset = subDatasets[subDataset[0]]
                 tmpSubMetadata = tmpSubDataset.GetMetadata()
                 slope = tmpSubMetadata.get('slope', '1')
                 intercept = tmpSubMetadata.get('intercept', '0')
@@ -212,13 +218,10 @@ class Mapper(OBPGL2BaseClass):
         # add GCPs
         geolocationMetadata = gdalSubDataset.GetMetadata('GEOLOCATION')
         xDatasetSource = geolocationMetadata['X_DATASET']
-        xDataset = gdal.Open(xDatasetSource)
+        xDataset = subDatasets[xDatasetSource]
 
         yDatasetSource = geolocationMetadata['Y_DATASET']
-        yDataset = gdal.Open(yDatasetSource)
-
-        longitude = xDataset.ReadAsArray()
-        latitude = yDataset.ReadAsArray()
+        yDataset = subDatasets[yDatasetSource]
 
         # estimate pixel/line step of the geolocation arrays
         pixelStep = int(ceil(float(gdalSubDataset.RasterXSize) /
@@ -230,46 +233,40 @@ class Mapper(OBPGL2BaseClass):
         # ==== ADD GCPs and Pojection ====
 
         # estimate step of GCPs
-        step0 = max(1, int(float(latitude.shape[0]) / GCP_COUNT))
-        step1 = max(1, int(float(latitude.shape[1]) / GCP_COUNT))
+        step0 = max(1, int(float(xDataset.RasterYSize) / GCP_COUNT))
+        step1 = max(1, int(float(xDataset.RasterXSize) / GCP_COUNT))
         if str(title) == 'VIIRSN Level-2 Data':
             step0 = 64
         self.logger.debug('gcpCount: >%s<, %d %d %f %d %d',
                           title,
-                          latitude.shape[0], latitude.shape[1],
+                          xDataset.RasterYSize, xDataset.RasterXSize,
                           GCP_COUNT, step0, step1)
 
-        # generate list of GCPs
-        dx = .5
-        dy = .5
-        gcps = []
-        k = 0
-        center_lon = 0
-        center_lat = 0
-        for i0 in range(0, latitude.shape[0], step0):
-            for i1 in range(0, latitude.shape[1], step1):
-                # create GCP with X,Y,pixel,line from lat/lon matrices
-                lon = float(longitude[i0, i1])
-                lat = float(latitude[i0, i1])
-                if (lon >= -180 and lon <= 180 and lat >= -90 and lat <= 90):
-                    gcp = gdal.GCP(lon, lat, 0, i1 * pixelStep + dx,
-                                   i0 * lineStep + dy)
-                    self.logger.debug('%d %d %d %f %f',
-                                      k, gcp.GCPPixel, gcp.GCPLine,
-                                      gcp.GCPX, gcp.GCPY)
-                    gcps.append(gcp)
-                    center_lon += gcp.GCPX
-                    center_lat += gcp.GCPY
-                    k += 1
+        # read only rows and columns of lon/lat at GCPs (unless GCPs are refined)
+        if GCP_MAX_ERROR is None:
+            readSteps = (step0, step1)
+            longitude = subDatasets.read_decimated(xDatasetSource, readSteps)
+            latitude = subDatasets.read_decimated(yDatasetSource, readSteps)
+        else:
+            readSteps = (1, 1)
+            longitude = xDataset.ReadAsArray()
+            latitude = yDataset.ReadAsArray()
 
+        # generate list of GCPs
+        gcps = VRT._lonlat2gcps(longitude, latitude, max_error=GCP_MAX_ERROR,
+                                steps=(step0 // readSteps[0], step1 // readSteps[1]),
+                                pixel_step=pixelStep * readSteps[1],
+                                line_step=lineStep * readSteps[0],
+                                pixel_offset=.5, line_offset=.5)
+        self.logger.debug('Number of GCPs: %d', len(gcps))
 
         # append GCPs and lat/lon projection to the vsiDataset
         self.dataset.SetGCPs(gcps, NSR().wkt)
         self._remove_geolocation()
 
         # reproject GCPs
-        center_lon /= k
-        center_lat /= k
+        center_lon = np.mean([gcp.GCPX for gcp in gcps])
+        center_lat = np.mean([gcp.GCPY for gcp in gcps])
         srs = '+proj=stere +datum=WGS84 +ellps=WGS84 +lon_0=%f +lat_0=%f +no_defs' % (center_lon, center_lat)
         self.reproject_gcps(srs)
 
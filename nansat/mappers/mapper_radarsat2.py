@@ -7,25 +7,21 @@
 from __future__ import unicode_literals, division, absolute_import
 import os
 import zipfile
+import functools
 import json
 from dateutil.parser import parse
 
 import numpy as np
-try:
-    import scipy.ndimage
-except:
-    IMPORT_SCIPY = False
-else:
-    IMPORT_SCIPY = True
 
 import pythesint as pti
 
 from nansat.nsr import NSR
 from nansat.vrt import VRT
+from nansat.lut import AzimuthLUT
 from nansat.domain import Domain
 from nansat.node import Node
-from nansat.utils import initial_bearing, gdal
-from nansat.exceptions import WrongMapperError, NansatReadError
+from nansat.utils import gdal
+from nansat.exceptions import WrongMapperError
 
 
 class Mapper(VRT):
@@ -67,9 +63,6 @@ class Mapper(VRT):
                 raise WrongMapperError(filename)
             productXml = open(productXmlName).read()
 
-        if not IMPORT_SCIPY:
-            raise NansatReadError('Radarsat-2 data cannot be read because scipy is not installed')
-
         # parse product.XML
         rs2_0 = Node.create(productXml)
 
@@ -163,47 +156,16 @@ class Mapper(VRT):
 
         '''
         if str(passDirection).upper() == 'DESCENDING':
-            sat_heading = initial_bearing(lon[:, :-1], lat[:, :-1],
-                                          lon[:, 1:], lat[:, 1:]) + 90
+            heading_offset = 90
         elif str(passDirection).upper() == 'ASCENDING':
-            sat_heading = initial_bearing(lon[:, 1:], lat[:, 1:],
-                                          lon[:, :-1], lat[:, :-1]) + 90
+            heading_offset = 270
         else:
             print('Can not decode pass direction: ' + str(passDirection))
 
-        # Calculate SAR look direction
-        look_direction = sat_heading + antennaPointing
-        # Interpolate to regain lost row
-        look_direction = np.mod(look_direction, 360)
-        look_direction = scipy.ndimage.interpolation.zoom(
-            look_direction, (1, 11./10.))
-        # Decompose, to avoid interpolation errors around 0 <-> 360
-        look_direction_u = np.sin(np.deg2rad(look_direction))
-        look_direction_v = np.cos(np.deg2rad(look_direction))
-        look_u_VRT = VRT.from_array(look_direction_u)
-        look_v_VRT = VRT.from_array(look_direction_v)
-
-        # Note: If incidence angle and look direction are stored in
-        #       same VRT, access time is about twice as large
-        lookVRT = VRT.from_lonlat(lon, lat)
-        lookVRT.create_band(
-            [{'SourceFilename': look_u_VRT.filename, 'SourceBand': 1},
-             {'SourceFilename': look_v_VRT.filename, 'SourceBand': 1}],
-            {'PixelFunctionType': 'UVToDirectionTo'})
-
-        # Blow up to full size
-        lookVRT = lookVRT.get_resized_vrt(gdalDataset.RasterXSize, gdalDataset.RasterYSize)
-        # Store VRTs so that they are accessible later
-        self.band_vrts['look_u_VRT'] = look_u_VRT
-        self.band_vrts['look_v_VRT'] = look_v_VRT
-        self.band_vrts['lookVRT'] = lookVRT
-
-        # Add band to full sized VRT
-        lookFileName = self.band_vrts['lookVRT'].filename
-        metaDict.append({'src': {'SourceFilename': lookFileName,
-                                 'SourceBand': 1},
-                         'dst': {'wkv': 'sensor_azimuth_angle',
-                                 'name': 'look_direction'}})
+        # Calculate SAR look direction on the grid of tie points
+        look_direction = AzimuthLUT.get_azimuth(lon, lat, axis=1,
+                                                offset=heading_offset + antennaPointing)
+        metaDict.append(self.get_look_direction_band(look_direction, 100))
 
         ###############################
         # Create bands
@@ -286,6 +248,44 @@ class Mapper(VRT):
                                      ['surface_backwards_scattering_coefficient_of_radar_wave']))
         self.dataset.SetMetadataItem('entry_id', os.path.basename(filename))
 
+    def get_look_direction_band(self, look_direction, step):
+        """ Get metadata of SAR look direction band, add its band reader and full size VRTs
+
+        Look direction is expanded by blocks from an AzimuthLUT when the band is read with
+        Nansat. Sine and cosine components of the same LUT are sampled into full size VRTs
+        (see VRT.vrts_from_luts) for the GDAL band, to avoid interpolation errors around
+        0 <-> 360 and to give the same values after crop, reproject or export.
+
+        Parameters
+        ----------
+        look_direction : 2D array
+            look direction (degrees) on the grid of tie points
+        step : int
+            distance (pixels) between the tie points
+
+        Returns
+        -------
+        meta_dict : dict
+            metadata of the look direction band (see VRT.create_bands)
+
+        """
+        look_lut = AzimuthLUT(np.arange(look_direction.shape[0]) * step,
+                              np.arange(look_direction.shape[1]) * step,
+                              look_direction, extrapolate=True)
+        self.band_readers = {'look_direction': functools.partial(self.read_lut_band,
+                                                                 lut=look_lut)}
+        look_u_lut, look_v_lut = look_lut.get_components()
+        # Store VRTs so that they are accessible later
+        self.band_vrts.update(self.vrts_from_luts({'look_u_VRT': look_u_lut,
+                                                  'look_v_VRT': look_v_lut}))
+        return {'src': [{'SourceFilename': self.band_vrts['look_u_VRT'].filename,
+                         'SourceBand': 1},
+                        {'SourceFilename': self.band_vrts['look_v_VRT'].filename,
+                         'SourceBand': 1}],
+                'dst': {'wkv': 'sensor_azimuth_angle',
+                        'PixelFunctionType': 'UVToDirectionTo',
+                        'name': 'look_direction'}}
+
     def init_from_xml(self, productXml, filename):
         ''' Fast init from metada in XML only '''
         numberOfLines = int(productXml
@@ -11,24 +11,24 @@
 import warnings
 
 import os
+import re
+import copy
 import glob
+import hashlib
+import functools
+import tempfile
 import zipfile
 import numpy as np
 from dateutil.parser import parse
 import xml.etree.ElementTree as ET
 
-try:
-    import scipy
-except:
-    IMPORT_SCIPY = False
-else:
-    IMPORT_SCIPY = True
-
 import json
 import pythesint as pti
 
 from nansat.vrt import VRT
-from nansat.utils import gdal, initial_bearing
+from nansat.lut import LUT, AzimuthLUT
+from nansat.aux_cache import AuxCache
+from nansat.utils import gdal
 from nansat.exceptions import WrongMapperError, NansatReadError
 from nansat.nsr import NSR
 from nansat.node import Node
@@ -48,18 +48,29 @@ class Mapper(VRT):
         If True, no bands are added to the dataset and georeference is not corrected.
         If False, all bands are added and GCPs are corrected if necessary
         (see Mapper.correct_geolocation_data for details).
+    fixgcp : bool
+        Correct GCPs for height? (see Mapper.correct_geolocation_data)
+    header_only : bool
+        If True, no bands are added to the dataset (as with fast=True) but georeference
+        is corrected (if fixgcp=True).
+    cache_dir : str
+        directory for caching of decoded annotation, manifest, calibration and
+        noise data (see Mapper.load_aux_data). If None, environment variable
+        NANSAT_AUX_CACHE is used. If it is not set, caching is switched off.
 
     Note
     ----
-    Creates self.dataset and populates it with S1 bands (when fast=False).
+    Creates self.dataset and populates it with S1 bands (when fast=False and header_only=False).
     """
-    def __init__(self, filename, gdalDataset, gdalMetadata, fast=False, fixgcp=True, **kwargs):
+    SUPPORTS_HEADER_ONLY = True
+    # version of the format of cached data (increase if content of cache is changed)
+    AUX_DATA_VERSION = 1
+
+    def __init__(self, filename, gdalDataset, gdalMetadata, fast=False, fixgcp=True,
+                 cache_dir=None, header_only=False, **kwargs):
         if not os.path.split(filename.rstrip('/'))[1][:3] in ['S1A', 'S1B']:
             raise WrongMapperError('%s: Not Sentinel 1A or 1B' %filename)
 
-        if not IMPORT_SCIPY:
-            raise NansatReadError('Sentinel-1 data cannot be read because scipy is not installed')
-
         if zipfile.is_zipfile(filename):
             zz = zipfile.PyZipFile(filename)
             # Assuming the file names are consistent, the polarization
@@ -99,19 +110,30 @@ class Mapper(VRT):
         mds_files = {os.path.basename(ff).split('-')[3].upper():ff for ff in mds_files}
         polarizations = list(mds_files.keys())
 
-        # read annotation files
-        self.annotation_data = self.read_annotation(annotation_files)
+        # get decoded data from cache (if any)
+        if cache_dir is None:
+            cache_dir = os.getenv(AuxCache.ENV_VAR)
+        aux_data = self.load_aux_data(filename, cache_dir)
+        aux_data_updated = False
+
+        # read annotation and manifest files
+        if 'annotation' not in aux_data or 'manifest' not in aux_data:
+            aux_data['annotation'] = self.read_annotation(annotation_files)
+            aux_data['manifest'] = self.read_manifest_data(manifest_files[0])
+            aux_data_updated = True
+        # geolocation data can be corrected: keep the original in aux_data
+        self.annotation_data = copy.deepcopy(aux_data['annotation'])
         if not fast and fixgcp:
             self.correct_geolocation_data()
-
-        # read manifest file
-        manifest_data = self.read_manifest_data(manifest_files[0])
+        manifest_data = aux_data['manifest']
 
         # very fast constructor without any bands only with some metadata and geolocation
         self._init_empty(manifest_data, self.annotation_data, filename)
 
-        # skip adding bands in the fast mode and RETURN
-        if fast:
+        # skip adding bands in the fast or header_only mode and RETURN
+        if fast or header_only:
+            if aux_data_updated:
+                self.save_aux_data(filename, cache_dir, aux_data)
             return
 
         # Open data files with GDAL
@@ -125,34 +147,47 @@ class Mapper(VRT):
         # Check metadata to confirm it is Sentinel-1 L1
         metadata = gdalDatasets[polarizations[0]].GetMetadata()
 
-        # create full size VRTs with incidenceAngle and elevationAngle
-        annotation_vrts = self.vrts_from_arrays(self.annotation_data,
-                                                ['incidenceAngle', 'elevationAngle'])
-        self.band_vrts.update(annotation_vrts)
-
-        # create full size VRTS with calibration LUT
+        # read calibration LUT
         calibration_names = ['sigmaNought', 'betaNought']
         calibration_list_tag = 'calibrationVectorList'
         for calibration_file in calibration_files:
             pol = '_' + os.path.basename(calibration_file).split('-')[4].upper()
-            xml = self.read_vsi(calibration_file)
-            calibration_data = self.read_calibration(xml, calibration_list_tag, calibration_names, pol)
-            calibration_vrts = self.vrts_from_arrays(calibration_data, calibration_names, pol, True, 1)
-            self.band_vrts.update(calibration_vrts)
+            if 'calibration' + pol not in aux_data:
+                xml = self.read_vsi(calibration_file)
+                aux_data['calibration' + pol] = self.read_calibration(
+                    xml, calibration_list_tag, calibration_names, pol)
+                aux_data_updated = True
 
-        # create full size VRTS with noise LUT
+        # read noise LUT
         for noise_file in noise_files:
             pol = '_' + os.path.basename(noise_file).split('-')[4].upper()
-            xml = self.read_vsi(noise_file)
-            if '<noiseVectorList' in xml:
-                noise_list_tag = 'noiseVectorList'
-                noise_name = 'noiseLut'
-            elif '<noiseRangeVectorList' in xml:
-                noise_list_tag = 'noiseRangeVectorList'
-                noise_name = 'noiseRangeLut'
-            noise_data = self.read_calibration(xml, noise_list_tag, [noise_name], pol)
-            noise_vrts = self.vrts_from_arrays(noise_data, [noise_name], pol, True, 1)
-            self.band_vrts.update(noise_vrts)
+            if 'noise' + pol not in aux_data:
+                xml = self.read_vsi(noise_file)
+                if '<noiseVectorList' in xml:
+                    noise_list_tag = 'noiseVectorList'
+                    noise_name = 'noiseLut'
+                elif '<noiseRangeVectorList' in xml:
+                    noise_list_tag = 'noiseRangeVectorList'
+                    noise_name = 'noiseRangeLut'
+                aux_data['noise' + pol] = self.read_calibration(xml, noise_list_tag,
+                                                                [noise_name], pol)
+                aux_data['noise' + pol]['noise_name'] = noise_name
+                aux_data_updated = True
+            noise_name = aux_data['noise' + pol]['noise_name']
+
+        if aux_data_updated:
+            self.save_aux_data(filename, cache_dir, aux_data)
+
+        # create full size VRTs with incidence and elevation angles, calibration and noise
+        # from the same LUTs as used by the band readers
+        luts = self.get_luts(aux_data, polarizations)
+        vrt_names = {'incidence_angle': 'incidenceAngle', 'elevation_angle': 'elevationAngle'}
+        for pol in polarizations:
+            vrt_names['sigmaNought_' + pol] = 'sigmaNought_' + pol
+            vrt_names['betaNought_' + pol] = 'betaNought_' + pol
+            vrt_names['noise_' + pol] = aux_data['noise_' + pol]['noise_name'] + '_' + pol
+        self.band_vrts.update(self.vrts_from_luts(
+            dict((vrt_names[name], luts[name]) for name in vrt_names)))
 
         #### Create metaDict: dict with metadata for all bands
         metaDict = []
@@ -203,39 +238,11 @@ class Mapper(VRT):
         https://github.com/nansencenter/sentinel1denoised
         '''
 
-        # Get look direction
-        longitude, latitude = self.transform_points(calibration_data['pixel'].flatten(),
-                                                    calibration_data['line'].flatten())
-        longitude.shape = calibration_data['pixel'].shape
-        latitude.shape = calibration_data['pixel'].shape
-        sat_heading = initial_bearing(longitude[:-1, :],
-                                      latitude[:-1, :],
-                                      longitude[1:, :],
-                                      latitude[1:, :])
-        look_direction = scipy.ndimage.interpolation.zoom(
-            np.mod(sat_heading + 90, 360),
-            (np.shape(longitude)[0] / (np.shape(longitude)[0]-1.), 1))
-
+        # Get look direction (S1 is right-looking) from the same LUT as the band reader.
         # Decompose, to avoid interpolation errors around 0 <-> 360
-        look_direction_u = np.sin(np.deg2rad(look_direction))
-        look_direction_v = np.cos(np.deg2rad(look_direction))
-        look_u_VRT = VRT.from_array(look_direction_u)
-        look_v_VRT = VRT.from_array(look_direction_v)
-        lookVRT = VRT.from_lonlat(longitude, latitude)
-        lookVRT.create_band([{'SourceFilename': look_u_VRT.filename,
-                               'SourceBand': 1},
-                              {'SourceFilename': look_v_VRT.filename,
-                               'SourceBand': 1}],
-                             {'PixelFunctionType': 'UVToDirectionTo'}
-                             )
-
-        # Blow up to full size
-        lookVRT = lookVRT.get_resized_vrt(self.dataset.RasterXSize, self.dataset.RasterYSize, 1)
-
-        # Store VRTs so that they are accessible later
-        self.band_vrts['look_u_VRT'] = look_u_VRT
-        self.band_vrts['look_v_VRT'] = look_v_VRT
-        self.band_vrts['lookVRT'] = lookVRT
+        look_u_lut, look_v_lut = luts['look_direction'].get_components()
+        self.band_vrts.update(self.vrts_from_luts({'look_u': look_u_lut,
+                                                   'look_v': look_v_lut}))
 
         metaDict = []
         # Add bands to full size VRT
@@ -268,12 +275,11 @@ class Mapper(VRT):
         bandNumberDict[name] = bnmax+1
         bnmax = bandNumberDict[name]
         metaDict.append({
-            'src': {
-                'SourceFilename': self.band_vrts['lookVRT'].filename,
-                'SourceBand': 1
-            },
+            'src': [{'SourceFilename': self.band_vrts['look_u'].filename, 'SourceBand': 1},
+                    {'SourceFilename': self.band_vrts['look_v'].filename, 'SourceBand': 1}],
             'dst': {
                 'wkv': 'sensor_azimuth_angle',
+                'PixelFunctionType': 'UVToDirectionTo',
                 'name': name
             }
         })
@@ -361,9 +367,194 @@ class Mapper(VRT):
             self.create_band(src, dst)
             self.dataset.FlushCache()
 
+        # LUTs are expanded to full resolution by blocks when bands are read with Nansat
+        self.band_readers = self.get_band_readers(luts, polarizations, bandNumberDict,
+                                                  gdalDatasets)
+
+    def get_luts(self, aux_data, polarizations):
+        """ Get LUTs with tie points of annotation, calibration and noise data
+
+        Incidence and elevation angles are interpolated with cubic splines,
+        calibration and noise LUTs and look direction - bilinearly, at the actual positions
+        of the tie points (from the original annotation, before correction of geolocation).
+
+        Parameters
+        ----------
+        aux_data : dict
+            decoded annotation, calibration and noise data (see Mapper.load_aux_data)
+        polarizations : list of str
+            HH, HV, etc
+
+        Returns
+        -------
+        luts : dict
+            LUTs with names of bands (incidence_angle, elevation_angle, look_direction,
+            noise_HH, sigmaNought_HH, betaNought_HH, etc) as keys
+
+        """
+        annotation = aux_data['annotation']
+        luts = {}
+        for name, var_name in [('incidence_angle', 'incidenceAngle'),
+                               ('elevation_angle', 'elevationAngle')]:
+            luts[name] = LUT.from_tie_points(annotation['line'], annotation['pixel'],
+                                             annotation[var_name], order=3)
+        luts['look_direction'] = AzimuthLUT.from_tie_points(
+            annotation['line'], annotation['pixel'], self.get_look_direction(annotation))
+        for pol in polarizations:
+            noise_data = aux_data['noise_' + pol]
+            noise_name = noise_data['noise_name'] + '_' + pol
+            luts['noise_' + pol] = LUT.from_tie_points(noise_data['line'], noise_data['pixel'],
+                                                       noise_data[noise_name])
+            calibration_data = aux_data['calibration_' + pol]
+            for var_name in ['sigmaNought', 'betaNought']:
+                luts[var_name + '_' + pol] = LUT.from_tie_points(
+                    calibration_data['line'], calibration_data['pixel'],
+                    calibration_data[var_name + '_' + pol])
+        return luts
+
+    def get_band_readers(self, luts, polarizations, band_numbers, gdal_datasets):
+        """ Get functions for reading LUT and calibrated bands (see Nansat._read_band)
+
+        Parameters
+        ----------
+        luts : dict
+            LUTs with names of bands as keys (see Mapper.get_luts)
+        polarizations : list of str
+            HH, HV, etc
+        band_numbers : dict
+            band numbers with band names as keys
+        gdal_datasets : dict
+            GDAL datasets with DN for each polarization
+
+        Returns
+        -------
+        band_readers : dict
+            functions with band name as key and GDAL band and window as input
+
+        """
+        band_readers = {}
+        for name in ['incidence_angle', 'elevation_angle', 'look_direction']:
+            band_readers[name] = functools.partial(self.read_lut_band, lut=luts[name])
+        for pol in polarizations:
+            band_readers['noise_' + pol] = functools.partial(self.read_lut_band,
+                                                             lut=luts['noise_' + pol])
+            band_readers['sigmaNought_' + pol] = functools.partial(
+                self.read_lut_band, lut=luts['sigmaNought_' + pol])
+            # pixel function Sentinel1Calibration is kept for complex data
+            data_type = gdal_datasets[pol].GetRasterBand(1).DataType
+            if gdal.DataTypeIsComplex(data_type):
+                continue
+            for var_name, cal_name in [('sigmaNought', 'sigma0'), ('betaNought', 'beta0')]:
+                band_readers[cal_name + '_' + pol] = functools.partial(
+                    self.read_calibrated_band, dn_band=band_numbers['DN_' + pol],
+                    lut=luts[var_name + '_' + pol])
+        return band_readers
+
+    @staticmethod
+    def get_look_direction(annotation_data):
+        """ Get look direction (azimuth of the range direction) on the geolocation grid
+
+        Parameters
+        ----------
+        annotation_data : dict
+            geolocation grid (see Mapper.read_annotation)
+
+        Returns
+        -------
+        look_direction : 2D array
+            azimuth (degrees) of the satellite heading plus 90 degrees
+
+        """
+        return AzimuthLUT.get_azimuth(annotation_data['longitude'],
+                                      annotation_data['latitude'], axis=0, offset=90)
+
+    @staticmethod
+    def read_calibrated_band(band, window, dn_band, lut):
+        """ Read window of sigma0 or beta0 band as DN^2 / LUT^2 (see Mapper.get_band_readers) """
+        dn = band.GetDataset().GetRasterBand(dn_band).ReadAsArray(*window).astype(np.float32)
+        return dn ** 2 / lut.get_block(*window) ** 2
+
+    def get_aux_data_filename(self, filename, cache_dir):
+        """ Get name of the cache file with decoded data of the product
+
+        The name contains product ID and digest of the full path, modification time,
+        size of the product and version of the cache format.
+
+        """
+        product_id = os.path.splitext(os.path.basename(filename.rstrip('/')))[0]
+        stat = os.stat(filename)
+        parameters = (os.path.abspath(filename), stat.st_mtime, stat.st_size,
+                      self.AUX_DATA_VERSION)
+        digest = hashlib.sha1(repr(parameters).encode()).hexdigest()[:16]
+        return os.path.join(cache_dir, '%s_%s.npz' % (product_id, digest))
+
+    def load_aux_data(self, filename, cache_dir):
+        """ Load decoded annotation, manifest, calibration and noise data from the cache
+
+        Parameters
+        ----------
+        filename : str
+            name of the product (zip file or SAFE directory)
+        cache_dir : str or None
+            cache directory. If None, caching is switched off.
+
+        Returns
+        -------
+        aux_data : dict
+            sections ('annotation', 'manifest', 'calibration_HH', 'noise_HH', etc)
+            with dicts of arrays and values. Empty if the product is not in the cache.
+
+        """
+        if cache_dir is None:
+            return {}
+        try:
+            npz = np.load(self.get_aux_data_filename(filename, cache_dir), allow_pickle=False)
+        except (IOError, OSError, ValueError, zipfile.BadZipfile):
+            return {}
+        aux_data = {}
+        with npz:
+            for key in npz.files:
+                section, name = key.split('/', 1)
+                value = npz[key]
+                if value.ndim == 0:
+                    value = value.item()
+                elif value.dtype.kind == 'U':
+                    value = value.tolist()
+                aux_data.setdefault(section, {})[name] = value
+        if 'annotation' in aux_data:
+            aux_data['annotation']['shape'] = tuple(aux_data['annotation']['shape'].tolist())
+        return aux_data
+
+    def save_aux_data(self, filename, cache_dir, aux_data):
+        """ Save decoded data into the cache (see Mapper.load_aux_data)
+
+        The file is first written under temporary name and then renamed, so
+        concurrent processes never read incomplete files.
+
+        """
+        if cache_dir is None:
+            return
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        arrays = {}
+        for section in aux_data:
+            for name, value in aux_data[section].items():
+                arrays['%s/%s' % (section, name)] = np.asarray(value)
+        fd, tmp_filename = tempfile.mkstemp(suffix='.npz', dir=cache_dir)
+        try:
+            with os.fdopen(fd, 'wb') as npz_file:
+                np.savez(npz_file, **arrays)
+            os.rename(tmp_filename, self.get_aux_data_filename(filename, cache_dir))
+        finally:
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
 
     def read_calibration(self, xml, vectorListName, variable_names, pol):
         """ Read calibration data from calibration or noise XML files
+
+        All vectors are decoded at once (see read_element_values) and truncated
+        to the minimum length of vectors
+
         Parameters
         ----------
         xml : str
@@ -381,35 +572,75 @@ class Mapper(VRT):
             Calibration or noise data. Keys:
             The same as variable_names + 'pixel', 'line'
         """
-        data = {}
-        n = Node.create(xml)
-        vecList = n.node(vectorListName)
-        data['pixel'] = []
-        data['line'] = []
-        for var_name in variable_names:
-            data[var_name+pol] = []
-        xLengths = []
-        for vec in vecList.children:
-            xVec = list(map(int, vec['pixel'].split()))
-            xLengths.append(len(xVec))
-            data['pixel'].append(xVec)
-            data['line'].append(int(vec['line']))
-            for var_name in variable_names:
-                data[var_name+pol].append(np.fromiter(vec[var_name].split(), float))
-
-        # truncate data['pixel'] and var_name to minimum length for all rows
-        minLength = np.min(xLengths)
-        data['pixel'] = [x[:minLength] for x in data['pixel']]
-        for var_name in variable_names:
-            data[var_name+pol] = [d[:minLength] for d in data[var_name+pol]]
+        values = self.read_element_values(xml, vectorListName, ['pixel', 'line'] + variable_names)
+        # number of values in each vector
+        lengths = np.array([len(pixel.split()) for pixel in values['pixel']])
+        min_length = lengths.min()
+        # indices of the first min_length values of each vector in the concatenated vectors
+        indices = (np.cumsum(lengths) - lengths)[:, None] + np.arange(min_length)
 
-        data['pixel'] = np.array(data['pixel'])
+        data = {}
+        data['pixel'] = self.decode_values(values['pixel'], int, lengths.sum())[indices]
         for var_name in variable_names:
-            data[var_name+pol] = np.array(data[var_name+pol])
-        data['line'] = np.array([data['line'], ]*np.shape(data['pixel'])[1]).transpose()
+            data[var_name+pol] = self.decode_values(values[var_name], float,
+                                                    lengths.sum())[indices]
+        line = self.decode_values(values['line'], int, len(lengths))
+        data['line'] = np.repeat(line[:, None], min_length, axis=1)
 
         return data
 
+    @staticmethod
+    def read_element_values(xml, parent_tag, tags):
+        """ Get text of all elements with given tags inside of the first <parent_tag> element
+
+        A light-weight alternative to Node for reading large lists of simple elements
+        (e.g. calibrationVectorList or geolocationGridPointList): the text is extracted
+        with one regular expression per tag without building the tree.
+
+        Parameters
+        ----------
+        xml : str
+            XML document
+        parent_tag : str
+            tag of the element containing the required elements
+        tags : list of str
+            tags of the required elements (without children)
+
+        Returns
+        -------
+        values : dict
+            list of strings for each tag
+
+        """
+        start = xml.index('<' + parent_tag)
+        end = xml.index('</' + parent_tag, start)
+        return {tag: re.findall(r'<%s(?:\s[^>]*)?>([^<]*)</%s>' % (tag, tag), xml[start:end])
+                for tag in tags}
+
+    @staticmethod
+    def decode_values(strings, dtype, size):
+        """ Convert list of strings with space separated numbers into one 1D array
+
+        Parameters
+        ----------
+        strings : list of str
+            strings with numbers
+        dtype : type
+            type of output array
+        size : int
+            expected number of values
+
+        Returns
+        -------
+        values : 1D numpy.ndarray
+
+        """
+        values = np.fromstring(' '.join(strings), dtype=dtype, sep=' ')
+        if values.size != size:
+            raise NansatReadError('Inconsistent number of values in LUT '
+                                  '(%d instead of %d)' % (values.size, size))
+        return values
+
     def read_annotation(self, annotation_files):
         """ Read lon, lat, etc from annotation XML
 
@@ -429,19 +660,12 @@ class Mapper(VRT):
 
         """
         variable_names = ['pixel', 'line', 'longitude', 'latitude', 'height', 'incidenceAngle', 'elevationAngle']
-        data = {var_name:[] for var_name in variable_names}
 
         xml = self.read_vsi(annotation_files[0])
-        xml = Node.create(xml)
-        geolocation_points = xml.node('geolocationGrid').node('geolocationGridPointList').children
-        # collect data from XML into dictionary with lists
-        for point in geolocation_points:
-            for var_name in variable_names:
-                data[var_name].append(point[var_name])
-
-        # convert lists to 1D arrays
-        for var_name in variable_names:
-            data[var_name] = np.fromiter(data[var_name], float)
+        values = self.read_element_values(xml, 'geolocationGridPointList', variable_names)
+        n_points = len(values['pixel'])
+        data = {var_name: self.decode_values(values[var_name], float, n_points)
+                for var_name in variable_names}
 
         # get shape of geolocation matrix (number of occurence of minimal element)
         data['shape'] = (data['pixel']==0).sum(), (data['line']==0).sum()
@@ -451,9 +675,10 @@ class Mapper(VRT):
             data[var_name].shape = data['shape']
 
         # get raster dimentions
-        image_info = xml.node('imageAnnotation').node('imageInformation')
-        data['x_size'] = int(image_info.node('numberOfSamples').value)
-        data['y_size'] = int(image_info.node('numberOfLines').value)
+        image_info = self.read_element_values(xml, 'imageInformation',
+                                              ['numberOfSamples', 'numberOfLines'])
+        data['x_size'] = int(image_info['numberOfSamples'][0])
+        data['y_size'] = int(image_info['numberOfLines'][0])
 
         # get list of polarizations
         data['pol'] = []
@@ -537,10 +762,8 @@ class Mapper(VRT):
         gcps : list with GDAL GCPs
 
         """
-        gcps = []
-        for xi, yi, zi, pi, li in zip(x.flat, y.flat, z.flat, p.flat, l.flat):
-            gcps.append(gdal.GCP(xi, yi, zi, pi, li))
-        return gcps
+        return [gdal.GCP(xi, yi, zi, pi, li) for xi, yi, zi, pi, li in
+                zip(*[np.asarray(v, float).flatten().tolist() for v in (x, y, z, p, l)])]
 
     def read_manifest_data(self, input_file):
         """ Read information (time_coverage_start, etc) manifest XML
@@ -564,7 +787,7 @@ class Mapper(VRT):
         data = {}
         xml = self.read_vsi(input_file)
         # set time as acquisition start time
-        n = Node.create(xml)
+        n = Node.create(xml, tags=['metadataSection'])
         meta = n.node('metadataSection')
         for nn in meta.children:
             if str(nn.getAttribute('ID')) == 'acquisitionPeriod':
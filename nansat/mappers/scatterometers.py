@@ -17,6 +17,8 @@ class Mapper(NetcdfCF):
 
     def __init__(self, filename, gdal_dataset, metadata, quartile=0, *args, **kwargs):
 
+        # in the header_only mode bands are not created and geolocation is read from subdatasets
+        self.header_only = kwargs.get('header_only', False)
         super(Mapper, self).__init__(filename, gdal_dataset, metadata, *args, **kwargs)
 
         intervals = [0,1,2,3]
@@ -28,6 +30,7 @@ class Mapper(NetcdfCF):
 
         # Crop
         self.set_offset_size('y', y_offset, y_size)
+        self._y_offset, self._y_size = int(y_offset), int(y_size)
 
         # Add quartile to metadata
         self.dataset.SetMetadataItem('quartile', str(quartile))
@@ -38,6 +41,8 @@ class Mapper(NetcdfCF):
         tt = self.times()[int(y_offset) : int(y_offset + y_size)]
         self.dataset.SetMetadataItem('time_coverage_start', tt[0].astype(datetime).isoformat())
         self.dataset.SetMetadataItem('time_coverage_end', tt[-1].astype(datetime).isoformat())
+        if self.header_only:
+            return
         time_stamps = (tt - tt[0]) / np.timedelta64(1, 's')
         self.band_vrts['time'] = VRT.from_array(
                 np.tile(time_stamps, (self.dataset.RasterXSize, 1)).transpose()
@@ -63,9 +68,32 @@ class Mapper(NetcdfCF):
         self.dataset.SetGCPs(VRT._lonlat2gcps(lon, lat, n_gcps=400), NSR().wkt)
 
         # Add geolocation from correct longitudes and latitudes
-        self._add_geolocation(
-                Geolocation(self.band_vrts['new_lon_VRT'], self, x_band=1, y_band=self._latitude_band_number(gdal_dataset))
-            )
+        if self.header_only:
+            # the VRT has no bands to refer to
+            self.band_vrts['new_lat_VRT'] = VRT.from_array(lat)
+            self._add_geolocation(
+                    Geolocation(self.band_vrts['new_lon_VRT'], self.band_vrts['new_lat_VRT'])
+                )
+        else:
+            self._add_geolocation(
+                    Geolocation(self.band_vrts['new_lon_VRT'], self, x_band=1, y_band=self._latitude_band_number(gdal_dataset))
+                )
+
+    def read_geolocation(self, gdal_dataset):
+        """ Read longitudes and latitudes of the selected quartile
+
+        The arrays are read from the VRT bands or, in the header_only mode, from the subdatasets
+        """
+        lonlat = []
+        for band_number in [self._longitude_band_number(gdal_dataset),
+                            self._latitude_band_number(gdal_dataset)]:
+            if self.header_only:
+                sub_dataset = gdal.Open(self._get_sub_filenames(gdal_dataset)[band_number - 1])
+                lonlat.append(sub_dataset.GetRasterBand(1).ReadAsArray(
+                    0, self._y_offset, sub_dataset.RasterXSize, self._y_size))
+            else:
+                lonlat.append(self.dataset.GetRasterBand(band_number).ReadAsArray())
+        return lonlat
 
     def _geoloc_band_number(self, gdal_dataset, sub_filename_index, long_name):
         """ Return the band number associated to a specific geolocation sub-file and long_name
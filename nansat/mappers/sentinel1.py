@@ -1,21 +1,15 @@
 import json
 import numpy as np
 from dateutil.parser import parse
-try:
-    import scipy
-except:
-    IMPORT_SCIPY = False
-else:
-    IMPORT_SCIPY = True
-
 from netCDF4 import Dataset
 
 import pythesint as pti
 
 from nansat.nsr import NSR
 from nansat.vrt import VRT
-from nansat.utils import initial_bearing, gdal
-from nansat.exceptions import WrongMapperError, NansatReadError
+from nansat.lut import AzimuthLUT
+from nansat.utils import gdal
+from nansat.exceptions import WrongMapperError
 
 class Sentinel1(VRT):
     """ Mapper class to access Sentinel-1 data with netCDF4 to work for both opendap streams and
@@ -30,9 +24,6 @@ class Sentinel1(VRT):
         if not self.dataset.GetMetadataItem('SATELLITE_IDENTIFIER') or \
                 not self.dataset.GetMetadataItem('SATELLITE_IDENTIFIER').lower()=='sentinel-1':
             raise WrongMapperError('%s: Not Sentinel 1A or 1B' %filename)
-        if not IMPORT_SCIPY:
-            raise NansatReadError('Sentinel-1 data cannot be read because scipy is not installed')
-
 
         self.input_filename = filename
         try:
@@ -136,42 +127,25 @@ class Sentinel1(VRT):
 
     def add_look_direction_band(self):
         lon, lat = self.get_full_size_GCPs()
-        """
-        TODO: Also in mapper_sentinel1_l1.py... Use this code there..
-        """
-        sat_heading = initial_bearing(lon[:-1, :], lat[:-1, :], lon[1:, :], lat[1:, :])
-        look_direction = scipy.ndimage.interpolation.zoom( np.mod(sat_heading + 90, 360),
-                (np.shape(lon)[0] / (np.shape(lon)[0]-1.), 1))
+        # Look direction of right-looking SAR (see also mapper_sentinel1_l1.py)
+        look_direction = AzimuthLUT.get_azimuth(lon, lat, axis=0, offset=90)
 
         # Decompose, to avoid interpolation errors around 0 <-> 360
-        look_direction_u = np.sin(np.deg2rad(look_direction))
-        look_direction_v = np.cos(np.deg2rad(look_direction))
-        look_u_VRT = VRT.from_array(look_direction_u)
-        look_v_VRT = VRT.from_array(look_direction_v)
-        lookVRT = VRT.from_lonlat(lon, lat)
-        lookVRT.create_band([{'SourceFilename': look_u_VRT.filename,
-                               'SourceBand': 1},
-                              {'SourceFilename': look_v_VRT.filename,
-                               'SourceBand': 1}],
-                             {'PixelFunctionType': 'UVToDirectionTo'}
-                             )
-
-        # Blow up to full size
-        lookVRT = lookVRT.get_resized_vrt(self.dataset.RasterXSize, self.dataset.RasterYSize, 1)
-
-        # Store VRTs so that they are accessible later
-        self.band_vrts['look_u_VRT'] = look_u_VRT
-        self.band_vrts['look_v_VRT'] = look_v_VRT
-        self.band_vrts['lookVRT'] = lookVRT
-
-        src = {
-                'SourceFilename': self.band_vrts['lookVRT'].filename,
-                'SourceBand': 1
-            }
+        look_u_VRT = VRT.from_array(np.sin(np.radians(look_direction)))
+        look_v_VRT = VRT.from_array(np.cos(np.radians(look_direction)))
+
+        # Blow up to full size and store VRTs so that they are accessible later
+        self.band_vrts['look_u_VRT'] = look_u_VRT.get_resized_vrt(self.dataset.RasterXSize,
+                                                                  self.dataset.RasterYSize, 1)
+        self.band_vrts['look_v_VRT'] = look_v_VRT.get_resized_vrt(self.dataset.RasterXSize,
+                                                                  self.dataset.RasterYSize, 1)
+
+        src = [{'SourceFilename': self.band_vrts['look_u_VRT'].filename, 'SourceBand': 1},
+               {'SourceFilename': self.band_vrts['look_v_VRT'].filename, 'SourceBand': 1}]
         dst = {
                 'wkv': 'sensor_azimuth_angle',
+                'PixelFunctionType': 'UVToDirectionTo',
                 'name': 'look_direction'
             }
         self.create_band(src, dst)
         self.dataset.FlushCache()
-        """ End repetition """
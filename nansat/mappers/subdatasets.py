@@ -0,0 +1,128 @@
+# Name:         subdatasets.py
+# Purpose:      Contains SubDatasets class definition
+# Licence:      This file is part of NANSAT. You can redistribute it or modify
+#               under the terms of GNU General Public License, v.3
+#               http://www.gnu.org/licenses/gpl-3.0.html
+from __future__ import absolute_import
+
+import os
+import threading
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+
+from nansat.utils import gdal
+
+
+class SubDatasets(object):
+    """Concurrent opening of subdatasets of container files (HDF4, HDF5, netCDF)
+
+    Subdatasets are kept open for the life of the object, so mappers can inspect
+    metadata, size and bands of all subdatasets without opening them again. They
+    can be opened by a pool of threads (each open is a round-trip on network file
+    systems), but older GDAL drivers do not serialise access to HDF4/HDF5 libraries
+    which are not thread safe, so concurrent opening must be switched on explicitly.
+
+    Parameters
+    -----------
+    gdal_dataset : gdal.Dataset
+        container dataset
+    threads : int
+        number of threads. If None, environment variable NANSAT_SUBDATASET_THREADS
+        is used (default 1). If 1, subdatasets are opened sequentially.
+
+    Examples
+    ---------
+    >>> subdatasets = SubDatasets(gdal_dataset)
+    >>> subdatasets.open()
+    >>> sizes = [(subdatasets[name].RasterXSize, subdatasets[name].RasterYSize)
+    ...          for name in subdatasets.names]
+
+    """
+    ENV_VAR = 'NANSAT_SUBDATASET_THREADS'
+
+    def __init__(self, gdal_dataset, threads=None):
+        if threads is None:
+            threads = int(os.getenv(self.ENV_VAR, 1))
+        self.threads = threads
+        self.subdatasets = gdal_dataset.GetSubDatasets()
+        self.names = [subdataset[0] for subdataset in self.subdatasets]
+        self._datasets = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.subdatasets)
+
+    def __getitem__(self, name):
+        """Get opened subdataset (open if not yet opened)"""
+        with self._lock:
+            if name in self._datasets:
+                return self._datasets[name]
+        return self.open([name])[0]
+
+    def find(self, text):
+        """Get names of subdatasets with <text> in description"""
+        return [name for name, description in self.subdatasets if text in description]
+
+    def open(self, names=None):
+        """Open subdatasets concurrently
+
+        Parameters
+        -----------
+        names : list of str
+            names of subdatasets to open. If None, all subdatasets are opened.
+
+        Returns
+        --------
+        datasets : list of gdal.Dataset (or None if a subdataset cannot be opened)
+
+        """
+        if names is None:
+            names = self.names
+        with self._lock:
+            new_names = [name for name in set(names) if name not in self._datasets]
+        if len(new_names) > 1 and self.threads > 1:
+            pool = ThreadPool(min(self.threads, len(new_names)))
+            try:
+                datasets = pool.map(self._open, new_names)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            datasets = [self._open(name) for name in new_names]
+        with self._lock:
+            for name, dataset in zip(new_names, datasets):
+                self._datasets.setdefault(name, dataset)
+            return [self._datasets[name] for name in names]
+
+    @staticmethod
+    def _open(name):
+        """Open subdataset (None if it cannot be opened)"""
+        try:
+            return gdal.Open(name)
+        except RuntimeError:
+            return None
+
+    def read_decimated(self, name, steps, band=1):
+        """Read only every n-th row and column of a band
+
+        Parameters
+        -----------
+        name : str
+            name of subdataset
+        steps : tuple of two int
+            steps along rows and columns
+
+        Returns
+        --------
+        array : 2D array with rows 0, steps[0], 2*steps[0], ... and columns
+            0, steps[1], 2*steps[1], ...
+
+        """
+        gdal_band = self[name].GetRasterBand(band)
+        rows = range(0, gdal_band.YSize, steps[0])
+        return np.vstack([gdal_band.ReadAsArray(0, row, gdal_band.XSize, 1)[:, ::steps[1]]
+                          for row in rows])
@@ -0,0 +1,456 @@
+# Name:    mosaic.py
+# Purpose: Container of Mosaic class
+# Licence:
+# This file is part of NANSAT.
+# NANSAT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+# http://www.gnu.org/licenses/gpl-3.0.html
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+from __future__ import absolute_import, division
+
+import json
+import datetime
+import threading
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+
+from nansat.nansat import Nansat
+
+
+class Statistics(object):
+    """Running per-pixel statistics of one band accumulated from many scenes
+
+    All buffers have the shape of the destination Domain and are allocated once.
+    Scenes are added block by block with Statistics.update().
+
+    Median is estimated from per-pixel histograms which need median_bins counters per
+    pixel. To bound memory use, histograms are kept only for a block of rows at a time
+    (see Statistics.median_blocks): median of the block is computed with
+    Statistics.flush_median() and scenes are added again for the next block.
+
+    Parameters
+    -----------
+    shape : tuple
+        (rows, columns) of the destination Domain
+    statistics : list of str
+        names of statistics to compute (see Mosaic.STATISTICS)
+    median_range : tuple
+        (min, max) of the histogram used for estimation of median
+    median_bins : int
+        number of bins in the histogram used for estimation of median
+    n_sources : int
+        number of scenes. Defines data types of indices of scenes and of histograms
+        (int32 and uint32 if not given).
+    median_max_bytes : int
+        maximum size of histograms in one block of rows (no limit if not given)
+
+    """
+    BLOCK_SIZE = 10000000
+
+    def __init__(self, shape, statistics, median_range=None, median_bins=100, n_sources=None,
+                 median_max_bytes=None):
+        self.statistics = statistics
+        self.shape = tuple(shape)
+        self.count = np.zeros(shape, np.int32)
+        if n_sources is None:
+            n_sources = np.iinfo(np.int32).max
+        # -1 is stored for pixels without data. Byte is not used (int8 is exported as Byte)
+        index_dtype = np.promote_types(np.min_scalar_type(-n_sources), np.int16)
+        if 'mean' in statistics or 'std' in statistics:
+            self.mean = np.zeros(shape, np.float64)
+            self.m2 = np.zeros(shape, np.float64)
+        if 'min' in statistics:
+            self.min = np.zeros(shape, np.float64) + np.inf
+            self.min_index = np.zeros(shape, index_dtype) - 1
+        if 'max' in statistics:
+            self.max = np.zeros(shape, np.float64) - np.inf
+            self.max_index = np.zeros(shape, index_dtype) - 1
+        if 'latest' in statistics:
+            self.latest = np.zeros(shape, np.float64) + np.nan
+            self.latest_time = np.zeros(shape, np.float64) - np.inf
+            self.latest_index = np.zeros(shape, index_dtype) - 1
+        if 'median' in statistics:
+            if median_range is None:
+                raise ValueError('median_range must be given for median')
+            self.median_edges = np.linspace(median_range[0], median_range[1], median_bins + 1)
+            # each scene adds at most one value to a pixel: counts cannot overflow
+            if n_sources <= np.iinfo(np.uint16).max:
+                self.histogram_dtype = np.dtype(np.uint16)
+            else:
+                self.histogram_dtype = np.dtype(np.uint32)
+            self.median = np.zeros(shape, np.float32) + np.nan
+            height, width = self.shape
+            block_rows = height
+            if median_max_bytes is not None:
+                row_bytes = median_bins * width * self.histogram_dtype.itemsize
+                block_rows = max(1, median_max_bytes // max(1, row_bytes))
+            self.median_blocks = [(row, min(block_rows, height - row))
+                                  for row in range(0, height, block_rows)] or [(0, 0)]
+            self.set_median_rows(*self.median_blocks[0])
+
+    def set_median_rows(self, row, n_rows):
+        """Allocate empty histograms for a block of rows (other rows are ignored by update)
+
+        Parameters
+        -----------
+        row : int
+            offset of the block (rows)
+        n_rows : int
+            number of rows in the block
+
+        """
+        self.median_rows = (row, n_rows)
+        self.histogram = np.zeros((self.median_edges.size - 1, n_rows, self.shape[1]),
+                                  self.histogram_dtype)
+
+    def update(self, row, data, valid, index, time, median_only=False):
+        """Add block of data from one scene to the statistics
+
+        Parameters
+        -----------
+        row : int
+            offset of the block (rows) in the destination Domain
+        data : numpy.ndarray
+            2D block of data from the scene
+        valid : numpy.ndarray
+            2D boolean mask of valid pixels in the block
+        index : int
+            index of the scene (stored as provenance of min, max and latest)
+        time : float
+            time of the scene (larger - later)
+        median_only : bool
+            update only histograms for median (scene is added again for the next block
+            of rows)
+
+        """
+        rows = slice(row, row + data.shape[0])
+        valid_rows, valid_cols = np.nonzero(valid)
+        valid_rows += row
+        values = data[valid].astype(np.float64)
+
+        if 'median' in self.statistics:
+            first_row, n_rows = self.median_rows
+            inside = (valid_rows >= first_row) * (valid_rows < first_row + n_rows)
+            n_bins = self.histogram.shape[0]
+            bins = np.searchsorted(self.median_edges, values[inside], side='right') - 1
+            bins = np.clip(bins, 0, n_bins - 1)
+            self.histogram[bins, valid_rows[inside] - first_row, valid_cols[inside]] += 1
+
+        if median_only:
+            return
+
+        count = self.count[valid_rows, valid_cols] + 1
+        self.count[valid_rows, valid_cols] = count
+
+        if 'mean' in self.statistics or 'std' in self.statistics:
+            # Welford's online algorithm
+            mean = self.mean[valid_rows, valid_cols]
+            delta = values - mean
+            mean += delta / count
+            self.m2[valid_rows, valid_cols] += delta * (values - mean)
+            self.mean[valid_rows, valid_cols] = mean
+
+        if 'min' in self.statistics:
+            self._update_extreme(self.min[rows], self.min_index[rows], data, valid, index, np.less)
+
+        if 'max' in self.statistics:
+            self._update_extreme(self.max[rows], self.max_index[rows], data, valid, index,
+                                 np.greater)
+
+        if 'latest' in self.statistics:
+            latest_time = self.latest_time[rows]
+            latest_index = self.latest_index[rows]
+            newer = valid * ((time > latest_time) + (time == latest_time) * (index > latest_index))
+            self.latest[rows][newer] = data[newer]
+            latest_time[newer] = time
+            latest_index[newer] = index
+
+    @staticmethod
+    def _update_extreme(extreme, extreme_index, data, valid, index, compare):
+        """Update min or max and index of the scene (ties go to the smaller index)"""
+        better = valid * (compare(data, extreme) +
+                          (data == extreme) * (index < extreme_index))
+        extreme[better] = data[better]
+        extreme_index[better] = index
+
+    def flush_median(self):
+        """Estimate median of the current block of rows from the histograms and free them
+
+        Median is estimated with precision of half of the bin width: the two middle
+        order statistics are taken as centres of the bins where they fall and averaged
+        (as in numpy.median).
+
+        """
+        centres = (self.median_edges[:-1] + self.median_edges[1:]) / 2.
+        n_bins, height, width = self.histogram.shape
+        first_row = self.median_rows[0]
+        block_rows = max(1, self.BLOCK_SIZE // max(1, n_bins * width))
+        for row in range(0, height, block_rows):
+            cumulative = np.cumsum(self.histogram[:, row:row + block_rows], axis=0,
+                                   dtype=np.int32)
+            count = cumulative[-1]
+            median = np.zeros(count.shape, np.float64)
+            for rank in [(count - 1) // 2, count // 2]:
+                median_bin = np.minimum((cumulative <= rank).sum(axis=0), n_bins - 1)
+                median += centres[median_bin] / 2.
+            median[count == 0] = np.nan
+            self.median[first_row + row:first_row + row + count.shape[0]] = median
+        self.histogram = None
+
+    def get_arrays(self):
+        """Get final arrays of all statistics
+
+        Returns
+        --------
+        arrays : list of tuples
+            (suffix, numpy.ndarray) for each computed statistic and provenance
+
+        """
+        empty = self.count == 0
+        arrays = []
+        for statistic in self.statistics:
+            if statistic == 'count':
+                arrays.append(('count', self.count))
+            elif statistic == 'mean':
+                arrays.append(('mean', np.where(empty, np.nan, self.mean).astype(np.float32)))
+            elif statistic == 'std':
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    std = np.sqrt(self.m2 / self.count)
+                arrays.append(('std', std.astype(np.float32)))
+            elif statistic == 'median':
+                if self.histogram is not None:
+                    self.flush_median()
+                arrays.append(('median', self.median))
+            elif statistic in ['min', 'max']:
+                extreme = np.where(empty, np.nan, getattr(self, statistic))
+                arrays.append((statistic, extreme.astype(np.float32)))
+                arrays.append((statistic + '_index', getattr(self, statistic + '_index')))
+            elif statistic == 'latest':
+                arrays.append(('latest', self.latest.astype(np.float32)))
+                arrays.append(('latest_index', self.latest_index))
+        return arrays
+
+
+class Mosaic(Nansat):
+    """Container for compositing of many scenes on a common Domain
+
+    Each input scene is reprojected onto the Domain of the Mosaic as a warped
+    VRT and read by blocks of rows, so only one block of each scene is kept in
+    memory. Running statistics are accumulated in buffers with the size of
+    the Domain and added as bands to the Mosaic, which can be exported with
+    Nansat.export(). If histograms for median of all bands do not fit into
+    MEDIAN_MAX_BYTES, scenes are added again for each further block of rows.
+
+    Examples
+    --------
+        >>> m = Mosaic.from_domain(Domain(4326, '-te 0 60 20 80 -ts 2000 2000'))
+        >>> m.composite(filenames, ['sst'], ['mean', 'count', 'latest'], threads=4)
+        >>> m.export('daily_sst.nc')
+
+    """
+    STATISTICS = ['count', 'mean', 'std', 'median', 'min', 'max', 'latest']
+    MASK_VALUES = [64, 128]
+    BLOCK_SIZE = 1000000
+    MEDIAN_MAX_BYTES = 1024 ** 3
+
+    def composite(self, inputs, bands, statistics=('count', 'mean'), threads=1,
+                  mask_band=None, median_range=None, median_bins=100, **kwargs):
+        """Reproject scenes onto self block-wise and accumulate statistics
+
+        For each band and statistic a band '<band>_<statistic>' is added to
+        self. For 'min', 'max' and 'latest' bands '<band>_<statistic>_index'
+        with the index of the providing scene (-1 - no data) are also added.
+        The list of the input names is stored in metadata 'mosaic_inputs'.
+
+        Parameters
+        -----------
+        inputs : list of Nansat or str
+            scenes to composite (Nansat objects or names of files)
+        bands : list of str
+            names of bands to composite
+        statistics : list of str
+            'count' : number of valid values
+            'mean' : mean value
+            'std' : standard deviation
+            'median' : median estimated from per-pixel histograms (see median_range)
+            'min', 'max' : min or max value
+            'latest' : value from the scene with the latest time_coverage_start
+            (from the scene with the larger index if times are equal). All scenes
+            must have time_coverage_start.
+        threads : int
+            number of scenes processed in parallel
+        mask_band : str
+            name of the band with mask. Only pixels with mask values in
+            Mosaic.MASK_VALUES (water and clear) are used.
+        median_range : tuple
+            (min, max) range of values for estimation of median
+        median_bins : int
+            number of bins in the range. Precision of median is
+            (max - min) / median_bins. Histograms need median_bins x 2 bytes per pixel
+            (x 4 bytes for more than 65535 scenes) and are kept for as many rows as fit
+            into Mosaic.MEDIAN_MAX_BYTES; each further block of rows needs one more
+            pass over all scenes.
+        **kwargs : dict
+            parameters for Nansat.reproject() (e.g. resample_alg) and
+            for opening of files with Nansat (e.g. mapper)
+
+        """
+        for statistic in statistics:
+            if statistic not in self.STATISTICS:
+                raise ValueError('Statistic must be one of %s' % ', '.join(self.STATISTICS))
+
+        reproject_kwargs = {}
+        for key in ['resample_alg', 'block_size', 'tps', 'skip_gcps']:
+            if key in kwargs:
+                reproject_kwargs[key] = kwargs.pop(key)
+        kwargs.setdefault('log_level', self.logger.level)
+
+        band_statistics = {}
+        for band in bands:
+            band_statistics[band] = Statistics(self.shape(), list(statistics),
+                                               median_range, median_bins, len(inputs),
+                                               self.MEDIAN_MAX_BYTES // max(1, len(bands)))
+        median_blocks = [None]
+        if 'median' in statistics and bands:
+            median_blocks = band_statistics[bands[0]].median_blocks
+        lock = threading.Lock()
+
+        for i, median_block in enumerate(median_blocks):
+            # all statistics are computed in the first pass, only median in the next passes
+            rows = None
+            if i > 0:
+                rows = median_block
+                for band in bands:
+                    band_statistics[band].set_median_rows(*median_block)
+
+            def add_scene(args):
+                index, scene = args
+                if not isinstance(scene, Nansat):
+                    scene = Nansat(scene, **kwargs)
+                return self._add_scene(index, scene, band_statistics, lock, mask_band,
+                                       rows=rows, **reproject_kwargs)
+
+            if threads > 1 and len(inputs) > 1:
+                pool = ThreadPool(threads)
+                try:
+                    added = pool.map(add_scene, enumerate(inputs))
+                finally:
+                    pool.close()
+            else:
+                added = [add_scene(args) for args in enumerate(inputs)]
+
+            if i == 0:
+                self.logger.info('%d of %d scenes added to mosaic' % (sum(added), len(inputs)))
+            if median_block is not None:
+                for band in bands:
+                    band_statistics[band].flush_median()
+        for band in bands:
+            for suffix, array in band_statistics[band].get_arrays():
+                self.add_band(array, parameters={'name': '%s_%s' % (band, suffix)})
+        self.set_metadata('mosaic_inputs', json.dumps(
+            [scene.filename if isinstance(scene, Nansat) else scene for scene in inputs]))
+
+    def _add_scene(self, index, scene, band_statistics, lock, mask_band=None, rows=None,
+                   **kwargs):
+        """Reproject one scene and add it to statistics block by block
+
+        Parameters
+        -----------
+        index : int
+            index of the scene in the list of inputs
+        scene : Nansat
+            input scene (restored after reprojection)
+        band_statistics : dict
+            Statistics for each band
+        lock : threading.Lock
+            lock for updating of statistics
+        mask_band : str
+            name of the band with mask
+        rows : tuple
+            (row offset, number of rows) of the block for which only median is updated.
+            If None, all statistics are updated for all rows.
+        **kwargs : dict
+            parameters for Nansat.reproject()
+
+        Returns
+        --------
+        added : bool
+            False if the scene does not intersect the Mosaic
+
+        """
+        median_only = rows is not None
+        time = 0.
+        if not median_only and any('latest' in statistics.statistics
+                                   for statistics in band_statistics.values()):
+            time = self._get_scene_time(scene)
+        width = self.shape()[1]
+        row_blocks = self._get_row_blocks(*(rows or ()))
+        vrt = scene.vrt
+        try:
+            # dataset of self is shared between threads
+            with lock:
+                if not self.check_domains([scene])[0]:
+                    self.logger.info('Scene %s does not intersect mosaic' % scene.filename)
+                    return False
+                scene.reproject(self, addmask=True, **kwargs)
+            swathmask = scene.get_GDALRasterBand('swathmask')
+            gdal_bands = [scene.get_GDALRasterBand(band) for band in band_statistics]
+            mask = None
+            if mask_band is not None:
+                mask = scene.get_GDALRasterBand(mask_band)
+            for row, n_rows in row_blocks:
+                window = (0, row, width, n_rows)
+                valid = swathmask.ReadAsArray(*window) == 1
+                if mask is not None:
+                    valid *= np.isin(mask.ReadAsArray(*window), self.MASK_VALUES)
+                if not valid.any():
+                    continue
+                for band, gdal_band in zip(band_statistics, gdal_bands):
+                    data = scene._read_band(gdal_band, window=window)
+                    band_valid = valid * np.isfinite(data)
+                    with lock:
+                        band_statistics[band].update(row, data, band_valid, index, time,
+                                                     median_only)
+        finally:
+            scene.vrt = vrt
+
+        return True
+
+    @staticmethod
+    def _get_scene_time(scene):
+        """Get time_coverage_start of the scene in seconds (for statistic 'latest')"""
+        try:
+            time = scene.time_coverage_start
+        except (ValueError, TypeError):
+            raise ValueError('Scene %s has no time_coverage_start (required for statistic '
+                             '"latest")' % scene.filename)
+        if time.tzinfo is not None:
+            time = time.replace(tzinfo=None) - time.utcoffset()
+        return (time - datetime.datetime(1970, 1, 1)).total_seconds()
+
+    def _get_row_blocks(self, first_row=0, n_rows=None):
+        """Get offsets and sizes of blocks of rows with about BLOCK_SIZE pixels
+
+        Parameters
+        -----------
+        first_row : int
+            first row of the range split into blocks
+        n_rows : int
+            number of rows in the range (until the last row if None)
+
+        Returns
+        --------
+        blocks : list of tuples
+            (row offset, number of rows)
+
+        """
+        height, width = self.shape()
+        if n_rows is not None:
+            height = min(height, first_row + n_rows)
+        block_rows = max(1, self.BLOCK_SIZE // max(1, width))
+        return [(row, min(block_rows, height - row))
+                for row in range(first_row, height, block_rows)]
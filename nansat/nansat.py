@@ -21,7 +21,10 @@ import sys
 import tempfile
 import datetime
 import pkgutil
+import re
+import threading
 import warnings
+from multiprocessing.pool import ThreadPool
 from xml.sax import saxutils
 
 import numpy as np
@@ -36,12 +39,30 @@ except ImportError:
 else:
     MATPLOTLIB_IS_INSTALLED = True
 
+try:
+    import dask.array as da
+except ImportError:
+    DASK_IS_INSTALLED = False
+else:
+    DASK_IS_INSTALLED = True
+
+try:
+    import xarray as xr
+except ImportError:
+    XARRAY_IS_INSTALLED = False
+else:
+    XARRAY_IS_INSTALLED = True
+
 from nansat.domain import Domain
+from nansat.aux_cache import AuxCache
 from nansat.exporter import Exporter
 from nansat.figure import Figure
+from nansat.lazy_band import LazyBand
+from nansat.swath_mask import SwathMask
 from nansat.vrt import VRT
-from nansat.utils import add_logger, gdal, parse_time
+from nansat.utils import add_logger, gdal, parse_time, remove_keys
 from nansat.node import Node
+from nansat.profiler import count, profiled, span
 from nansat.pointbrowser import PointBrowser
 
 from nansat.exceptions import NansatGDALError, WrongMapperError, NansatReadError
@@ -104,6 +125,10 @@ class Nansat(Domain, Exporter):
     FILL_VALUE = 9.96921e+36
     ALT_FILL_VALUE = -10000.
 
+    # EPSG code and half of the extent of Web Mercator projection (for tiles)
+    WEB_MERCATOR_SRS = 3857
+    WEB_MERCATOR_HALF_SIZE = 20037508.342789244
+
     # instance attributes
     logger = None
     filename = None
@@ -132,9 +157,23 @@ class Nansat(Domain, Exporter):
         n._init_from_domain(domain, array, parameters, log_level)
         return n
 
-    def __init__(self, filename='', mapper='', log_level=30, **kwargs):
+    def __init__(self, filename='', mapper='', log_level=30, header_only=False, **kwargs):
         """Create Nansat object
 
+        Parameters
+        -----------
+        filename : str
+            name of the input file
+        mapper : str
+            name of the mapper (e.g. 'generic'). If empty, all mappers are tried.
+        log_level : int
+            level of logging
+        header_only : bool
+            read only global metadata, time coverage and georeference, without bands.
+            Mappers may skip creation of bands in this mode (see Nansat._get_mapper).
+        **kwargs : dict
+            parameters for the mapper
+
         Notes
         -----
         self.mapper : str
@@ -156,8 +195,9 @@ class Nansat(Domain, Exporter):
 
         self._init_empty(filename, log_level)
         # Create VRT object with mapping of variables
-        self.vrt = self._get_mapper(mapper, **kwargs)
+        self.vrt = self._get_mapper(mapper, header_only=header_only, **kwargs)
 
+    @profiled('Nansat.__getitem__')
     def __getitem__(self, band_id):
         """Returns the band as a NumPy array, by overloading []
 
@@ -174,34 +214,171 @@ class Nansat(Domain, Exporter):
 
 
         """
-        # get band
+        return self.read_band(band_id)
+
+    def read_band(self, band_id, out=None):
+        """Read band as a NumPy array (optionally into an existing array)
+
+        Parameters
+        -----------
+        band_id : int or str
+            number or name of the band (see Nansat.__getitem__)
+        out : NumPy array or None
+            array for the output (e.g. reused when bands are read in a loop). It must have the
+            shape of the band and a floating point type to receive np.nan.
+
+        Returns
+        --------
+        a : NumPy array (<out> if given)
+
+        """
         band = self.get_GDALRasterBand(band_id)
+        return self._read_band(band, self._get_swath_mask(), out=out)
+
+    def _get_swath_mask(self):
+        """Get run-length encoded mask of valid pixels from band 'swathmask' (if any)
+
+        The mask band is read only once after reproject and the encoded mask is kept in
+        self.vrt (it is dropped together with the VRT by undo, resize, reproject, etc.)
+
+        Returns
+        --------
+        swath_mask : SwathMask or None
+
+        """
+        if not self.has_band('swathmask'):
+            return None
+        swath_mask = getattr(self.vrt, 'swath_mask', None)
+        if swath_mask is None or swath_mask.shape != self.shape():
+            with span('Nansat._get_swath_mask'):
+                swath_mask = SwathMask.from_band(self.get_GDALRasterBand('swathmask'))
+            self.vrt.swath_mask = swath_mask
+        return swath_mask
+
+    def _read_band(self, band, swathmask=None, window=(), out=None):
+        """Read array from GDAL band and apply expression, fill value and swathmask
+
+        Parameters
+        -----------
+        band : GDAL RasterBand
+            band to read from
+        swathmask : SwathMask or GDAL RasterBand or None
+            mask of valid pixels or band with swath mask (0 - out of swath)
+        window : tuple
+            (x_offset, y_offset, x_size, y_size) or empty for the full band
+        out : NumPy array or None
+            array for the output (shape of the window)
+
+        Returns
+        --------
+        a : NumPy array (<out> if given)
+
+        Note
+        -----
+        If the mapper provides a reader for the band (function in dict
+        self.vrt.band_readers with band name as key), data is read by this function
+        with the band and the window as input instead of GDAL.
+
+        """
+        metadata = band.GetMetadata()
         # get expression from metadata
-        expression = band.GetMetadata().get('expression', '')
+        expression = metadata.get('expression', '')
         # get data
-        band_data = band.ReadAsArray()
+        band_reader = getattr(self.vrt, 'band_readers', {}).get(metadata.get('name'))
+        if band_reader is not None:
+            with span('Nansat.band_reader'):
+                band_data = band_reader(band, window or (0, 0, band.XSize, band.YSize))
+        elif out is not None and expression == '':
+            with span('GDAL.ReadAsArray'):
+                band_data = band.ReadAsArray(*window, buf_obj=out)
+        else:
+            with span('GDAL.ReadAsArray'):
+                band_data = band.ReadAsArray(*window)
         if band_data is None:
             raise NansatGDALError('Cannot read array from band %s' % str(band_data))
+        count('pixels_read', band_data.size)
+
+        with span('Nansat.post_processing'):
+            # execute expression if any
+            if expression != '':
+                band_data = eval(self._compile_expression(expression), globals(),
+                                 {'self': self, 'band': band, 'band_data': band_data})
+
+            if out is not None and band_data is not out:
+                np.copyto(out, band_data)
+                band_data = out
+
+            # Set inf, invalid and missing data and out-of-swath pixels to np.nan
+            # (for floats only)
+            if band_data.dtype.char in np.typecodes['AllFloat']:
+                fill_values = []
+                if '_FillValue' in metadata:
+                    fill_values.append(float(metadata['_FillValue']))
+                    # quick hack to avoid problem with wrong _FillValue - see issue #123
+                    if fill_values[0] == self.FILL_VALUE:
+                        fill_values.append(self.ALT_FILL_VALUE)
+                self._set_invalid_to_nan(band_data, fill_values, swathmask, window)
 
-        # execute expression if any
-        if expression != '':
-            band_data = eval(expression)
+        return band_data
 
-        all_float_flag = band_data.dtype.char in np.typecodes['AllFloat']
-        # Set invalid and missing data to np.nan (for floats only)
-        if '_FillValue' in band.GetMetadata() and all_float_flag:
-            band_data = self._fill_with_nan(band, band_data)
+    def _compile_expression(self, expression):
+        """Compile expression from band metadata (once for each VRT)"""
+        if getattr(self.vrt, 'compiled_expressions', None) is None:
+            self.vrt.compiled_expressions = {}
+        code = self.vrt.compiled_expressions.get(expression)
+        if code is None:
+            code = compile(expression, '<expression>', 'eval')
+            self.vrt.compiled_expressions[expression] = code
+        return code
 
-        # replace infs with np.NAN
-        if np.size(np.where(np.isinf(band_data))) > 0:
-            band_data[np.isinf(band_data)] = np.nan
+    @staticmethod
+    def _set_invalid_to_nan(band_data, fill_values=(), swathmask=None, window=(),
+                            block_size=256):
+        """Set inf, fill values and out-of-swath pixels to np.nan in place
 
-        # erase out-of-swath pixels with np.Nan (if not integer)
-        if self.has_band('swathmask') and all_float_flag:
-            swathmask = self.get_GDALRasterBand('swathmask').ReadAsArray()
-            band_data[swathmask == 0] = np.nan
+        The invalid pixels are found and erased in one pass by blocks of rows, so the
+        temporary boolean arrays are not larger than a block.
 
-        return band_data
+        Parameters
+        -----------
+        band_data : NumPy array
+            floating point data
+        fill_values : list of float
+            values to replace with np.nan
+        swathmask : SwathMask or GDAL RasterBand or None
+            mask of valid pixels or band with swath mask (0 - out of swath), applied to
+            2D arrays only
+        window : tuple
+            window of <band_data> in the band (x_offset, y_offset, x_size, y_size)
+        block_size : int
+            number of rows processed at once
+
+        """
+        if band_data.ndim == 0:
+            band_data = band_data.reshape(1)
+        if band_data.ndim != 2:
+            block_size = max(len(band_data), 1)
+            swathmask = None
+        elif swathmask is not None:
+            x_offset, y_offset = window[:2] if window else (0, 0)
+            if not isinstance(swathmask, SwathMask):
+                swathmask = SwathMask.from_array(swathmask.ReadAsArray(*window))
+                x_offset, y_offset = 0, 0
+        invalid = np.empty((min(block_size, len(band_data)),) + band_data.shape[1:], bool)
+        equal = np.empty_like(invalid)
+        for row in range(0, len(band_data), block_size):
+            block = band_data[row:row + block_size]
+            block_invalid, block_equal = invalid[:len(block)], equal[:len(block)]
+            np.isfinite(block, out=block_invalid)
+            np.logical_not(block_invalid, out=block_invalid)
+            for fill_value in fill_values:
+                np.equal(block, fill_value, out=block_equal)
+                np.logical_or(block_invalid, block_equal, out=block_invalid)
+            if swathmask is not None:
+                valid = swathmask.get_window((x_offset, y_offset + row,
+                                              block.shape[1], block.shape[0]))
+                np.logical_or(block_invalid, ~valid, out=block_invalid)
+            np.copyto(block, np.nan, where=block_invalid)
 
     def __repr__(self):
         """Creates string with basic info about the Nansat object"""
@@ -261,18 +438,6 @@ class Nansat(Domain, Exporter):
         if array is not None:
             self.add_band(array=array, parameters=parameters)
 
-    def _fill_with_nan(self, band, band_data):
-        """Fill input array with fill value taen from input band metadata"""
-        fill_value = float(band.GetMetadata()['_FillValue'])
-        band_data[band_data == fill_value] = np.nan
-        # quick hack to avoid problem with wrong _FillValue - see issue
-        # #123
-        if fill_value == self.FILL_VALUE:
-            band_data[band_data == self.ALT_FILL_VALUE] = np.nan
-
-        return band_data
-
-
     def add_band(self, array, parameters=None, nomem=False):
         """Add band from numpy array with metadata.
 
@@ -395,13 +560,17 @@ class Nansat(Domain, Exporter):
         self.logger.info('New shape: ({0}, {1})'.format(dst_shape[0], dst_shape[1]))
         return factor, dst_shape
 
-    def resize(self, factor=None, width=None, height=None, pixelsize=None, resample_alg=-1):
+    def resize(self, factor=None, width=None, height=None, pixelsize=None, resample_alg=-1,
+               cache_dir=None):
         """Proportional resize of the dataset.
 
         The dataset is resized as (x_size*factor, y_size*factor)
         If desired width, height or pixelsize is specified,
         the scaling factor is calculated accordingly.
         If GCPs are given in a dataset, they are also rewritten.
+        If the dataset is reduced by averaging and overviews were built with
+        Nansat.build_overviews(), the most reduced suitable overview is used as
+        the source instead of the full resolution data.
 
         Parameters
         -----------
@@ -428,6 +597,9 @@ class Nansat(Domain, Exporter):
             - 3 : CubicSpline,
             - 4 : Lancoz
 
+        cache_dir : str
+            directory with overviews (see Nansat.build_overviews)
+
         Notes
         -----
         self.vrt.dataset : VRT dataset of VRT object
@@ -436,7 +608,26 @@ class Nansat(Domain, Exporter):
 
         """
         factor, dst_shape = self._get_resize_shape(factor, width, height, pixelsize)
-        if resample_alg <= 0:
+        overview_vrt = None
+        if resample_alg == -1:
+            overview_vrt = self._get_overview_vrt(factor, cache_dir)
+        if overview_vrt is not None:
+            vrt = overview_vrt.get_subsampled_vrt(dst_shape[1], dst_shape[0], resample_alg)
+            # keep the overview as source of bands but refer to the full resolution VRT
+            # for georeference and undo
+            vrt.band_vrts[vrt.vrt.filename] = vrt.vrt
+            if self.has_band('swathmask'):
+                # swathmask is not stored in overviews: resize it from the full resolution
+                swathmask_vrt = self.vrt.get_subsampled_vrt(dst_shape[1], dst_shape[0],
+                                                            resample_alg)
+                vrt.band_vrts[swathmask_vrt.filename] = swathmask_vrt
+                vrt.create_band({'SourceFilename': swathmask_vrt.filename,
+                                 'SourceBand': self.get_band_number('swathmask')},
+                                remove_keys(self.get_metadata(band_id='swathmask'),
+                                            AuxCache.IGNORED_METADATA))
+            vrt.vrt = self.vrt
+            self.vrt = vrt
+        elif resample_alg <= 0:
             self.vrt = self.vrt.get_subsampled_vrt(dst_shape[1], dst_shape[0], resample_alg)
         else:
             # update size and GeoTranform in XML of the warped VRT object
@@ -466,6 +657,136 @@ class Nansat(Domain, Exporter):
 
         return factor
 
+    def _get_overview_cache(self, cache_dir=None):
+        """Get cache of overviews (directory <filename>.overviews by default)"""
+        if cache_dir is None:
+            cache_dir = self.filename + '.overviews'
+        return AuxCache(cache_dir)
+
+    def _get_overview_key(self, cache, factor):
+        """Get key of overview with given factor of the current dataset and bands"""
+        band_names = [self.bands()[band_id]['name'] for band_id in self._get_overview_bands()]
+        return cache.get_key(self, 'overview', self.filename, factor=factor, bands=band_names)
+
+    def build_overviews(self, factors=(2, 4, 8, 16, 32), cache_dir=None, block_size=1024):
+        """Build pyramid of overviews of all bands and store in a sidecar cache
+
+        Each overview is an average of all bands over blocks of <factor> x <factor>
+        pixels computed as GDAL Average resampling (see Nansat.resize) from the raw data of
+        the bands: data type of each band is kept, NaN and NODATA values of the source are
+        ignored, expressions and band readers are not applied. The band 'swathmask' is
+        not stored (it is resized from the full resolution data when an overview is used).
+        The full resolution data is read only once (in blocks of rows).
+        Overviews are stored as flat binary files (see AuxCache) and used by
+        Nansat.resize() (and hence Nansat.write_figure() with <max_size>) when the
+        dataset is reduced by averaging. Overviews are linked to the file name,
+        modification time, georeference and names of bands: after e.g. crop or
+        reproject they are not used.
+
+        Parameters
+        -----------
+        factors : list of int
+            reduction factors (powers of 2)
+        cache_dir : str
+            directory for overviews (<filename>.overviews by default)
+        block_size : int
+            number of rows to read at once
+
+        Raises
+        -------
+        ValueError : if the dataset is not opened from a file, if factors are not powers
+            of 2 or if no factor is smaller than the size of the dataset
+
+        """
+        if self.filename == '':
+            raise ValueError('Overviews can be built only for datasets opened from a file')
+        for factor in factors:
+            if factor < 2 or factor & (factor - 1) != 0:
+                raise ValueError('Overview factors must be powers of 2 (got %s)' % str(factor))
+        factors = sorted(factor for factor in factors if factor <= min(self.shape()))
+        if len(factors) == 0:
+            raise ValueError('No overview factor is smaller than the size of the dataset %s'
+                             % str(self.shape()))
+        cache = self._get_overview_cache(cache_dir)
+        rows, cols = self.shape()
+        # number of rows in block must be multiple of all factors
+        block_size = max(1, block_size // factors[-1]) * factors[-1]
+        band_ids = self._get_overview_bands()
+
+        # empty overviews with resized georeference
+        levels = []
+        for factor in factors:
+            level = Nansat.from_domain(self, log_level=self.logger.level)
+            level.resize(1. / factor, resample_alg=0)
+            levels.append((factor, level, [None] * len(band_ids)))
+
+        for i, band_id in enumerate(band_ids):
+            band = self.get_GDALRasterBand(band_id)
+            nodata = _get_source_nodata(band)
+            for y_offset in range(0, rows, block_size):
+                y_size = min(block_size, rows - y_offset)
+                with span('GDAL.ReadAsArray'):
+                    array = band.ReadAsArray(0, y_offset, cols, y_size)
+                for factor, level, level_arrays in levels:
+                    if level_arrays[i] is None:
+                        level_arrays[i] = np.zeros(level.shape(), array.dtype)
+                    level_rows, level_cols = level_arrays[i].shape
+                    y_level = y_offset // factor
+                    y_level_size = min(y_size // factor, level_rows - y_level)
+                    level_arrays[i][y_level:y_level + y_level_size] = _block_average(
+                        array, factor, y_level_size, level_cols, nodata)
+
+        for factor, level, level_arrays in levels:
+            parameters = [remove_keys(self.get_metadata(band_id=band_id),
+                                      ['expression', 'PixelFunctionType', 'SourceTransferType'])
+                          for band_id in band_ids]
+            level.add_bands(level_arrays, parameters)
+            cache.put(self._get_overview_key(cache, factor), level, raw=True)
+            self.logger.debug('Overview %d - OK!' % factor)
+
+    def _get_overview_bands(self):
+        """Get numbers of bands stored in overviews (all except swathmask)"""
+        return [band_id for band_id in self.bands()
+                if self.bands()[band_id]['name'] != 'swathmask']
+
+    def _get_overview_vrt(self, factor, cache_dir=None):
+        """Get VRT with bands from the most reduced overview suitable for resize by <factor>
+
+        Parameters
+        -----------
+        factor : float
+            resize factor (< 1)
+        cache_dir : str
+            directory with overviews (see Nansat.build_overviews)
+
+        Returns
+        --------
+        overview_vrt : VRT or None
+            VRT with bands from cached overview or None if no overview is found
+
+        """
+        if self.filename == '' or factor > 0.5:
+            return None
+        cache = self._get_overview_cache(cache_dir)
+        if not os.path.isdir(cache.cache_dir):
+            return None
+        overview_factor = 2 ** int(np.floor(np.log2(1. / factor)))
+        while overview_factor >= 2:
+            metadata_dict = cache.get(self._get_overview_key(cache, overview_factor))
+            if metadata_dict is not None:
+                self.logger.debug('Use overview %d' % overview_factor)
+                overview_vrt = VRT.from_dataset_params(metadata_dict[0]['src']['xSize'],
+                                                       metadata_dict[0]['src']['ySize'],
+                                                       self.vrt.dataset.GetGeoTransform(),
+                                                       self.vrt.dataset.GetProjection(),
+                                                       self.vrt.dataset.GetGCPs(),
+                                                       self.vrt.dataset.GetGCPProjection(),
+                                                       geolocation=self.vrt.geolocation)
+                overview_vrt.create_bands(metadata_dict)
+                return overview_vrt
+            overview_factor //= 2
+        return None
+
     def get_GDALRasterBand(self, band_id=1):
         """Get a GDALRasterBand of a given Nansat object
 
@@ -674,7 +995,7 @@ class Nansat(Domain, Exporter):
         """
         self.vrt = self.vrt.get_sub_vrt(steps)
 
-    def watermask(self, mod44path=None, dst_domain=None, **kwargs):
+    def watermask(self, mod44path=None, dst_domain=None, cache_dir=None, **kwargs):
         """
         Create numpy array with watermask (water=1, land=0)
 
@@ -692,7 +1013,7 @@ class Nansat(Domain, Exporter):
             variable MOD44WPATH
             Open Nansat object from the VRT file
             Reprojects the watermask onto the current object using reproject()
-            or reproject_on_jcps()
+            (or reads previously reprojected watermask from cache)
             Returns the reprojected Nansat object
 
         Parameters
@@ -701,6 +1022,8 @@ class Nansat(Domain, Exporter):
             path with MOD44W Products and a VRT file
         dst_domain : Domain
             destination domain other than self
+        cache_dir : str
+            directory for caching of reprojected watermask (see Nansat.reproject_aux_layer)
         tps : Bool
             Use Thin Spline Transformation in reprojection of watermask?
             See also Nansat.reproject()
@@ -741,14 +1064,154 @@ class Nansat(Domain, Exporter):
         # reproject on self or given Domain
         if dst_domain is None:
             dst_domain = self
-        lon, lat = dst_domain.get_border()
-        watermask.crop_lonlat([lon.min(), lon.max()], [lat.min(), lat.max()])
-        watermask.reproject(dst_domain, addmask=False, **kwargs)
 
-        return watermask
+        return watermask.reproject_aux_layer(dst_domain, 'watermask', cache_dir, **kwargs)
+
+    def reproject_aux_layer(self, dst_domain, layer, cache_dir=None, **kwargs):
+        """Crop and reproject static auxiliary layer (self) onto given Domain using cache
+
+        If caching is switched on (see AuxCache), the reprojected layer is written
+        to the cache directory, and the next time the same layer is reprojected
+        onto a Domain with the same georeference the bands are read directly
+        from the cached binary file.
+
+        Parameters
+        -----------
+        dst_domain : Domain
+            destination Domain
+        layer : str
+            name of the auxiliary layer (e.g. 'watermask')
+        cache_dir : str
+            directory with cached layers (NANSAT_AUX_CACHE by default)
+        **kwargs : dict
+            parameters for Nansat.reproject()
+
+        Returns
+        --------
+        n : Nansat
+            self (reprojected) or new Nansat object with bands from the cache
+
+        """
+        cache = AuxCache(cache_dir)
+        if cache.enabled:
+            key = cache.get_key(dst_domain, layer, self.filename, **kwargs)
+            metadata_dict = cache.get(key)
+            if metadata_dict is not None:
+                self.logger.debug('Read %s from cache' % layer)
+                n = Nansat.from_domain(dst_domain, log_level=self.logger.level)
+                n.vrt.create_bands(metadata_dict)
+                return n
+
+        min_lon, max_lon, min_lat, max_lat = dst_domain.get_min_max_lon_lat()
+        self.crop_lonlat([min_lon, max_lon], [min_lat, max_lat])
+        self.reproject(dst_domain, addmask=False, **kwargs)
+
+        if cache.enabled:
+            cache.put(key, self)
+        return self
+
+    def to_dask(self, band_id, chunks=1024):
+        """Get band as lazy chunked dask array
+
+        Chunks are read from the GDAL band of self.vrt (including bands with
+        pixel functions and reprojected bands) only when computed, with the same
+        handling of expression, _FillValue and swathmask as in Nansat.__getitem__.
+        Chunks are read in parallel by the threaded dask scheduler.
+
+        Parameters
+        -----------
+        band_id : int or str
+            number or name of the band
+        chunks : int or tuple or str
+            size of chunks (see dask.array.from_array)
+
+        Returns
+        --------
+        array : dask.array.Array
+
+        """
+        if not DASK_IS_INSTALLED:
+            raise ImportError('Dask is not installed. Cannot create dask array. '
+                              'Install dask to use this method')
+        lazy_band = LazyBand(self, band_id)
+        return da.from_array(lazy_band, chunks=chunks, asarray=False,
+                             name='%s-%d' % (lazy_band.filename, lazy_band.band_number))
+
+    def to_xarray(self, bands=None, chunks=1024, add_lonlat=True):
+        """Get bands as xarray Dataset with lazy chunked dask arrays
+
+        Parameters
+        -----------
+        bands : list of int or str or None
+            numbers or names of bands. If None, all bands except swathmask are used.
+        chunks : int or tuple or str
+            size of chunks (see dask.array.from_array)
+        add_lonlat : bool
+            add lazy 2D coordinates longitude and latitude (as from get_geolocation_grids)
+
+        Returns
+        --------
+        ds : xarray.Dataset
+            with data variables named as bands, dimensions (y, x), band metadata
+            as attributes of variables and global metadata as attributes of ds
+
+        Examples
+        --------
+            >>> ds = n.to_xarray(chunks=512)
+            >>> ds['sigma0_HH'].mean().compute()
+
+        """
+        if not XARRAY_IS_INSTALLED or not DASK_IS_INSTALLED:
+            raise ImportError('Xarray or dask is not installed. Cannot create xarray Dataset. '
+                              'Install xarray and dask to use this method')
+        if bands is None:
+            bands = [band for band in self.bands()
+                     if self.get_metadata('name', band) != 'swathmask']
+
+        data_vars = OrderedDict()
+        for band in self._get_band_numbers(list(bands)):
+            array = self.to_dask(band, chunks)
+            attrs = self.get_metadata(band_id=band)
+            for key in ['SourceFilename', 'SourceBand']:
+                attrs.pop(key, None)
+            data_vars[attrs.get('name', 'band_%d' % band)] = (('y', 'x'), array, attrs)
+
+        coords = {}
+        if add_lonlat and data_vars:
+            lock = threading.Lock()
+            chunks = array.chunks
+            for i, name in enumerate(['longitude', 'latitude']):
+                coords[name] = (('y', 'x'), da.map_blocks(
+                    self._get_lonlat_block, dtype=np.float64, chunks=chunks,
+                    name='%s-%s' % (self.vrt.filename, name), lonlat_index=i, lock=lock))
+
+        return xr.Dataset(data_vars, coords=coords, attrs=self.get_metadata())
+
+    def _get_lonlat_block(self, lonlat_index, lock, block_info=None):
+        """Get block of longitude or latitude grid for dask.array.map_blocks
+
+        Parameters
+        -----------
+        lonlat_index : int
+            0 - longitude, 1 - latitude
+        lock : threading.Lock
+            lock for GDAL transformer (not thread safe)
+        block_info : dict
+            information about the block from dask
+
+        Returns
+        --------
+        grid : numpy.ndarray
+
+        """
+        (row_start, row_stop), (col_start, col_stop) = block_info[None]['array-location']
+        cols, rows = np.meshgrid(np.arange(col_start, col_stop), np.arange(row_start, row_stop))
+        with lock:
+            lonlat = self.transform_points(cols.flatten(), rows.flatten())
+        return np.asarray(lonlat[lonlat_index], np.float64).reshape(cols.shape)
 
     def write_figure(self, filename='', bands=1, clim=None, addDate=False,
-                     array_modfunc=None, **kwargs):
+                     array_modfunc=None, max_size=None, **kwargs):
         """Save a raster band to a figure in graphical format.
 
         Get numpy array from the band(s) and band information specified
@@ -788,6 +1251,11 @@ class Nansat(Domain, Exporter):
         array_modfunc : None
             None (default) : figure created using array in provided band
             function : figure created using array modified by provided function
+        max_size : int
+            None (default) : figure has the size of the dataset
+            int : if the dataset is larger, it is resized (by averaging) to have
+            the largest dimension equal to <max_size> before creating the figure.
+            Overviews are used if available (see Nansat.build_overviews)
         **kwargs : parameters for Figure().
 
         Notes
@@ -818,13 +1286,17 @@ class Nansat(Domain, Exporter):
         `<http://www.scipy.org/Cookbook/Matplotlib/Show_colormaps>`_
 
         """
+        if max_size is not None and max(self.shape()) > max_size:
+            vrt = self.vrt
+            self.resize(max_size / float(max(self.shape())))
+            try:
+                return self.write_figure(filename, bands, clim, addDate, array_modfunc, **kwargs)
+            finally:
+                self.vrt = vrt
+
         # convert <bands> from integer, or string, or list of strings
         # into list of integers
-        if isinstance(bands, list):
-            for i, band in enumerate(bands):
-                bands[i] = self.get_band_number(band)
-        else:
-            bands = [self.get_band_number(bands)]
+        bands = self._get_band_numbers(bands)
 
         # == create 3D ARRAY ==
         array = None
@@ -845,6 +1317,55 @@ class Nansat(Domain, Exporter):
         array = None
 
         # == PREPARE cmin/cmax ==
+        clim = self._get_figure_clim(bands, clim, fig, **kwargs)
+
+        # == PREPARE caption ==
+        caption = self._get_figure_caption(bands, **kwargs)
+
+        # add DATE to caption
+        if addDate:
+            caption += self.time_coverage_start.strftime(' %Y-%m-%d')
+
+        self.logger.info('caption: %s ' % caption)
+
+        # == PROCESS figure ==
+        fig.process(cmin=clim[0], cmax=clim[1], caption=caption)
+
+        # == finally SAVE to a image file ==
+        fig.save(filename, **kwargs)
+        # If tiff image, convert to GeoTiff
+        if filename[-3:] == 'tif':
+            self.vrt.copyproj(filename)
+        return fig
+
+
+    def _get_band_numbers(self, bands):
+        """Convert <bands> from integer, or string, or list of strings into list of integers"""
+        if isinstance(bands, list):
+            return [self.get_band_number(band) for band in bands]
+        else:
+            return [self.get_band_number(bands)]
+
+    def _get_figure_clim(self, bands, clim=None, fig=None, **kwargs):
+        """Get color limits for a figure from input, WKV or histogram
+
+        Parameters
+        -----------
+        bands : list of int
+            numbers of bands used in the figure
+        clim : list with two elements or 'hist' or None
+            see Nansat.write_figure
+        fig : Figure or None
+            figure with data from <bands> used if clim is estimated from
+            histogram. If None, data is read from <bands>.
+        **kwargs : parameters for Figure().
+
+        Returns
+        --------
+        clim : list
+            [[min], [max]] or [[min, min, min], [max, max, max]]
+
+        """
         # check if cmin and cmax are given as the arguments
         if 'cmin' in kwargs.keys() and 'cmax' in kwargs.keys():
             clim = [kwargs['cmin'], kwargs['cmax']]
@@ -865,6 +1386,8 @@ class Nansat(Domain, Exporter):
 
         # Estimate color min/max from histogram
         if clim == 'hist':
+            if fig is None:
+                fig = Figure(np.array([self[band] for band in bands]), **kwargs)
             clim = fig.clim_from_histogram(**kwargs)
 
         # modify clim to the proper shape [[min], [max]]
@@ -880,35 +1403,236 @@ class Nansat(Domain, Exporter):
                 clim[i] = [clim[i][0]] * len(bands)
 
         self.logger.info('clim: %s ' % clim)
+        return clim
 
-        # == PREPARE caption ==
+    def _get_figure_caption(self, bands, **kwargs):
+        """Get caption for a figure from input or from long_name and units of the first band"""
         if 'caption' in kwargs:
-            caption = kwargs['caption']
-        else:
-            # get longName and units from vrt
-            band = self.get_GDALRasterBand(bands[0])
-            longName = band.GetMetadata().get('long_name', '')
-            units = band.GetMetadata().get('units', '')
+            return kwargs['caption']
 
-            # make caption from longname, units
-            caption = longName + ' [' + units + ']'
+        # get longName and units from vrt
+        band = self.get_GDALRasterBand(bands[0])
+        longName = band.GetMetadata().get('long_name', '')
+        units = band.GetMetadata().get('units', '')
 
-        # add DATE to caption
-        if addDate:
-            caption += self.time_coverage_start.strftime(' %Y-%m-%d')
+        # make caption from longname, units
+        return longName + ' [' + units + ']'
 
-        self.logger.info('caption: %s ' % caption)
+    def write_tiles(self, dirname, zoom_levels, bands=1, clim=None, tile_size=256,
+                    resample_alg=0, threads=1, update=False, **kwargs):
+        """Write pyramid of map tiles in Web Mercator projection (XYZ scheme)
 
-        # == PROCESS figure ==
-        fig.process(cmin=clim[0], cmax=clim[1], caption=caption)
+        For each zoom level the object is reprojected (lazily, by a warped VRT)
+        onto the Web Mercator grid of the tiles covering the object. Each tile is
+        read, rendered with the Figure colour pipeline and saved into
+        <dirname>/<zoom>/<x>/<y>.png. Pixels outside the swath are transparent
+        and tiles without valid data are not written. Color limits are computed
+        once and are the same for all tiles.
 
-        # == finally SAVE to a image file ==
-        fig.save(filename, **kwargs)
-        # If tiff image, convert to GeoTiff
-        if filename[-3:] == 'tif':
-            self.vrt.copyproj(filename)
-        return fig
+        Parameters
+        -----------
+        dirname : str
+            output directory
+        zoom_levels : int or list of int
+            zoom level(s) to generate
+        bands : int or str or list
+            one or three bands, see Nansat.write_figure
+        clim : list with two elements or 'hist' or None
+            range of colormap, see Nansat.write_figure
+        tile_size : int
+            width and height of tiles, pixels
+        resample_alg : int (GDALResampleAlg)
+            resampling algorithm, see Nansat.reproject
+        threads : int
+            number of threads for reading and rendering of tiles
+        update : bool
+            If True, tiles which exist and are newer than the input file are not
+            rendered again
+        **kwargs : parameters for Figure().
+
+        Returns
+        --------
+        tiles : list of tuples
+            (zoom, x, y) of the written tiles
 
+        Examples
+        --------
+            >>> n.write_tiles('/tmp/tiles', [3, 4, 5], 'sigma0_HV', clim=[0, 0.1])
+
+        Notes
+        ------
+        Objects crossing the dateline are not supported
+
+        """
+        bands = self._get_band_numbers(bands)
+        clim = self._get_figure_clim(bands, clim, **kwargs)
+        kwargs.update(cmin=clim[0], cmax=clim[1])
+
+        src_mtime = -np.inf
+        if update and self.filename is not None and os.path.exists(self.filename):
+            src_mtime = os.path.getmtime(self.filename)
+
+        if isinstance(zoom_levels, int):
+            zoom_levels = [zoom_levels]
+
+        lon, lat = self.get_border()
+        vrt = self.vrt
+        written = []
+        for zoom in zoom_levels:
+            x_tiles, y_tiles = self._get_web_mercator_tiles(lon, lat, zoom)
+            tiles = [(x, y) for x in x_tiles for y in y_tiles
+                     if not (update and self._is_updated_tile(dirname, zoom, x, y, src_mtime))]
+            if len(tiles) == 0:
+                continue
+
+            dst_domain = self._get_web_mercator_domain(x_tiles, y_tiles, zoom, tile_size)
+            self.reproject(dst_domain, resample_alg=resample_alg, addmask=True)
+            try:
+                written += self._write_zoom_tiles(dirname, zoom, tiles, x_tiles[0],
+                                                  y_tiles[0], bands, tile_size,
+                                                  threads, **kwargs)
+            finally:
+                self.vrt = vrt
+
+        return written
+
+    @staticmethod
+    def _get_web_mercator_tiles(lon, lat, zoom):
+        """Get ranges of column and row numbers of XYZ tiles covering lon/lat points
+
+        Parameters
+        -----------
+        lon, lat : numpy arrays
+            coordinates of the border
+        zoom : int
+            zoom level
+
+        Returns
+        --------
+        x_tiles, y_tiles : list of int
+            column and row numbers of tiles
+
+        """
+        n_tiles = 2 ** zoom
+        lon = np.clip(np.array(lon, dtype=float), -180, 180 - 1e-9)
+        lat = np.radians(np.clip(np.array(lat, dtype=float), -85.0511287798, 85.0511287798))
+        x = np.floor((lon + 180.) / 360. * n_tiles)
+        y = np.floor((1 - np.log(np.tan(lat) + 1 / np.cos(lat)) / np.pi) / 2. * n_tiles)
+        x = np.clip(x, 0, n_tiles - 1).astype(int)
+        y = np.clip(y, 0, n_tiles - 1).astype(int)
+        return list(range(x.min(), x.max() + 1)), list(range(y.min(), y.max() + 1))
+
+    def _get_web_mercator_domain(self, x_tiles, y_tiles, zoom, tile_size):
+        """Get Domain in Web Mercator projection covering given tiles
+
+        Parameters
+        -----------
+        x_tiles, y_tiles : list of int
+            column and row numbers of tiles
+        zoom : int
+            zoom level
+        tile_size : int
+            width and height of tiles, pixels
+
+        Returns
+        --------
+        dst_domain : Domain
+
+        """
+        tile_extent = 2 * self.WEB_MERCATOR_HALF_SIZE / 2 ** zoom
+        x_min = -self.WEB_MERCATOR_HALF_SIZE + x_tiles[0] * tile_extent
+        x_max = -self.WEB_MERCATOR_HALF_SIZE + (x_tiles[-1] + 1) * tile_extent
+        y_max = self.WEB_MERCATOR_HALF_SIZE - y_tiles[0] * tile_extent
+        y_min = self.WEB_MERCATOR_HALF_SIZE - (y_tiles[-1] + 1) * tile_extent
+        return Domain(self.WEB_MERCATOR_SRS, '-te %.9f %.9f %.9f %.9f -ts %d %d' % (
+            x_min, y_min, x_max, y_max, len(x_tiles) * tile_size, len(y_tiles) * tile_size))
+
+    @staticmethod
+    def _get_tile_filename(dirname, zoom, x, y):
+        """Get name of the file with XYZ tile"""
+        return os.path.join(dirname, str(zoom), str(x), '%d.png' % y)
+
+    def _is_updated_tile(self, dirname, zoom, x, y, src_mtime):
+        """Check if tile exists and is newer than modification time of the source"""
+        filename = self._get_tile_filename(dirname, zoom, x, y)
+        return os.path.exists(filename) and os.path.getmtime(filename) >= src_mtime
+
+    def _write_zoom_tiles(self, dirname, zoom, tiles, x_tile0, y_tile0, bands, tile_size,
+                          threads, **kwargs):
+        """Read, render and save tiles from reprojected self.vrt
+
+        Each thread opens its own GDAL dataset from self.vrt.filename.
+
+        Parameters
+        -----------
+        dirname : str
+            output directory
+        zoom : int
+            zoom level
+        tiles : list of tuples
+            (x, y) column and row number of tiles to write
+        x_tile0, y_tile0 : int
+            column and row numbers of the upper left tile in self.vrt
+        bands : list of int
+            numbers of bands for the figure
+        tile_size : int
+            width and height of tiles, pixels
+        threads : int
+            number of threads
+        **kwargs : parameters for Figure().
+
+        Returns
+        --------
+        tiles : list of tuples
+            (zoom, x, y) of the written tiles
+
+        """
+        vrt_filename = self.vrt.filename
+        swathmask_number = self.get_band_number('swathmask')
+        local = threading.local()
+
+        def write_tile(tile):
+            if getattr(local, 'dataset', None) is None:
+                local.dataset = gdal.Open(vrt_filename)
+            x, y = tile
+            window = ((x - x_tile0) * tile_size, (y - y_tile0) * tile_size, tile_size, tile_size)
+            swathmask = local.dataset.GetRasterBand(swathmask_number)
+            valid = swathmask.ReadAsArray(*window) > 0
+            if not valid.any():
+                return None
+            array = np.array([self._read_band(local.dataset.GetRasterBand(band),
+                                              window=window) for band in bands], dtype=float)
+            valid &= np.isfinite(array).all(axis=0)
+            if not valid.any():
+                return None
+            for i in range(array.shape[0]):
+                array[i][~valid] = kwargs['cmin'][i]
+
+            fig = Figure(array, **kwargs)
+            fig.process()
+            fig.reprojMask = ~valid
+            fig._make_transparent_color()
+
+            filename = self._get_tile_filename(dirname, zoom, x, y)
+            if not os.path.exists(os.path.dirname(filename)):
+                try:
+                    os.makedirs(os.path.dirname(filename))
+                except OSError:
+                    # created by another thread
+                    pass
+            fig.pilImg.save(filename)
+            return (zoom, x, y)
+
+        if threads > 1:
+            pool = ThreadPool(threads)
+            try:
+                written = pool.map(write_tile, tiles)
+            finally:
+                pool.close()
+        else:
+            written = [write_tile(tile) for tile in tiles]
+
+        return [tile for tile in written if tile is not None]
 
     def write_geotiffimage(self, filename, band_id=1):
         """Writes an 8-bit GeoTiff image for a given band.
@@ -1060,6 +1784,7 @@ class Nansat(Domain, Exporter):
         else:
             metadata_receiver.SetMetadataItem(str(key), str(value))
 
+    @profiled('Nansat._get_dataset_metadata')
     def _get_dataset_metadata(self):
         # open GDAL dataset. It will be parsed to all mappers for testing
         gdal_dataset, metadata = None, dict()
@@ -1076,7 +1801,7 @@ class Nansat(Domain, Exporter):
         return gdal_dataset, metadata
 
 
-    def _get_mapper(self, mappername, **kwargs):
+    def _get_mapper(self, mappername, header_only=False, **kwargs):
         """Create VRT file in memory (VSI-file) with variable mapping
 
         If mappername is given only this mapper will be used,
@@ -1092,6 +1817,11 @@ class Nansat(Domain, Exporter):
         Parameters
         -----------
         mappername : string, optional (e.g. 'ASAR' or 'merisL2')
+        header_only : bool
+            if True, header_only=True is given to the mapper if it supports it
+            (SUPPORTS_HEADER_ONLY=True). Such mappers return VRT with metadata and
+            georeference only. Bands created by other mappers are removed unless
+            geolocation of the mapper refers to them.
 
         Returns
         --------
@@ -1139,7 +1869,10 @@ class Nansat(Domain, Exporter):
                 #raise errType, err, traceback
 
             # create VRT using the selected mapper
-            tmp_vrt = nansatMappers[mappername](self.filename, gdal_dataset, metadata, **kwargs)
+            with span('Nansat._get_mapper', mapper=mappername):
+                tmp_vrt = nansatMappers[mappername](
+                    self.filename, gdal_dataset, metadata,
+                    **self._get_mapper_kwargs(nansatMappers[mappername], header_only, kwargs))
             self.mapper = mappername.replace('mapper_', '')
         else:
             # We test all mappers, import one by one
@@ -1160,8 +1893,12 @@ class Nansat(Domain, Exporter):
                         self.logger.error(import_errors)
 
                 # create a Mapper object and get VRT dataset from it
+                count('mappers_tried')
                 try:
-                    tmp_vrt = nansatMappers[iMapper](self.filename, gdal_dataset, metadata, **kwargs)
+                    with span('Nansat._get_mapper', mapper=iMapper):
+                        tmp_vrt = nansatMappers[iMapper](
+                            self.filename, gdal_dataset, metadata,
+                            **self._get_mapper_kwargs(nansatMappers[iMapper], header_only, kwargs))
                     self.logger.info('Mapper %s - success!' % iMapper)
                     self.mapper = iMapper.replace('mapper_', '')
                     break
@@ -1172,7 +1909,7 @@ class Nansat(Domain, Exporter):
         if tmp_vrt is None and gdal_dataset is not None:
             self.logger.warning('No mapper fits, returning GDAL bands!')
             tmp_vrt = VRT.from_gdal_dataset(gdal_dataset, metadata=metadata)
-            for iBand in range(gdal_dataset.RasterCount):
+            for iBand in range(gdal_dataset.RasterCount if not header_only else 0):
                 tmp_vrt.create_band({'SourceFilename': self.filename,
                                      'SourceBand': iBand + 1})
                 tmp_vrt.dataset.FlushCache()
@@ -1186,8 +1923,43 @@ class Nansat(Domain, Exporter):
             raise NansatReadError('%s: File cannot be read with NANSAT - '
                     'consider writing a mapper' % self.filename)
 
+        # remove bands from mappers which do not support header_only
+        # (unless geolocation of the mapper refers to these bands)
+        if header_only and tmp_vrt.dataset.RasterCount > 0:
+            geolocation = {}
+            if tmp_vrt.geolocation is not None:
+                geolocation = tmp_vrt.geolocation.data
+            if tmp_vrt.filename in [geolocation.get('X_DATASET'), geolocation.get('Y_DATASET')]:
+                self.logger.warning('Mapper %s does not support header_only, bands are kept'
+                                    % self.mapper)
+            else:
+                tmp_vrt.delete_bands(list(range(1, tmp_vrt.dataset.RasterCount + 1)))
+                tmp_vrt.band_readers = {}
+
         return tmp_vrt
 
+    @staticmethod
+    def _get_mapper_kwargs(mapper, header_only, kwargs):
+        """Add header_only=True to keyword arguments of a mapper which supports it
+
+        Parameters
+        -----------
+        mapper : class
+            Mapper class (with SUPPORTS_HEADER_ONLY=True if it can skip creation of bands)
+        header_only : bool
+            header_only flag given to Nansat
+        kwargs : dict
+            keyword arguments given to Nansat
+
+        Returns
+        --------
+        kwargs : dict
+
+        """
+        if header_only and getattr(mapper, 'SUPPORTS_HEADER_ONLY', False):
+            return dict(kwargs, header_only=True)
+        return kwargs
+
     def get_band_number(self, band_id):
         """Return absolute band number
 
@@ -1575,6 +2347,48 @@ class Nansat(Domain, Exporter):
         return pixVector[gpi], linVector[gpi]
 
 
+def _block_average(array, factor, rows, cols, nodata=None):
+    """Average <array> over blocks of <factor> x <factor> pixels (result has shape rows, cols)
+
+    The average is computed as GDAL Average resampling (AveragedSource in VRT): NaN and
+    <nodata> values are ignored, blocks without valid values get <nodata> (or NaN/0), integer
+    results are rounded to the nearest integer, only real part of complex values is averaged.
+    The result has data type of <array>.
+
+    """
+    blocks = array[:rows * factor, :cols * factor].reshape(rows, factor, cols, factor)
+    if np.iscomplexobj(blocks):
+        blocks = blocks.real
+    valid = np.ones(blocks.shape, bool)
+    if nodata is not None:
+        valid &= blocks != nodata
+    if blocks.dtype.char in np.typecodes['Float']:
+        valid &= ~np.isnan(blocks)
+    counts = valid.sum(axis=(1, 3))
+    sums = np.where(valid, blocks, 0).sum(axis=(1, 3), dtype=np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        average = sums / counts
+    if array.dtype.char in np.typecodes['AllInteger']:
+        average = np.sign(average) * np.floor(np.abs(average) + 0.5)
+        empty_value = 0 if nodata is None else nodata
+    else:
+        empty_value = np.nan if nodata is None else nodata
+    average[counts == 0] = empty_value
+    return average.astype(array.dtype)
+
+
+def _get_source_nodata(band):
+    """Get NODATA value of the first source of a VRT band (None if not set)"""
+    source_xml = band.GetMetadataItem(str('source_0'), str('vrt_sources')) or ''
+    match = re.search(r'<NODATA>\s*([^<\s]+)\s*</NODATA>', source_xml)
+    if match is None:
+        return None
+    try:
+        return float(match.group(1))
+    except ValueError:
+        return None
+
+
 def _import_mappers(log_level=None):
     """Import available mappers into a dictionary
 
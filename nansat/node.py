@@ -20,6 +20,7 @@ from __future__ import unicode_literals
 import os
 import re
 import xml.dom.minidom as xdm
+from xml.parsers import expat
 
 
 class Node(object):
@@ -297,23 +298,35 @@ class Node(object):
         return str(self.dom().toxml())
 
     @staticmethod
-    def create(dom):
+    def create(dom, tags=None):
         """
-        Create a Node representation, given either
-        a string representation of an XML doc, or a dom.
+        Create a Node representation, given either a string representation
+        of an XML doc, name of an XML file, or a dom.
+
+        Strings and files are parsed with a streaming parser (expat) which
+        creates Nodes directly from the parser events, without building a DOM first.
+
+        Parameters
+        ----------
+        dom : str or xml.dom.minidom.Node
+            XML, name of XML file or dom
+        tags : list of str
+            if given, only subtrees with these tags (and their ancestors) are
+            created, other elements are skipped. E.g. for Sentinel-1 annotation:
+            Node.create(xml, tags=['geolocationGrid', 'imageInformation'])
 
         """
         if isinstance(dom, str):
-            if os.path.exists(dom):
+            if not dom.lstrip().startswith('<') and os.path.exists(dom):
                 # parse input file
-                dom = xdm.parse(dom)
-            else:
-                # Strip all extraneous whitespace so that
-                # text input is handled consistently:
-                dom = re.sub('\s+', ' ', dom)
-                dom = dom.replace('> ', '>')
-                dom = dom.replace(' <', '<')
-                return Node.create(xdm.parseString(str(dom)))
+                with open(dom, 'rb') as xml_file:
+                    return Node._parse(xml_file, tags)
+            # the string is already decoded, encoding in the declaration is irrelevant
+            if dom.lstrip().startswith('<?xml'):
+                dom = dom[dom.index('?>') + 2:]
+            # Strip all extraneous whitespace so that
+            # text input is handled consistently
+            return Node._parse(dom.encode('utf-8'), tags, collapse_whitespace=True)
 
         # To pass test for python3, decoding of bytes object is requested
         if dom.nodeType == dom.DOCUMENT_NODE:
@@ -332,3 +345,76 @@ class Node(object):
                 if subnode:
                     node += subnode
         return node
+
+    @staticmethod
+    def _parse(source, tags=None, collapse_whitespace=False):
+        """Create Node from XML file or bytes using the streaming parser (expat)
+
+        Nodes are created directly from the parser events. Tags and names of
+        attributes are kept as they are in the document (with namespace prefixes,
+        e.g. 'safe:startTime', and 'xmlns' attributes) as in xml.dom.minidom.
+
+        Parameters
+        ----------
+        source : file object or bytes
+            opened XML file or XML document
+        tags : list of str
+            create only subtrees with these tags (and their ancestors)
+        collapse_whitespace : bool
+            replace all sequences of whitespace characters with one space and strip
+            whitespace around text values
+
+        Returns
+        --------
+        node : Node
+            root node
+
+        """
+        # stack of [node, keep whole subtree, pieces of the current text]
+        stack = []
+        root = []
+
+        def set_value(item):
+            """Set value of node from the text collected since the last start/end of element"""
+            text = ''.join(item[2])
+            if text.strip():
+                item[0].value = text
+            item[2] = []
+
+        def start_element(name, attributes):
+            parent = stack[-1] if stack else None
+            if parent and parent[2]:
+                set_value(parent)
+            node = Node(name)
+            if attributes:
+                if collapse_whitespace:
+                    attributes = dict((key, re.sub(r'\s+', ' ', val))
+                                      for key, val in attributes.items())
+                node.attributes = attributes
+            stack.append([node, tags is None or name in tags or (parent and parent[1]), []])
+
+        def end_element(name):
+            item = stack.pop()
+            if item[2]:
+                set_value(item)
+            node = item[0]
+            if collapse_whitespace and node.value:
+                node.value = ' '.join(node.value.split())
+            if not stack:
+                root.append(node)
+            elif item[1] or node.children:
+                stack[-1][0].children.append(node)
+
+        def character_data(data):
+            stack[-1][2].append(data)
+
+        parser = expat.ParserCreate()
+        parser.buffer_text = True
+        parser.StartElementHandler = start_element
+        parser.EndElementHandler = end_element
+        parser.CharacterDataHandler = character_data
+        if hasattr(source, 'read'):
+            parser.ParseFile(source)
+        else:
+            parser.Parse(source, True)
+        return root[0]
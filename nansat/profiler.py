@@ -0,0 +1,209 @@
+# Name:    profiler.py
+# Purpose: Lightweight instrumentation of Nansat processing stages
+# Licence:
+# This file is part of NANSAT.
+# NANSAT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+# http://www.gnu.org/licenses/gpl-3.0.html
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+"""Spans and counters around the main processing stages of Nansat
+
+Instrumentation is disabled unless a Profiler is active, then each span costs
+only one check of a module level list.
+
+Examples
+--------
+>>> with Profiler() as profiler:
+...     n = Nansat(filename)
+...     n.reproject(d)
+...     array = n[1]
+>>> print(profiler.summary())
+>>> profiler.to_chrome_trace('trace.json')  # open in chrome://tracing or Perfetto
+
+"""
+from __future__ import absolute_import, division
+
+import os
+import json
+import time
+import functools
+import threading
+from contextlib import contextmanager
+
+# active profilers (spans and counters are recorded by all of them)
+_profilers = []
+_lock = threading.Lock()
+
+
+class Profiler(object):
+    """Recorder of spans (named time intervals) and counters
+
+    Parameters
+    -----------
+    callback : function
+        called with each finished span (dict with keys 'name', 'start',
+        'duration', 'thread', 'args') for streaming into external monitoring
+
+    """
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.spans = []
+        self.counters = {}
+        self.start_time = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        """Start recording of spans and counters"""
+        self.start_time = time.time()
+        with _lock:
+            if self not in _profilers:
+                _profilers.append(self)
+
+    def stop(self):
+        """Stop recording of spans and counters"""
+        with _lock:
+            if self in _profilers:
+                _profilers.remove(self)
+
+    def add_span(self, span):
+        """Add finished span (called from nansat.profiler.span)"""
+        with _lock:
+            self.spans.append(span)
+        if self.callback is not None:
+            self.callback(span)
+
+    def add_count(self, name, value=1):
+        """Increase counter <name> by <value>"""
+        with _lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self):
+        """Get total, mean and max duration and number of calls of each span
+
+        Returns
+        --------
+        summary : dict
+            {name: {'count': int, 'total': float, 'mean': float, 'max': float}}
+            durations in seconds
+
+        """
+        summary = {}
+        for span in self.spans:
+            stat = summary.setdefault(span['name'], {'count': 0, 'total': 0., 'max': 0.})
+            stat['count'] += 1
+            stat['total'] += span['duration']
+            stat['max'] = max(stat['max'], span['duration'])
+        for stat in summary.values():
+            stat['mean'] = stat['total'] / stat['count']
+        return summary
+
+    def to_json(self, filename=None):
+        """Export spans, counters and summary as JSON
+
+        Parameters
+        -----------
+        filename : str
+            name of output file. If None, JSON string is returned
+
+        Returns
+        --------
+        json_string : str (if filename is None)
+
+        """
+        data = {'spans': self.spans, 'counters': self.counters, 'summary': self.summary()}
+        return self._dump(data, filename)
+
+    def to_chrome_trace(self, filename=None):
+        """Export spans and counters in Chrome Trace Event format
+
+        Parameters
+        -----------
+        filename : str
+            name of output file. If None, JSON string is returned
+
+        Returns
+        --------
+        json_string : str (if filename is None)
+
+        """
+        t0 = self.start_time or 0
+        events = [{'name': span['name'],
+                   'cat': 'nansat',
+                   'ph': 'X',
+                   'ts': (span['start'] - t0) * 1e6,
+                   'dur': span['duration'] * 1e6,
+                   'pid': os.getpid(),
+                   'tid': span['thread'],
+                   'args': span['args']} for span in self.spans]
+        ts_end = max([event['ts'] + event['dur'] for event in events] or [0])
+        events += [{'name': name,
+                    'cat': 'nansat',
+                    'ph': 'C',
+                    'ts': ts_end,
+                    'pid': os.getpid(),
+                    'args': {name: value}} for name, value in self.counters.items()]
+        return self._dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, filename)
+
+    @staticmethod
+    def _dump(data, filename):
+        """Write data into JSON file or return JSON string"""
+        if filename is None:
+            return json.dumps(data, default=str)
+        with open(filename, 'w') as f:
+            json.dump(data, f, default=str)
+
+
+@contextmanager
+def span(name, **kwargs):
+    """Context manager which records duration of the block in all active profilers
+
+    Parameters
+    -----------
+    name : str
+        name of the span (e.g. 'VRT.copy')
+    **kwargs : dict
+        arguments of the span (e.g. name of mapper)
+
+    """
+    if not _profilers:
+        yield
+        return
+    start = time.time()
+    try:
+        yield
+    finally:
+        record = {'name': name,
+                  'start': start,
+                  'duration': time.time() - start,
+                  'thread': threading.current_thread().ident,
+                  'args': kwargs}
+        for profiler in list(_profilers):
+            profiler.add_span(record)
+
+
+def profiled(name):
+    """Decorator which records each call of the function as span <name>"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _profilers:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, value=1):
+    """Increase counter <name> by <value> in all active profilers"""
+    for profiler in list(_profilers):
+        profiler.add_count(name, value)
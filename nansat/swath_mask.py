@@ -0,0 +1,116 @@
+# Name:    swath_mask.py
+# Purpose: Container of SwathMask class
+# Licence:
+# This file is part of NANSAT.
+# NANSAT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+# http://www.gnu.org/licenses/gpl-3.0.html
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+from __future__ import absolute_import, division
+
+import numpy as np
+
+
+class SwathMask(object):
+    """Run-length encoded mask of valid (in swath) pixels
+
+    Each row of the mask is stored as runs of valid pixels (start and stop
+    columns). A swath usually has one run per row, so the mask of a reprojected
+    scene takes a few bytes per row and any window of it is decoded without
+    reading the mask band again.
+
+    Parameters
+    -----------
+    shape : tuple of two int
+        number of rows and columns of the mask
+    rows : 1D array
+        row of each run (ascending)
+    starts, stops : 1D arrays
+        first and last + 1 column of each run
+
+    """
+    def __init__(self, shape, rows, starts, stops):
+        self.shape = tuple(shape)
+        self.rows = np.asarray(rows, dtype=np.int32)
+        self.starts = np.asarray(starts, dtype=np.int32)
+        self.stops = np.asarray(stops, dtype=np.int32)
+
+    @classmethod
+    def from_array(cls, mask, row_offset=0):
+        """Encode 2D array with mask (True or non-zero - valid pixel)
+
+        Parameters
+        -----------
+        mask : 2D array
+            mask of valid pixels
+        row_offset : int
+            row of the first row of the array (for encoding by blocks)
+
+        Returns
+        --------
+        swath_mask : SwathMask
+
+        """
+        mask = np.asarray(mask) != 0
+        padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=np.int8)
+        padded[:, 1:-1] = mask
+        edges = np.diff(padded, axis=1)
+        # np.nonzero returns indices in row-major order, so starts and stops match
+        rows, starts = np.nonzero(edges == 1)
+        stops = np.nonzero(edges == -1)[1]
+        return cls(mask.shape, rows + row_offset, starts, stops)
+
+    @classmethod
+    def from_band(cls, band, block_size=1024):
+        """Encode GDAL band with mask (1 - valid pixel, 0 - invalid) by blocks of rows
+
+        Parameters
+        -----------
+        band : GDAL RasterBand
+            band with mask (e.g. swathmask of a reprojected Nansat)
+        block_size : int
+            number of rows read at once
+
+        Returns
+        --------
+        swath_mask : SwathMask
+
+        """
+        blocks = [cls.from_array(band.ReadAsArray(0, y_offset, band.XSize,
+                                                  min(block_size, band.YSize - y_offset)),
+                                 y_offset)
+                  for y_offset in range(0, band.YSize, block_size)]
+        return cls((band.YSize, band.XSize),
+                   np.hstack([block.rows for block in blocks] + [[]]),
+                   np.hstack([block.starts for block in blocks] + [[]]),
+                   np.hstack([block.stops for block in blocks] + [[]]))
+
+    def __len__(self):
+        return self.rows.size
+
+    def get_window(self, window=()):
+        """Decode window of the mask
+
+        Parameters
+        -----------
+        window : tuple
+            (x_offset, y_offset, x_size, y_size) or empty for the full mask
+
+        Returns
+        --------
+        mask : 2D boolean array (True - valid pixel)
+
+        """
+        x_offset, y_offset, x_size, y_size = window or (0, 0, self.shape[1], self.shape[0])
+        first, last = np.searchsorted(self.rows, [y_offset, y_offset + y_size])
+        rows = self.rows[first:last] - y_offset
+        starts = np.clip(self.starts[first:last] - x_offset, 0, x_size)
+        stops = np.clip(self.stops[first:last] - x_offset, 0, x_size)
+        # +1 at start and -1 at stop of each run, cumulative sum gives the mask
+        edges = np.zeros((y_size, x_size + 1), dtype=np.int32)
+        np.add.at(edges, (rows, starts), 1)
+        np.add.at(edges, (rows, stops), -1)
+        return np.cumsum(edges[:, :-1], axis=1) > 0
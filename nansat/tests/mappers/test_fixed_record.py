@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from nansat.mappers.fixed_record import FixedRecordFile
+
+
+class FixedRecordFileTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmp_dir, 'records.bin')
+        self.header_fields = [('year', 4, '<u2'), ('coefs', 8, '<i4', (3,))]
+        self.record_fields = [('lonlat', 0, '<i4', (3, 2)), ('counts', 24, '<u2', (10, 2))]
+        header = np.zeros(1, FixedRecordFile.get_dtype(self.header_fields, 64))
+        header['year'] = 2020
+        header['coefs'] = [1, 2, 3]
+        records = np.zeros(7, FixedRecordFile.get_dtype(self.record_fields, 80))
+        records['counts'] = np.arange(7 * 10 * 2).reshape(7, 10, 2)
+        records['lonlat'][:, :, 1] = [1790000, -1790000, -1770000]
+        with open(self.filename, 'wb') as f:
+            header.tofile(f)
+            records.tofile(f)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_init(self):
+        f = FixedRecordFile(self.filename, self.header_fields, self.record_fields, 80, 64)
+
+        self.assertEqual(len(f), 7)
+        self.assertEqual(f.header['year'], 2020)
+        self.assertEqual(list(f.header['coefs']), [1, 2, 3])
+        self.assertIsInstance(f.records, np.memmap)
+        self.assertEqual(f.records['counts'].shape, (7, 10, 2))
+
+    def test_init_too_small(self):
+        with self.assertRaises(ValueError):
+            FixedRecordFile(self.filename, self.header_fields, self.record_fields, 80, 1000)
+        with self.assertRaises(ValueError):
+            FixedRecordFile(self.filename, self.header_fields, self.record_fields, 80, 64,
+                            n_records=8)
+
+    def test_read_window(self):
+        f = FixedRecordFile(self.filename, self.header_fields, self.record_fields, 80, 64)
+        counts = np.arange(7 * 10 * 2).reshape(7, 10, 2)
+
+        data = f.read_window('counts', (2, 1, 5, 3), index=1, scale=0.5, offset=1)
+        self.assertEqual(data.dtype, np.float32)
+        self.assertTrue(np.allclose(data, counts[1:4, 2:7, 1] * 0.5 + 1))
+        data = f.get_band_reader('counts', 0, dtype=np.uint16)(None, ())
+        self.assertEqual(data.dtype, np.uint16)
+        self.assertTrue(np.all(data == counts[:, :, 0]))
+
+    def test_interpolate_tie_points(self):
+        values = np.array([[10., 20, 30], [0, 0, 0]])
+        data = FixedRecordFile.interpolate_tie_points(values, 1, 4, 11)
+
+        self.assertEqual(data.shape, (2, 11))
+        self.assertTrue(np.allclose(data[0], np.arange(11) * 2.5 + 7.5))
+        self.assertTrue(np.allclose(data[1], 0))
+
+    def test_interpolate_tie_points_longitude(self):
+        f = FixedRecordFile(self.filename, self.header_fields, self.record_fields, 80, 64)
+        lon = f.records['lonlat'][:, :, 1] * 0.0001
+        data = FixedRecordFile.interpolate_tie_points(lon, 0, 4, 9, longitude=True)
+
+        self.assertTrue(np.allclose(data[0, [0, 2, 4, 6, 8]], [179, -180, -179, -178, -177]))
+        self.assertTrue(np.all(data >= -180) and np.all(data < 180))
+
+
+if __name__ == "__main__":
+    unittest.main()
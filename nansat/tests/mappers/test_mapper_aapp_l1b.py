@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from nansat import Nansat
+from nansat.exceptions import WrongMapperError
+from nansat.mappers import mapper_aapp_l1b
+from nansat.mappers.fixed_record import FixedRecordFile
+
+
+class AAPPL1BMapperTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmp_dir, 'hrpt_noaa19_20200101_1200_00001.l1b')
+        header = np.zeros(1, FixedRecordFile.get_dtype(mapper_aapp_l1b.headerFields,
+                                                       mapper_aapp_l1b.headerLength))
+        header['satID'] = 8
+        header['dataFormat'] = 3
+        header['year'] = 2020
+        header['dayOfYear'] = 32
+        header['millisecondsOfDay'] = 3600000
+        header['numCalibratedScanLines'] = 10
+        records = np.zeros(10, FixedRecordFile.get_dtype(mapper_aapp_l1b.recordFields,
+                                                         mapper_aapp_l1b.recordLength))
+        lat, lon = np.meshgrid(np.linspace(70, 71, 10), np.linspace(10, 30, 51), indexing='ij')
+        records['lonlat'][:, :, 0] = lat * 10000
+        records['lonlat'][:, :, 1] = lon * 10000
+        self.counts = np.random.randint(0, 1000, (10, 2048, 5)).astype(np.uint16)
+        records['counts'] = self.counts
+        with open(self.filename, 'wb') as f:
+            header.tofile(f)
+            records.tofile(f)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_init(self):
+        n = Nansat(self.filename, mapper='aapp_l1b', log_level=40)
+        lon, lat = n.get_geolocation_grids()
+
+        self.assertEqual(n.shape(), (10, 2048))
+        self.assertEqual(n.get_metadata('time_coverage_start'), '2020-02-01T01:00:00')
+        self.assertEqual(n.get_metadata('satID'), 'NOAA-19')
+        self.assertTrue(np.allclose(lon[:, 25::40], np.linspace(10, 30, 51), atol=1e-4))
+        self.assertTrue(np.allclose(lat[:, 0], np.linspace(70, 71, 10), atol=1e-4))
+        self.assertTrue(np.all(n[1] == self.counts[:, :, 0]))
+        self.assertTrue(np.all(n[5] == self.counts[:, :, 4]))
+        self.assertTrue(np.all(n[5] == n.vrt.dataset.GetRasterBand(5).ReadAsArray()))
+
+    def test_init_wrong_file(self):
+        with open(self.filename, 'r+b') as f:
+            f.seek(72)
+            f.write(b'\x00\x00')
+
+        with self.assertRaises(WrongMapperError):
+            mapper_aapp_l1b.Mapper(self.filename, None, None)
+
+
+if __name__ == "__main__":
+    unittest.main()
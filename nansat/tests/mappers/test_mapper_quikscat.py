@@ -0,0 +1,70 @@
+import os
+import unittest
+import tempfile
+
+import numpy as np
+from netCDF4 import Dataset
+
+from nansat.utils import gdal
+from nansat.mappers.mapper_quikscat import Mapper
+
+from mock import patch
+
+
+class QuikscatTests(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.tmp_filename = tempfile.mkstemp(suffix='.nc')
+        ds = Dataset(self.tmp_filename, 'w')
+        ds.Conventions = 'CF-1.6'
+        ds.source = 'QuikSCAT SeaWinds'
+        ds.institution = 'JPL'
+        ds.title = 'QuikSCAT level 2B ocean wind vectors'
+        ds.createDimension('NUMROWS', 8)
+        ds.createDimension('NUMCELLS', 5)
+
+        times = ds.createVariable('time', 'f8', ('NUMROWS',))
+        times.units = 'seconds since 1999-01-01 00:00:00'
+        times.standard_name = 'time'
+        times[:] = np.arange(8) * 60.
+
+        rows, cols = np.mgrid[0:8, 0:5]
+        self.lat = 60. + rows * 0.5 + cols * 0.1
+        self.lon = 359. + cols * 0.5 - rows * 0.1
+        lats = ds.createVariable('lat', 'f4', ('NUMROWS', 'NUMCELLS'))
+        lats.long_name = 'latitude'
+        lats[:] = self.lat
+        lons = ds.createVariable('lon', 'f4', ('NUMROWS', 'NUMCELLS'))
+        lons.long_name = 'longitude'
+        lons[:] = self.lon
+        wind_speed = ds.createVariable('wind_speed', 'f4', ('NUMROWS', 'NUMCELLS'))
+        wind_speed.standard_name = 'wind_speed'
+        wind_speed[:] = 10.
+        ds.close()
+        os.close(fd)
+
+    def tearDown(self):
+        os.unlink(self.tmp_filename)
+
+    @patch('nansat.mappers.mapper_quikscat.pti')
+    def test_init_header_only(self, mock_pti):
+        mock_pti.get_gcmd_instrument.return_value = {}
+        mock_pti.get_gcmd_platform.return_value = {}
+        mock_pti.get_gcmd_provider.return_value = {}
+        mock_pti.get_iso19115_topic_category.return_value = {}
+        gdal_dataset = gdal.Open(self.tmp_filename)
+        metadata = gdal_dataset.GetMetadata()
+
+        mapper = Mapper(self.tmp_filename, gdal_dataset, metadata, quartile=1)
+        mapper_header = Mapper(self.tmp_filename, gdal_dataset, metadata, quartile=1,
+                               header_only=True)
+
+        self.assertEqual(mapper_header.dataset.RasterCount, 0)
+        self.assertGreater(mapper.dataset.RasterCount, 0)
+        self.assertEqual(mapper_header.dataset.RasterYSize, mapper.dataset.RasterYSize)
+        self.assertEqual([(gcp.GCPX, gcp.GCPY) for gcp in mapper_header.dataset.GetGCPs()],
+                         [(gcp.GCPX, gcp.GCPY) for gcp in mapper.dataset.GetGCPs()])
+        self.assertTrue(np.allclose(
+            mapper_header.band_vrts['new_lat_VRT'].dataset.ReadAsArray(), self.lat[2:4]))
+        self.assertEqual(mapper_header.dataset.GetMetadataItem('time_coverage_start'),
+                         mapper.dataset.GetMetadataItem('time_coverage_start'))
@@ -0,0 +1,33 @@
+import unittest
+
+import numpy as np
+
+from nansat.vrt import VRT
+from nansat.lut import AzimuthLUT
+from nansat.mappers.mapper_radarsat2 import Mapper
+
+
+class Radarsat2MapperTests(unittest.TestCase):
+
+    def setUp(self):
+        self.mapper = Mapper.__new__(Mapper)
+        VRT.__init__(self.mapper, x_size=250, y_size=180)
+        lon, lat = np.meshgrid(np.linspace(10, 14, 3), np.linspace(70, 68, 2))
+        self.look_direction = AzimuthLUT.get_azimuth(lon, lat, axis=1, offset=270)
+
+    def test_get_look_direction_band_matches_band_reader(self):
+        meta_dict = self.mapper.get_look_direction_band(self.look_direction, 100)
+        self.mapper.create_bands([meta_dict])
+        band = self.mapper.dataset.GetRasterBand(1)
+
+        reader_data = self.mapper.band_readers['look_direction'](band, (0, 0, 250, 180))
+        gdal_data = band.ReadAsArray()
+        # look direction crosses North: compare angles modulo 360
+        tie_point_difference = np.mod(reader_data[0, [0, 100, 200]] -
+                                      self.look_direction[0] + 180, 360) - 180
+        difference = np.mod(gdal_data - reader_data + 180, 360) - 180
+
+        self.assertEqual(band.GetMetadataItem('name'), 'look_direction')
+        self.assertEqual(reader_data.shape, (180, 250))
+        self.assertTrue(np.all(np.abs(tie_point_difference) < 1e-3))
+        self.assertTrue(np.all(np.abs(difference) < 0.01))
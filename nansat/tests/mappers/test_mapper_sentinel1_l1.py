@@ -0,0 +1,129 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from nansat.mappers.mapper_sentinel1_l1 import Mapper
+from nansat.exceptions import NansatReadError
+
+from mock import patch
+
+
+class Sentinel1L1MapperTests(unittest.TestCase):
+
+    def setUp(self):
+        self.mapper = Mapper.__new__(Mapper)
+        self.tmp_dir = tempfile.mkdtemp()
+        self.calibration_xml = (
+            '<?xml version="1.0" encoding="UTF-8"?>\n<calibration><adsHeader><line>7</line>'
+            '</adsHeader><calibrationVectorList count="2">\n'
+            '<calibrationVector><line>-5</line><pixel count="4">0 40 80 120</pixel>\n'
+            '<sigmaNought count="4">1.0e+03 2.0e+03\n3.0e+03 4.0e+03</sigmaNought>'
+            '</calibrationVector>\n'
+            '<calibrationVector><line>95</line><pixel count="3">0 40 80</pixel>'
+            '<sigmaNought count="3">5.0 6.0 7.0</sigmaNought></calibrationVector>\n'
+            '</calibrationVectorList></calibration>')
+        points = ''.join('<geolocationGridPoint><line>%d</line><pixel>%d</pixel>'
+                         '<latitude>%d</latitude><longitude>%d</longitude><height>0</height>'
+                         '<incidenceAngle>30</incidenceAngle><elevationAngle>25</elevationAngle>'
+                         '</geolocationGridPoint>' % (line, pixel, line, pixel)
+                         for line in [0, 100] for pixel in [0, 50, 100])
+        self.annotation_xml = (
+            '<product><adsHeader><line>1</line></adsHeader><imageAnnotation><imageInformation>'
+            '<numberOfSamples>101</numberOfSamples><numberOfLines>201</numberOfLines>'
+            '</imageInformation></imageAnnotation><geolocationGrid>'
+            '<geolocationGridPointList count="6">%s</geolocationGridPointList>'
+            '</geolocationGrid></product>' % points)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_read_calibration(self):
+        data = self.mapper.read_calibration(self.calibration_xml, 'calibrationVectorList',
+                                            ['sigmaNought'], '_HH')
+
+        self.assertEqual(sorted(data), ['line', 'pixel', 'sigmaNought_HH'])
+        self.assertTrue(np.all(data['pixel'] == [[0, 40, 80], [0, 40, 80]]))
+        self.assertTrue(np.all(data['line'] == [[-5, -5, -5], [95, 95, 95]]))
+        self.assertTrue(np.allclose(data['sigmaNought_HH'], [[1000, 2000, 3000], [5, 6, 7]]))
+        self.assertEqual(data['pixel'].dtype.kind, 'i')
+
+    def test_read_element_values(self):
+        values = Mapper.read_element_values(self.calibration_xml, 'calibrationVectorList',
+                                            ['line', 'pixel'])
+
+        self.assertEqual(values['line'], ['-5', '95'])
+        self.assertEqual(values['pixel'], ['0 40 80 120', '0 40 80'])
+
+    def test_decode_values(self):
+        values = Mapper.decode_values(['1 2', '3\n4'], float, 4)
+
+        self.assertTrue(np.all(values == [1, 2, 3, 4]))
+        with self.assertRaises(NansatReadError):
+            Mapper.decode_values(['1 2', '3'], float, 4)
+
+    def test_read_annotation(self):
+        self.mapper.read_vsi = lambda filename: self.annotation_xml
+        data = self.mapper.read_annotation(['/path/s1a-ew-grd-hh-20190101t000000.xml',
+                                            '/path/s1a-ew-grd-hv-20190101t000000.xml'])
+
+        self.assertEqual(data['shape'], (2, 3))
+        self.assertTrue(np.all(data['pixel'] == [[0, 50, 100], [0, 50, 100]]))
+        self.assertTrue(np.all(data['latitude'] == [[0, 0, 0], [100, 100, 100]]))
+        self.assertEqual((data['x_size'], data['y_size']), (101, 201))
+        self.assertEqual(data['pol'], ['HH', 'HV'])
+
+    def test_save_load_aux_data(self):
+        filename = os.path.join(self.tmp_dir, 'S1A_EW_GRDM_1SDH_20190101T000000.zip')
+        with open(filename, 'w') as f:
+            f.write('product')
+        cache_dir = os.path.join(self.tmp_dir, 'cache')
+        self.mapper.read_vsi = lambda filename: self.annotation_xml
+        calibration_data = self.mapper.read_calibration(
+            self.calibration_xml, 'calibrationVectorList', ['sigmaNought'], '_HH')
+        calibration_data['noise_name'] = 'noiseLut'
+        aux_data = {'annotation': self.mapper.read_annotation(
+                        ['/path/s1a-ew-grd-hh-20190101t000000.xml']),
+                    'manifest': {'platform_number': 'A'},
+                    'noise_HH': calibration_data}
+
+        self.assertEqual(self.mapper.load_aux_data(filename, cache_dir), {})
+        self.mapper.save_aux_data(filename, cache_dir, aux_data)
+        aux_data2 = self.mapper.load_aux_data(filename, cache_dir)
+
+        self.assertEqual(os.listdir(cache_dir),
+                         [os.path.basename(self.mapper.get_aux_data_filename(filename, cache_dir))])
+        self.assertEqual(sorted(aux_data2), ['annotation', 'manifest', 'noise_HH'])
+        self.assertEqual(aux_data2['annotation']['shape'], (2, 3))
+        self.assertEqual(aux_data2['annotation']['pol'], ['HH'])
+        self.assertEqual(aux_data2['annotation']['x_size'], 101)
+        self.assertEqual(aux_data2['manifest'], {'platform_number': 'A'})
+        self.assertEqual(aux_data2['noise_HH']['noise_name'], 'noiseLut')
+        self.assertTrue(np.all(aux_data2['noise_HH']['sigmaNought_HH'] ==
+                               calibration_data['sigmaNought_HH']))
+        self.assertTrue(np.all(aux_data2['annotation']['latitude'] ==
+                               aux_data['annotation']['latitude']))
+
+        # modified product is not found in the cache
+        with open(filename, 'a') as f:
+            f.write('modified')
+        self.assertEqual(self.mapper.load_aux_data(filename, cache_dir), {})
+
+    @patch('nansat.mappers.mapper_sentinel1_l1.np.savez')
+    def test_save_aux_data_error(self, mock_savez):
+        filename = os.path.join(self.tmp_dir, 'S1A_EW_GRDM_1SDH_20190101T000000.zip')
+        with open(filename, 'w') as f:
+            f.write('product')
+        cache_dir = os.path.join(self.tmp_dir, 'cache')
+        mock_savez.side_effect = IOError('No space left on device')
+
+        with self.assertRaises(IOError):
+            self.mapper.save_aux_data(filename, cache_dir, {'manifest': {'a': 'b'}})
+        self.assertEqual(os.listdir(cache_dir), [])
+
+    def test_aux_data_no_cache_dir(self):
+        self.mapper.save_aux_data('S1A_product.zip', None, {'manifest': {'a': 'b'}})
+
+        self.assertEqual(self.mapper.load_aux_data('S1A_product.zip', None), {})
@@ -0,0 +1,90 @@
+import os
+import unittest
+
+import numpy as np
+
+from nansat.mappers.subdatasets import SubDatasets
+
+from mock import patch, Mock, MagicMock
+
+
+class SubDatasetsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.gdal_dataset = MagicMock()
+        self.gdal_dataset.GetSubDatasets.return_value = [
+            ('HDF4:"file.hdf":0', '[10x20] Longitude (32-bit floating-point)'),
+            ('HDF4:"file.hdf":1', '[10x20] Latitude (32-bit floating-point)'),
+            ('HDF4:"file.hdf":2', '[10x20] chlor_a (32-bit floating-point)')]
+
+    def test_init(self):
+        subdatasets = SubDatasets(self.gdal_dataset, threads=4)
+
+        self.assertEqual(len(subdatasets), 3)
+        self.assertEqual(subdatasets.threads, 4)
+        self.assertEqual(subdatasets.names[1], 'HDF4:"file.hdf":1')
+        self.assertEqual(list(subdatasets), self.gdal_dataset.GetSubDatasets.return_value)
+
+    @patch.dict('os.environ', {})
+    def test_init_threads_default(self):
+        os.environ.pop(SubDatasets.ENV_VAR, None)
+        subdatasets = SubDatasets(self.gdal_dataset)
+
+        self.assertEqual(subdatasets.threads, 1)
+
+    @patch.dict('os.environ', {SubDatasets.ENV_VAR: '2'})
+    def test_init_threads_from_env(self):
+        subdatasets = SubDatasets(self.gdal_dataset)
+
+        self.assertEqual(subdatasets.threads, 2)
+
+    def test_find(self):
+        subdatasets = SubDatasets(self.gdal_dataset)
+
+        self.assertEqual(subdatasets.find('Latitude'), ['HDF4:"file.hdf":1'])
+        self.assertEqual(subdatasets.find('sst'), [])
+
+    @patch('nansat.mappers.subdatasets.gdal.Open')
+    def test_open(self, mock_open):
+        mock_open.side_effect = lambda name: 'dataset ' + name
+        subdatasets = SubDatasets(self.gdal_dataset)
+
+        datasets = subdatasets.open()
+        datasets2 = subdatasets.open(subdatasets.names[::-1])
+
+        self.assertEqual(datasets, ['dataset ' + name for name in subdatasets.names])
+        self.assertEqual(datasets2, datasets[::-1])
+        self.assertEqual(mock_open.call_count, 3)
+
+    @patch('nansat.mappers.subdatasets.gdal.Open')
+    def test_open_error(self, mock_open):
+        mock_open.side_effect = RuntimeError('Cannot open')
+        subdatasets = SubDatasets(self.gdal_dataset, threads=2)
+
+        self.assertEqual(subdatasets.open(), [None, None, None])
+
+    @patch('nansat.mappers.subdatasets.gdal.Open')
+    def test_getitem(self, mock_open):
+        mock_open.side_effect = lambda name: 'dataset ' + name
+        subdatasets = SubDatasets(self.gdal_dataset, threads=1)
+
+        dataset = subdatasets['HDF4:"file.hdf":2']
+        dataset2 = subdatasets['HDF4:"file.hdf":2']
+
+        self.assertEqual(dataset, 'dataset HDF4:"file.hdf":2')
+        self.assertEqual(dataset2, dataset)
+        mock_open.assert_called_once_with('HDF4:"file.hdf":2')
+
+    @patch('nansat.mappers.subdatasets.gdal.Open')
+    def test_read_decimated(self, mock_open):
+        data = np.arange(200).reshape(10, 20)
+        band = Mock(XSize=20, YSize=10)
+        band.ReadAsArray.side_effect = lambda x_off, y_off, x_size, y_size: (
+            data[y_off:y_off + y_size, x_off:x_off + x_size])
+        mock_open.return_value.GetRasterBand.return_value = band
+        subdatasets = SubDatasets(self.gdal_dataset)
+
+        array = subdatasets.read_decimated('HDF4:"file.hdf":0', (3, 5))
+
+        self.assertTrue(np.all(array == data[::3, ::5]))
+        self.assertEqual(band.ReadAsArray.call_count, 4)
@@ -0,0 +1,100 @@
+#------------------------------------------------------------------------------
+# Name:         test_aux_cache.py
+# Purpose:      Test the AuxCache class
+# Licence:      This file is part of NANSAT. You can redistribute it or modify
+#               under the terms of GNU General Public License, v.3
+#               http://www.gnu.org/licenses/gpl-3.0.html
+#------------------------------------------------------------------------------
+import os
+import json
+import shutil
+import unittest
+
+import numpy as np
+from mock import patch
+
+from nansat import Domain, Nansat
+from nansat.aux_cache import AuxCache
+from nansat.tests.nansat_test_base import NansatTestBase
+
+
+class AuxCacheTest(NansatTestBase):
+
+    def setUp(self):
+        super(AuxCacheTest, self).setUp()
+        self.cache_dir = os.path.join(self.tmp_data_path, 'aux_cache')
+        if os.path.exists(self.cache_dir):
+            shutil.rmtree(self.cache_dir)
+        self.domain = Domain(4326, '-te 25 70 35 72 -ts 50 40')
+
+    def test_disabled(self):
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertFalse(AuxCache().enabled)
+        with patch.dict(os.environ, {'NANSAT_AUX_CACHE': self.cache_dir}):
+            self.assertEqual(AuxCache().cache_dir, self.cache_dir)
+
+    def test_get_key(self):
+        c = AuxCache(self.cache_dir)
+        key = c.get_key(self.domain, 'watermask', self.test_file_stere, resample_alg=0)
+
+        self.assertTrue(key.startswith('watermask_'))
+        self.assertEqual(key, c.get_key(Domain(4326, '-te 25 70 35 72 -ts 50 40'),
+                                        'watermask', self.test_file_stere, resample_alg=0))
+        self.assertNotEqual(key, c.get_key(self.domain, 'watermask', self.test_file_stere,
+                                           resample_alg=1))
+        self.assertNotEqual(key, c.get_key(self.domain, 'distance2coast', self.test_file_stere,
+                                           resample_alg=0))
+        self.assertNotEqual(key, c.get_key(Domain(4326, '-te 25 70 35 72 -ts 50 41'),
+                                           'watermask', self.test_file_stere, resample_alg=0))
+
+    def test_put_get(self):
+        c = AuxCache(self.cache_dir)
+        array = np.random.randn(40, 50).astype(np.float32)
+        n = Nansat.from_domain(self.domain, array, {'name': 'distance'})
+        n.add_band(array * 2, {'name': 'distance2'})
+
+        self.assertIsNone(c.get('distance2coast_key'))
+        c.put('distance2coast_key', n)
+        metadata_dict = c.get('distance2coast_key')
+        n2 = Nansat.from_domain(self.domain)
+        n2.vrt.create_bands(metadata_dict)
+
+        self.assertEqual(len(metadata_dict), 2)
+        self.assertTrue(np.allclose(n2['distance'], array))
+        self.assertTrue(np.allclose(n2['distance2'], array * 2))
+
+    def test_get_corrupted(self):
+        c = AuxCache(self.cache_dir)
+        n = Nansat.from_domain(self.domain, np.zeros((40, 50), np.uint8))
+        c.put('watermask_key', n)
+        with open(os.path.join(self.cache_dir, 'watermask_key.raw'), 'wb') as raw_file:
+            raw_file.write(b'0')
+
+        self.assertIsNone(c.get('watermask_key'))
+
+    def test_get_malformed_entry(self):
+        c = AuxCache(self.cache_dir)
+        n = Nansat.from_domain(self.domain, np.zeros((40, 50), np.uint8))
+        c.put('watermask_key', n)
+        json_filename = os.path.join(self.cache_dir, 'watermask_key.json')
+        with open(json_filename) as json_file:
+            entry = json.load(json_file)
+        entry['dtype'] = entry.pop('dtypes')[0]
+        with open(json_filename, 'w') as json_file:
+            json.dump(entry, json_file)
+
+        self.assertIsNone(c.get('watermask_key'))
+
+    def test_put_error(self):
+        c = AuxCache(self.cache_dir)
+        n = Nansat.from_domain(self.domain, np.zeros((40, 50), np.uint8))
+        with patch.object(Nansat, 'get_metadata', side_effect=IOError('No space left')):
+            with self.assertRaises(IOError):
+                c.put('watermask_key', n)
+
+        self.assertEqual(os.listdir(self.cache_dir), [])
+        self.assertIsNone(c.get('watermask_key'))
+
+
+if __name__ == "__main__":
+    unittest.main()
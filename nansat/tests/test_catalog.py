@@ -0,0 +1,85 @@
+#------------------------------------------------------------------------------
+# Name:         test_catalog.py
+# Purpose:      Test the Catalog class
+# Licence:      This file is part of NANSAT. You can redistribute it or modify
+#               under the terms of GNU General Public License, v.3
+#               http://www.gnu.org/licenses/gpl-3.0.html
+#------------------------------------------------------------------------------
+import os
+import unittest
+
+from nansat import Domain, Nansat
+from nansat.catalog import Catalog
+from nansat.tests.nansat_test_base import NansatTestBase
+
+
+class CatalogTest(NansatTestBase):
+
+    def setUp(self):
+        super(CatalogTest, self).setUp()
+        self.catalog_filename = os.path.join(self.tmp_data_path, 'nansat_catalog.sqlite')
+        if os.path.exists(self.catalog_filename):
+            os.remove(self.catalog_filename)
+
+    def test_add(self):
+        c = Catalog()
+        added = c.add([self.test_file_stere, self.test_file_gcps], mapper=self.default_mapper)
+
+        self.assertEqual(added, [self.test_file_stere, self.test_file_gcps])
+        self.assertEqual(len(c), 2)
+        self.assertIn(self.test_file_stere, c)
+        footprint = c.get_footprint(self.test_file_stere)
+        self.assertEqual(footprint['mapper'], 'generic')
+        self.assertTrue(footprint['border'].startswith('POLYGON'))
+
+    def test_add_skips_not_modified(self):
+        c = Catalog(self.catalog_filename)
+        c.add(self.test_file_stere, mapper=self.default_mapper)
+        c.close()
+        c = Catalog(self.catalog_filename)
+        added = c.add(self.test_file_stere, mapper=self.default_mapper)
+
+        self.assertEqual(added, [])
+        self.assertEqual(len(c), 1)
+
+    def test_add_not_readable(self):
+        c = Catalog()
+        added = c.add(self.tmp_filename)
+
+        self.assertEqual(added, [])
+        self.assertEqual(len(c), 0)
+
+    def test_add_missing(self):
+        c = Catalog()
+        added = c.add([os.path.join(self.tmp_data_path, 'missing.tif'), self.test_file_stere],
+                      mapper=self.default_mapper)
+
+        self.assertEqual(added, [self.test_file_stere])
+        self.assertEqual(len(c), 1)
+
+    def test_remove(self):
+        c = Catalog()
+        c.add(self.test_file_stere, mapper=self.default_mapper)
+        c.remove(self.test_file_stere)
+
+        self.assertEqual(len(c), 0)
+        with self.assertRaises(KeyError):
+            c.get_footprint(self.test_file_stere)
+
+    def test_search(self):
+        c = Catalog()
+        c.add([self.test_file_stere, self.test_file_gcps], mapper=self.default_mapper)
+        n = Nansat(self.test_file_stere, mapper=self.default_mapper)
+        far_domain = Domain(4326, '-te -50 -50 -40 -40 -ts 10 10')
+
+        self.assertIn(self.test_file_stere, c.search(n))
+        self.assertEqual(sorted(c.search(n)),
+                         sorted([f for f in [self.test_file_stere, self.test_file_gcps]
+                                 if Nansat(f, mapper=self.default_mapper).intersects(n)]))
+        self.assertEqual(c.search(far_domain), [])
+        with self.assertRaises(ValueError):
+            c.search(n, predicate='touches')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -21,7 +21,7 @@ from mock import patch, PropertyMock, Mock, MagicMock, DEFAULT
 from nansat.nsr import NSR
 from nansat.vrt import VRT
 from nansat.domain import Domain
-from nansat.utils import gdal, ogr
+from nansat.utils import gdal, ogr, initial_bearing
 from nansat.tests import nansat_test_data as ntd
 from nansat.exceptions import NansatProjectionError
 from nansat.warnings import NansatFutureWarning
@@ -385,6 +385,34 @@ class DomainTest(unittest.TestCase):
         self.assertFalse(Paris.contains(Norway))
 
 
+    def test_get_border_geometry_cached(self):
+        d = Domain(4326, "-te 25 70 35 72 -ts 500 500")
+        with patch.object(d, 'get_border_wkt', wraps=d.get_border_wkt) as get_border_wkt:
+            geom1 = d.get_border_geometry()
+            geom2 = d.get_border_geometry()
+            self.assertEqual(get_border_wkt.call_count, 1)
+            self.assertTrue(geom1.Equals(geom2))
+            d.vrt.dataset.SetGeoTransform((0, 0.1, 0, 10, 0, -0.1))
+            geom3 = d.get_border_geometry()
+            self.assertEqual(get_border_wkt.call_count, 2)
+            self.assertFalse(geom1.Equals(geom3))
+
+    def test_check_domains(self):
+        Bergen = Domain(4326, EXTENT_BERGEN)
+        WestCoast = Domain(4326, EXTENT_WESTCOAST)
+        Norway = Domain(4326, EXTENT_NORWAY)
+        Paris = Domain(4326, EXTENT_PARIS)
+        domains = [Bergen, WestCoast, Paris]
+        self.assertEqual(Norway.check_domains(domains).tolist(),
+                         [Norway.intersects(d) for d in domains])
+        self.assertEqual(Norway.check_domains(domains, 'contains').tolist(),
+                         [Norway.contains(d) for d in domains])
+        self.assertEqual(Norway.check_domains(domains, 'overlaps').tolist(),
+                         [Norway.overlaps(d) for d in domains])
+        self.assertEqual(Bergen.check_domains([Norway], 'within').tolist(), [True])
+        with self.assertRaises(ValueError):
+            Norway.check_domains(domains, 'touches')
+
     def test_contains(self):
         Bergen = Domain(4326, EXTENT_BERGEN)
         WestCoast = Domain(4326, EXTENT_WESTCOAST)
@@ -425,6 +453,17 @@ class DomainTest(unittest.TestCase):
         self.assertLess(result[2], result[3])
         self.assertEqual(result, (25.0, 34.980000000000004, 70.004000000000005, 72.0))
 
+    def test_get_min_max_lon_lat_equals_grids(self):
+        srs = '+proj=stere +datum=WGS84 +ellps=WGS84 +lat_0=90 +lon_0=0 +no_defs'
+        for proj4, te in [(srs, '-te 1000000 -2000000 1500000 -1000000 -ts 200 300'),
+                          (srs, '-te -500000 -500000 500000 500000 -ts 150 150'),
+                          (srs.replace('lat_0=90 +lon_0=0', 'lat_0=0 +lon_0=-179'),
+                           '-te -1000000 -1000 1000000 1000 -ts 10 10')]:
+            d = Domain(proj4, te)
+            lon, lat = d.get_geolocation_grids()
+            result = d.get_min_max_lon_lat()
+            self.assertTrue(np.allclose(result, (lon.min(), lon.max(), lat.min(), lat.max())))
+
     def test_get_pixelsize_meters(self):
         d = Domain(4326, "-te 25 70 35 72 -ts 500 500")
         x, y = d.get_pixelsize_meters()
@@ -493,6 +532,17 @@ class DomainTest(unittest.TestCase):
         d = Domain(4326, "-te -4 -5 +6 +7 -ts 3 2")
         self.assertTrue((d.azimuth_y()==np.array([[ 0.,  0.,  0.], [ 0.,  0.,  0.]])).all())
 
+    def test_azimuth_y_reduced(self):
+        d = Domain('+proj=stere +datum=WGS84 +ellps=WGS84 +lat_0=90 +lon_0=0 +no_defs',
+                   '-te -500000 -2500000 500000 -1500000 -ts 500 400')
+        lon, lat = d.get_geolocation_grids(10)
+        expected = initial_bearing(lon[1:], lat[1:], lon[:-1], lat[:-1])
+        azimuth = d.azimuth_y(10)
+
+        self.assertEqual(azimuth.shape, (40, 50))
+        difference = np.mod(azimuth[:-1] - expected + 180, 360) - 180
+        self.assertTrue(np.all(np.abs(difference) < 1))
+
     def test_shape(self):
         d = Domain(4326, "-te 25 70 35 72 -ts 500 500")
         self.assertEqual(d.shape(), (500, 500))
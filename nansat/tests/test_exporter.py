@@ -152,6 +152,21 @@ class ExporterTest(NansatTestBase):
 
         self.assertTrue(os.path.exists(tmpfilename))
 
+    def test_export_gtiff_overviews(self):
+        n = Nansat(self.test_file_gcps, log_level=40, mapper=self.default_mapper)
+        tmpfilename = os.path.join(self.tmp_data_path, 'nansat_export_overviews.tif')
+        n.export(tmpfilename, driver='GTiff', overviews=[2, 4])
+        ds = gdal.Open(tmpfilename)
+
+        self.assertEqual(ds.GetRasterBand(1).GetOverviewCount(), 2)
+        self.assertEqual(ds.GetRasterBand(1).GetOverview(1).XSize, (ds.RasterXSize + 3) // 4)
+
+    def test_export_netcdf_overviews(self):
+        n = Nansat(self.test_file_gcps, log_level=40, mapper=self.default_mapper)
+        tmpfilename = os.path.join(self.tmp_data_path, 'nansat_export_overviews.nc')
+        with self.assertRaises(ValueError):
+            n.export(tmpfilename, overviews=[2, 4])
+
     def test_export_band(self):
         n = Nansat(self.test_file_gcps, log_level=40, mapper=self.default_mapper)
         tmpfilename = os.path.join(self.tmp_data_path,
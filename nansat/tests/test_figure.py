@@ -133,6 +133,66 @@ class FigureTest(NansatTestBase):
         f.apply_logarithm()
         self.assertTrue(np.allclose(np.ones((1,2,2))*0.31622777, f.array))
 
+    @patch.object(Figure, '__init__', return_value=None)
+    def test_clim_from_histogram(self, mock1):
+        f = Figure()
+        array = np.random.randn(1, 200, 100)
+        array[0, 10:20, :] = np.nan
+        f.array = array
+        clim = f.clim_from_histogram(ratio=0.9, histBins=10,
+                                     HIST_BLOCK_SIZE=500)
+        valid = array[np.isfinite(array)]
+        self.assertAlmostEqual(clim[0][0], np.percentile(valid, 5))
+        self.assertAlmostEqual(clim[1][0], np.percentile(valid, 95))
+
+    @patch.object(Figure, '__init__', return_value=None)
+    def test_clim_from_histogram_passes(self, mock1):
+        f = Figure()
+        f.array = np.random.randn(1, 200, 100)
+        clim = f.clim_from_histogram(ratio=0.9, histBins=10,
+                                     HIST_BLOCK_SIZE=500, HIST_PASSES=1)
+        error = (f.array.max() - f.array.min()) / 10.
+        self.assertLess(abs(clim[0][0] - np.percentile(f.array, 5)), error)
+        self.assertLess(abs(clim[1][0] - np.percentile(f.array, 95)), error)
+
+    @patch.object(Figure, '__init__', return_value=None)
+    def test_clim_from_histogram_masked_decimated(self, mock1):
+        f = Figure()
+        f.array = np.random.randn(1, 200, 100)
+        mask_array = np.zeros((200, 100))
+        mask_array[:50] = 2
+        clim = f.clim_from_histogram(ratio=0.5, histStep=2,
+                                     mask_array=mask_array,
+                                     mask_lut={2: [0, 0, 0]})
+        valid = f.array[0, 50::2, ::2]
+        self.assertAlmostEqual(clim[0][0], np.percentile(valid, 25))
+        self.assertAlmostEqual(clim[1][0], np.percentile(valid, 75))
+
+    @patch.object(Figure, '__init__', return_value=None)
+    def test_map_to_palette(self, mock1):
+        array = np.random.randn(1, 30, 20) * 10
+        mask_array = np.random.randint(0, 3, (30, 20))
+        mask_lut = {1: [0, 0, 0], 2: [255, 0, 0]}
+        f1 = Figure()
+        f1.array = np.array(array)
+        f1._set_defaults(dict(cmin=[-5.], cmax=[5.], logarithm=True,
+                              mask_array=mask_array, mask_lut=mask_lut))
+        f1.clip()
+        f1.apply_logarithm()
+        f1.convert_palettesize()
+        f1._create_palette()
+        f1.apply_mask()
+        f2 = Figure()
+        f2.array = np.array(array)
+        f2._set_defaults(dict(cmin=[-5.], cmax=[5.], logarithm=True,
+                              mask_array=mask_array, mask_lut=mask_lut,
+                              BLOCK_SIZE=100))
+        f2._create_palette()
+        f2._map_to_palette()
+        self.assertEqual(f2.array.dtype, np.uint8)
+        self.assertTrue(np.all(f1.array == f2.array))
+        self.assertTrue(np.all(f1.palette == f2.palette))
+
     @patch.object(Figure, '__init__', return_value=None)
     def test_make_transparent_color(self, mock1):
         f = Figure()
@@ -144,6 +204,17 @@ class FigureTest(NansatTestBase):
         f._make_transparent_color()
         self.assertTrue((np.array(f.pilImg)[:,:,3] == np.array([[0,255],[255,255]])).all())
 
+    @patch.object(Figure, '__init__', return_value=None)
+    def test_make_transparent_color_scalar_and_mask(self, mock1):
+        f = Figure()
+
+        img_array = np.array([[1.,2.],[3.,4.]])
+        f.pilImg = Image.fromarray(img_array)
+        f.reprojMask = np.array([[False, False], [False, True]])
+        f.transparency = 2
+        f._make_transparent_color()
+        self.assertTrue((np.array(f.pilImg)[:,:,3] == np.array([[255,0],[255,0]])).all())
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,61 @@
+#------------------------------------------------------------------------------
+# Name:         test_lazy_band.py
+# Purpose:      Test the LazyBand class
+# Licence:      This file is part of NANSAT. You can redistribute it or modify
+#               under the terms of GNU General Public License, v.3
+#               http://www.gnu.org/licenses/gpl-3.0.html
+#------------------------------------------------------------------------------
+import unittest
+import threading
+
+import numpy as np
+
+from nansat import Domain, Nansat
+from nansat.lazy_band import LazyBand
+from nansat.tests.nansat_test_base import NansatTestBase
+
+
+class LazyBandTest(NansatTestBase):
+
+    def test_getitem(self):
+        n = Nansat(self.test_file_gcps, log_level=40, mapper=self.default_mapper)
+        lazy_band = LazyBand(n, 'L_469')
+        array = n['L_469']
+
+        self.assertEqual(lazy_band.shape, array.shape)
+        self.assertEqual(lazy_band.dtype, array.dtype)
+        self.assertTrue(np.all(lazy_band[10:20, 5:50] == array[10:20, 5:50]))
+        self.assertTrue(np.all(lazy_band[3, ::4] == array[3, ::4]))
+        self.assertTrue(np.all(lazy_band[-1] == array[-1]))
+        self.assertEqual(lazy_band[0:0, :].shape, (0, array.shape[1]))
+        self.assertTrue(np.all(np.asarray(lazy_band) == array))
+
+    def test_getitem_swathmask(self):
+        n = Nansat.from_domain(Domain(4326, '-te 25 70 35 72 -ts 50 40'),
+                               np.ones((40, 50), np.float32))
+        n.reproject(Domain(4326, '-te 20 70 30 72 -ts 50 40'))
+        lazy_band = LazyBand(n, 1)
+
+        self.assertTrue(np.allclose(lazy_band[:, :], n[1], equal_nan=True))
+        self.assertTrue(np.isnan(lazy_band[:, :25]).all())
+
+    def test_getitem_threads(self):
+        n = Nansat(self.test_file_gcps, log_level=40, mapper=self.default_mapper)
+        lazy_band = LazyBand(n, 1)
+        results = {}
+
+        def read(row):
+            results[row] = lazy_band[row:row + 10]
+
+        threads = [threading.Thread(target=read, args=(row,)) for row in range(0, 100, 10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertTrue(np.all(np.vstack([results[row] for row in sorted(results)]) ==
+                               n[1][:100]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+#------------------------------------------------------------------------------
+# Name:         test_lut.py
+# Purpose:      Test the LUT and AzimuthLUT classes
+# Licence:      This file is part of NANSAT. You can redistribute it or modify
+#               under the terms of GNU General Public License, v.3
+#               http://www.gnu.org/licenses/gpl-3.0.html
+#------------------------------------------------------------------------------
+import unittest
+
+import numpy as np
+
+from nansat.lut import LUT, AzimuthLUT
+
+
+class LUTTest(unittest.TestCase):
+
+    def setUp(self):
+        self.rows = np.array([-5., 100, 210, 330])
+        self.cols = np.array([0., 40, 80, 120, 160])
+        # linear function of row and column
+        self.values = np.add.outer(self.rows * 2, self.cols * 3)
+        self.expected = np.add.outer(np.arange(330) * 2., np.arange(161) * 3.)
+
+    def test_init_wrong_shape(self):
+        with self.assertRaises(ValueError):
+            LUT(self.rows, self.cols, self.values.T)
+
+    def test_init_wrong_order(self):
+        with self.assertRaises(ValueError):
+            LUT(self.rows, self.cols, self.values, order=2)
+
+    def test_get_block_linear(self):
+        lut = LUT(self.rows, self.cols, self.values)
+        block = lut.get_block(0, 0, 161, 330, np.float64)
+
+        self.assertEqual(block.shape, (330, 161))
+        self.assertTrue(np.allclose(block, self.expected))
+        self.assertEqual(lut.get_block(0, 0, 10, 10).dtype, np.float32)
+
+    def test_get_block_cubic(self):
+        lut = LUT(self.rows, self.cols, self.values, order=3)
+        block = lut.get_block(0, 0, 161, 330, np.float64)
+
+        self.assertTrue(np.allclose(block, self.expected))
+
+    def test_get_block_tie_points(self):
+        values = np.random.randn(4, 5)
+        for order in [1, 3]:
+            lut = LUT(self.rows, self.cols, values, order=order)
+            block = lut.get_block(0, 0, 161, 331, np.float64)
+            self.assertTrue(np.allclose(block[[100, 210, 330]][:, ::40], values[1:]))
+
+    def test_get_block_window(self):
+        lut = LUT(self.rows, self.cols, np.random.randn(4, 5), order=3)
+        block = lut.get_block(0, 0, 161, 330)
+
+        self.assertTrue(np.allclose(lut.get_block(10, 20, 30, 40), block[20:60, 10:40]))
+
+    def test_get_block_outside(self):
+        lut = LUT(self.rows, self.cols, self.values)
+        block = lut.get_block(150, 320, 20, 20, np.float64)
+
+        self.assertTrue(np.allclose(block[10:, 10:], self.values[-1, -1]))
+
+    def test_get_block_extrapolate(self):
+        lut = LUT(self.rows, self.cols, self.values, extrapolate=True)
+        block = lut.get_block(150, 320, 20, 20, np.float64)
+
+        self.assertTrue(np.allclose(block, np.add.outer(np.arange(320, 340) * 2.,
+                                                        np.arange(150, 170) * 3.)))
+
+    def test_get_block_cache(self):
+        lut = LUT(self.rows, self.cols, self.values, cache_size=3)
+        for y_offset in range(5):
+            lut.get_block(0, y_offset, 161, 1)
+
+        self.assertEqual(len(lut._weights), 3)
+        self.assertIn(('cols', 0, 161), lut._weights)
+
+    def test_get_grid(self):
+        lut = LUT(self.rows, self.cols, np.random.randn(4, 5), order=3)
+        grid = lut.get_grid(np.array([20., 21, 22.5]), np.array([10., 11, 12.25]), np.float64)
+
+        self.assertEqual(grid.shape, (3, 3))
+        self.assertTrue(np.allclose(grid[:2, :2], lut.get_block(10, 20, 2, 2, np.float64)))
+        linear_lut = LUT(self.rows, self.cols, self.values)
+        self.assertTrue(np.allclose(linear_lut.get_grid([22.5], [12.25], np.float64),
+                                    22.5 * 2 + 12.25 * 3))
+
+    def test_from_tie_points(self):
+        lines, pixels = np.meshgrid(self.rows, self.cols, indexing='ij')
+        lut = LUT.from_tie_points(lines, pixels, self.values)
+
+        self.assertTrue(np.all(lut.rows == self.rows))
+        self.assertTrue(np.all(lut.cols == self.cols))
+
+
+class AzimuthLUTTest(unittest.TestCase):
+
+    def test_get_block_across_north(self):
+        azimuth = np.array([[350., 10.], [350., 10.]])
+        lut = AzimuthLUT([0, 10], [0, 10], azimuth)
+        block = lut.get_block(0, 0, 11, 11)
+
+        self.assertTrue(np.all(np.abs(np.mod(block[:, 5] + 180, 360) - 180) < 1e-4))
+        self.assertTrue(np.allclose(block[:, 0], 350))
+        self.assertTrue(np.allclose(block[:, 2], 354, atol=0.1))
+        self.assertTrue(np.allclose(block[:, 8], 6, atol=0.1))
+        self.assertEqual(block.dtype, np.float32)
+
+    def test_get_grid_across_north(self):
+        lut = AzimuthLUT([0, 10], [0, 10], np.array([[350., 10.], [350., 10.]]))
+        grid = lut.get_grid([0., 5.], [2.5, 5.], np.float64)
+
+        self.assertTrue(np.allclose(grid[:, 0], 355, atol=0.1))
+        self.assertTrue(np.all(np.minimum(grid[:, 1], 360 - grid[:, 1]) < 1e-4))
+
+    def test_get_components(self):
+        lut = AzimuthLUT([0, 10], [0, 10], np.array([[350., 10.], [80., 120.]]))
+        u_lut, v_lut = lut.get_components()
+        u = u_lut.get_block(0, 0, 11, 11, np.float64)
+        v = v_lut.get_block(0, 0, 11, 11, np.float64)
+        direction = np.mod(np.degrees(np.arctan2(u, v)), 360)
+
+        self.assertTrue(np.allclose(u_lut.get_block(0, 0, 1, 1), np.sin(np.radians(350))))
+        self.assertTrue(np.allclose(v_lut.get_block(0, 0, 1, 1), np.cos(np.radians(350))))
+        self.assertTrue(np.allclose(direction, lut.get_block(0, 0, 11, 11, np.float64)))
+
+    def test_get_azimuth_meridian(self):
+        lon, lat = np.meshgrid([10., 11., 12.], [60., 59., 58., 57.])
+        azimuth_rows = AzimuthLUT.get_azimuth(lon, lat, axis=0)
+        azimuth_cols = AzimuthLUT.get_azimuth(lon, lat, axis=1, offset=90)
+
+        self.assertEqual(azimuth_rows.shape, (4, 3))
+        self.assertTrue(np.allclose(azimuth_rows, 180))
+        # direction of increasing columns is east, plus offset
+        self.assertTrue(np.all(np.abs(azimuth_cols - 180) < 1))
+
+    def test_get_azimuth_dateline(self):
+        lon = np.array([[179.5, -179.5], [179.5, -179.5]])
+        lat = np.array([[0., 0.], [1., 1.]])
+
+        self.assertTrue(np.allclose(AzimuthLUT.get_azimuth(lon, lat, axis=1), 90, atol=0.01))
+        self.assertTrue(np.allclose(AzimuthLUT.get_azimuth(lon, lat, axis=0), 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
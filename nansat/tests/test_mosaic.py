@@ -0,0 +1,158 @@
+#------------------------------------------------------------------------------
+# Name:         test_mosaic.py
+# Purpose:      Test the Mosaic class
+# Licence:      This file is part of NANSAT. You can redistribute it or modify
+#               under the terms of GNU General Public License, v.3
+#               http://www.gnu.org/licenses/gpl-3.0.html
+#------------------------------------------------------------------------------
+import os
+import json
+import unittest
+import warnings
+
+import numpy as np
+
+from nansat import Domain, Nansat
+from nansat.mosaic import Mosaic, Statistics
+from nansat.tests.nansat_test_base import NansatTestBase
+
+
+class StatisticsTest(unittest.TestCase):
+
+    def test_update(self):
+        data = np.random.randn(5, 10, 12) + 10
+        valid = np.random.rand(5, 10, 12) > 0.3
+        data[~valid] = np.nan
+        times = [3., 1., 4., 0., 2.]
+        s = Statistics((10, 12), ['count', 'mean', 'std', 'median', 'min', 'max', 'latest'],
+                       median_range=(0, 20), median_bins=1000)
+        for i in range(5):
+            for row in [0, 4, 8]:
+                s.update(row, data[i, row:row + 4], valid[i, row:row + 4], i, times[i])
+        arrays = dict(s.get_arrays())
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            self.assertTrue(np.all(arrays['count'] == valid.sum(axis=0)))
+            self.assertTrue(np.allclose(arrays['mean'], np.nanmean(data, axis=0),
+                                        equal_nan=True))
+            self.assertTrue(np.allclose(arrays['std'], np.nanstd(data, axis=0),
+                                        equal_nan=True, atol=1e-5))
+            self.assertTrue(np.allclose(arrays['median'], np.nanmedian(data, axis=0),
+                                        equal_nan=True, atol=0.01))
+            self.assertTrue(np.allclose(arrays['min'], np.nanmin(data, axis=0), equal_nan=True))
+            self.assertTrue(np.allclose(arrays['max'], np.nanmax(data, axis=0), equal_nan=True))
+        latest_index = np.argmax(np.where(valid, np.array(times)[:, None, None], -1), axis=0)
+        latest_index[~valid.any(axis=0)] = -1
+        self.assertTrue(np.all(arrays['latest_index'] == latest_index))
+        min_index = np.argmin(np.where(valid, data, np.inf), axis=0)
+        min_index[~valid.any(axis=0)] = -1
+        self.assertTrue(np.all(arrays['min_index'] == min_index))
+
+    def test_median_blocks(self):
+        data = np.random.randn(3, 10, 12) + 10
+        valid = np.ones((3, 10, 12), bool)
+        s = Statistics((10, 12), ['count', 'median'], median_range=(0, 20), median_bins=100,
+                       n_sources=3, median_max_bytes=100 * 12 * 2 * 4)
+        for i, median_block in enumerate(s.median_blocks):
+            if i > 0:
+                s.set_median_rows(*median_block)
+            for j in range(3):
+                s.update(0, data[j], valid[j], j, 0., median_only=i > 0)
+            s.flush_median()
+        arrays = dict(s.get_arrays())
+
+        self.assertEqual(s.median_blocks, [(0, 4), (4, 4), (8, 2)])
+        self.assertTrue(np.all(arrays['count'] == 3))
+        self.assertTrue(np.allclose(arrays['median'], np.median(data, axis=0), atol=0.1))
+
+    def test_data_types(self):
+        s = Statistics((10, 12), ['min', 'median'], median_range=(0, 1), n_sources=100)
+        s_many = Statistics((10, 12), ['min', 'median'], median_range=(0, 1),
+                            n_sources=70000)
+
+        self.assertEqual(s.min_index.dtype, np.int16)
+        self.assertEqual(s.histogram.dtype, np.uint16)
+        self.assertEqual(s_many.min_index.dtype, np.int32)
+        self.assertEqual(s_many.histogram.dtype, np.uint32)
+
+    def test_median_range_required(self):
+        with self.assertRaises(ValueError):
+            Statistics((10, 12), ['median'])
+
+
+class MosaicTest(NansatTestBase):
+
+    def setUp(self):
+        super(MosaicTest, self).setUp()
+        self.domain = Domain(4326, '-te 25 70 35 72 -ts 50 40')
+        self.arrays = [np.random.randn(40, 50).astype(np.float32) for i in range(3)]
+        self.arrays[1][:20] = np.nan
+        self.scenes = []
+        for i, array in enumerate(self.arrays):
+            n = Nansat.from_domain(self.domain, array, {'name': 'sst'})
+            n.set_metadata('time_coverage_start', '2020-01-0%dT00:00:00' % (3 - i))
+            self.scenes.append(n)
+
+    def test_composite(self):
+        m = Mosaic.from_domain(self.domain)
+        m.composite(self.scenes, ['sst'], ['count', 'mean', 'max', 'latest'], threads=2)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            self.assertTrue(np.all(m['sst_count'] == np.isfinite(self.arrays).sum(axis=0)))
+            self.assertTrue(np.allclose(m['sst_mean'], np.nanmean(self.arrays, axis=0)))
+            self.assertTrue(np.allclose(m['sst_max'], np.nanmax(self.arrays, axis=0)))
+        # first scene is the latest
+        self.assertTrue(np.all(m['sst_latest_index'] == 0))
+        self.assertTrue(np.allclose(m['sst_latest'], self.arrays[0]))
+        self.assertEqual(len(json.loads(m.get_metadata('mosaic_inputs'))), 3)
+        # inputs are restored after reprojection
+        self.assertEqual(self.scenes[0].vrt.dataset.RasterCount, 1)
+
+    def test_composite_median_blocks(self):
+        m = Mosaic.from_domain(self.domain)
+        # histograms of 15 rows in one pass
+        m.MEDIAN_MAX_BYTES = 100 * 50 * 2 * 15
+        m.composite(self.scenes, ['sst'], ['count', 'median'], median_range=(-5, 5),
+                    median_bins=100)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            self.assertTrue(np.all(m['sst_count'] == np.isfinite(self.arrays).sum(axis=0)))
+            self.assertTrue(np.allclose(m['sst_median'], np.nanmedian(self.arrays, axis=0),
+                                        atol=0.1))
+
+    def test_composite_latest_without_time(self):
+        self.scenes[1] = Nansat.from_domain(self.domain, self.arrays[1], {'name': 'sst'})
+        m = Mosaic.from_domain(self.domain)
+        with self.assertRaises(ValueError):
+            m.composite(self.scenes, ['sst'], ['latest'])
+        m.composite(self.scenes, ['sst'], ['count'])
+
+        self.assertTrue(np.all(m['sst_count'] == np.isfinite(self.arrays).sum(axis=0)))
+
+    def test_composite_skips_not_intersecting(self):
+        far_scene = Nansat.from_domain(Domain(4326, '-te -50 -50 -40 -40 -ts 10 10'),
+                                       np.ones((10, 10), np.float32), {'name': 'sst'})
+        m = Mosaic.from_domain(self.domain)
+        m.composite(self.scenes[:1] + [far_scene], ['sst'], ['count'])
+
+        self.assertTrue(np.all(m['sst_count'] == 1))
+
+    def test_composite_export(self):
+        m = Mosaic.from_domain(self.domain)
+        m.composite(self.scenes, ['sst'], ['mean'])
+        tmpfilename = os.path.join(self.tmp_data_path, 'mosaic_export.nc')
+        m.export(tmpfilename)
+
+        self.assertTrue(os.path.exists(tmpfilename))
+
+    def test_composite_wrong_statistic(self):
+        m = Mosaic.from_domain(self.domain)
+        with self.assertRaises(ValueError):
+            m.composite(self.scenes, ['sst'], ['mode'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -32,6 +32,10 @@ else:
     MATPLOTLIB_IS_INSTALLED = True
 
 from nansat import Nansat, Domain, NSR
+from nansat.aux_cache import AuxCache
+from nansat.vrt import VRT
+from nansat.geolocation import Geolocation
+from nansat.swath_mask import SwathMask
 from nansat.utils import gdal
 import nansat.nansat
 
@@ -294,6 +298,20 @@ class NansatTest(NansatTestBase):
         self.assertEqual(type(n[1]), np.ndarray)
         self.assertTrue(n.has_band('swathmask'))
 
+    def test_reproject_swath_mask(self):
+        n = Nansat.from_domain(Domain(4326, '-te 25 70 35 72 -ts 50 40'),
+                               np.ones((40, 50), np.float32))
+        n.reproject(Domain(4326, '-te 20 70 30 72 -ts 50 40'))
+        swathmask = n['swathmask']
+        with patch.object(SwathMask, 'from_band', wraps=SwathMask.from_band) as mock_from_band:
+            data1 = n[1]
+            data2 = n[1]
+
+        self.assertEqual(mock_from_band.call_count, 1)
+        self.assertIsInstance(n.vrt.swath_mask, SwathMask)
+        self.assertTrue(np.all(np.isnan(data1) == (swathmask == 0)))
+        self.assertTrue(np.all(np.isnan(data2) == np.isnan(data1)))
+
     def test_reproject_domain_if_dst_domain_is_given(self):
         n = Nansat(self.test_file_gcps, log_level=40, mapper=self.default_mapper)
         d = Domain(4326, "-te 27 70 30 72 -ts 500 500")
@@ -496,6 +514,33 @@ class NansatTest(NansatTestBase):
 
         self.assertTrue(os.path.exists(tmpfilename))
 
+    def test_write_tiles(self):
+        n1 = Nansat(self.test_file_stere, log_level=40, mapper=self.default_mapper)
+        tmpdirname = os.path.join(self.tmp_data_path, 'nansat_write_tiles')
+        tiles = n1.write_tiles(tmpdirname, [3, 4], clim='hist', threads=2)
+
+        self.assertTrue(len(tiles) > 0)
+        for zoom, x, y in tiles:
+            tmpfilename = os.path.join(tmpdirname, str(zoom), str(x), '%d.png' % y)
+            self.assertTrue(os.path.exists(tmpfilename))
+        self.assertEqual(n1.shape(), Nansat(self.test_file_stere).shape())
+        self.assertFalse(n1.has_band('swathmask'))
+
+    def test_write_tiles_update(self):
+        n1 = Nansat(self.test_file_stere, log_level=40, mapper=self.default_mapper)
+        tmpdirname = os.path.join(self.tmp_data_path, 'nansat_write_tiles_update')
+        tiles1 = n1.write_tiles(tmpdirname, 3, clim=[0, 100])
+        tiles2 = n1.write_tiles(tmpdirname, 3, clim=[0, 100], update=True)
+
+        self.assertTrue(len(tiles1) > 0)
+        self.assertEqual(tiles2, [])
+
+    def test_get_web_mercator_tiles(self):
+        x_tiles, y_tiles = Nansat._get_web_mercator_tiles([10.75], [59.91], 10)
+
+        self.assertEqual(x_tiles, [542])
+        self.assertEqual(y_tiles, [297])
+
     def test_get_metadata(self):
         n1 = Nansat(self.test_file_stere, log_level=40, mapper=self.default_mapper)
         m = n1.get_metadata()
@@ -720,6 +765,204 @@ class NansatTest(NansatTestBase):
         del os.environ['MOD44WPATH']
         self.assertRaises(IOError, n1.watermask)
 
+    def test_reproject_aux_layer_cached(self):
+        cache_dir = os.path.join(self.tmp_data_path, 'aux_cache_nansat')
+        for filename in os.listdir(cache_dir) if os.path.exists(cache_dir) else []:
+            os.remove(os.path.join(cache_dir, filename))
+        dst_domain = Domain(4326, '-te 28 70.5 29 71 -ts 30 20')
+        n1 = Nansat(self.test_file_gcps, log_level=40, mapper=self.default_mapper)
+        n1 = n1.reproject_aux_layer(dst_domain, 'gcps', cache_dir)
+        n2 = Nansat(self.test_file_gcps, log_level=40, mapper=self.default_mapper)
+        with patch.object(Nansat, 'reproject') as mock_reproject:
+            n2 = n2.reproject_aux_layer(dst_domain, 'gcps', cache_dir)
+
+        self.assertFalse(mock_reproject.called)
+        self.assertEqual(n2.shape(), (20, 30))
+        self.assertTrue(np.allclose(n1[1], n2[1]))
+        self.assertEqual(n1.get_metadata('name', 1), n2.get_metadata('name', 1))
+
+    def test_build_overviews_resize(self):
+        cache_dir = os.path.join(self.tmp_data_path, 'overviews_nansat')
+        for filename in os.listdir(cache_dir) if os.path.exists(cache_dir) else []:
+            os.remove(os.path.join(cache_dir, filename))
+        n1 = Nansat(self.test_file_gcps, log_level=40, mapper=self.default_mapper)
+        n1.build_overviews([2, 4], cache_dir=cache_dir, block_size=30)
+        n2 = Nansat(self.test_file_gcps, log_level=40, mapper=self.default_mapper)
+        n2.resize(0.25, cache_dir=cache_dir)
+        rows, cols = n1.shape()
+        array = n1.vrt.dataset.GetRasterBand(1).ReadAsArray()[:rows // 4 * 4, :cols // 4 * 4]
+        expected = np.floor(array.reshape(rows // 4, 4, cols // 4, 4).mean(axis=(1, 3)) + 0.5)
+
+        self.assertEqual(n2.shape(), (rows // 4, cols // 4))
+        self.assertEqual(n2[1].dtype, n1[1].dtype)
+        self.assertTrue(np.all(n2[1] == expected))
+        self.assertEqual(n2.get_metadata('name', 1), n1.get_metadata('name', 1))
+        self.assertEqual(len(n2.vrt.dataset.GetGCPs()), len(n1.vrt.dataset.GetGCPs()))
+        n2.undo()
+        self.assertEqual(n2.shape(), n1.shape())
+
+    def test_build_overviews_not_used_after_crop(self):
+        cache_dir = os.path.join(self.tmp_data_path, 'overviews_nansat_crop')
+        n1 = Nansat(self.test_file_gcps, log_level=40, mapper=self.default_mapper)
+        n1.build_overviews([2], cache_dir=cache_dir)
+        n1.crop(10, 10, 100, 50)
+        with patch.object(AuxCache, 'get', return_value=None) as mock_get:
+            n1.resize(0.5, cache_dir=cache_dir)
+
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(n1.shape(), (25, 50))
+        self.assertEqual(type(n1[1]), np.ndarray)
+
+    def test_build_overviews_swathmask(self):
+        cache_dir = os.path.join(self.tmp_data_path, 'overviews_nansat_swathmask')
+        dst_domain = Domain(4326, '-te 27 70 30 72 -ts 200 100')
+        n1 = Nansat(self.test_file_gcps, log_level=40, mapper=self.default_mapper)
+        n1.reproject(dst_domain)
+        n1.build_overviews([2], cache_dir=cache_dir)
+        n2 = Nansat(self.test_file_gcps, log_level=40, mapper=self.default_mapper)
+        n2.reproject(dst_domain)
+        n2.resize(0.5, cache_dir=cache_dir)
+        n3 = Nansat(self.test_file_gcps, log_level=40, mapper=self.default_mapper)
+        n3.reproject(dst_domain)
+        n3.resize(0.5, cache_dir=self.tmp_data_path)
+
+        key = n1._get_overview_key(n1._get_overview_cache(cache_dir), 2)
+        band_names = [band['dst']['name'] for band in AuxCache(cache_dir).get(key)]
+        self.assertNotIn('swathmask', band_names)
+        self.assertEqual([band['name'] for band in n2.bands().values()],
+                         [band['name'] for band in n3.bands().values()])
+        self.assertTrue(np.all(n2['swathmask'] == n3['swathmask']))
+
+    def test_build_overviews_no_factors(self):
+        n = Nansat(self.test_file_gcps, log_level=40, mapper=self.default_mapper)
+        with self.assertRaises(ValueError):
+            n.build_overviews([2 ** 20], cache_dir=self.tmp_data_path)
+
+    def test_block_average(self):
+        array = np.array([[1, 2, 3, 3], [2, 2, 3, 9]], np.uint8)
+        array_float = np.array([[1, np.nan, 3, 3], [2, 2, 3, 9]], np.float32)
+
+        average = nansat.nansat._block_average(array, 2, 1, 2)
+        average_nodata = nansat.nansat._block_average(array, 2, 1, 2, nodata=9)
+        average_float = nansat.nansat._block_average(array_float, 2, 1, 2)
+        average_empty = nansat.nansat._block_average(np.full((2, 2), np.nan), 2, 1, 1)
+
+        self.assertEqual(average.dtype, np.uint8)
+        self.assertEqual(average.tolist(), [[2, 5]])
+        self.assertEqual(average_nodata.tolist(), [[2, 3]])
+        self.assertEqual(average_float.dtype, np.float32)
+        self.assertTrue(np.allclose(average_float, [[5 / 3., 4.5]]))
+        self.assertTrue(np.isnan(average_empty[0, 0]))
+
+    def test_build_overviews_wrong_factor(self):
+        n = Nansat(self.test_file_gcps, log_level=40, mapper=self.default_mapper)
+        with self.assertRaises(ValueError):
+            n.build_overviews([3], cache_dir=self.tmp_data_path)
+
+    def test_write_figure_max_size(self):
+        n1 = Nansat(self.test_file_stere, log_level=40, mapper=self.default_mapper)
+        shape = n1.shape()
+        tmpfilename = os.path.join(self.tmp_data_path, 'nansat_write_figure_max_size.png')
+        fig = n1.write_figure(tmpfilename, max_size=50)
+
+        self.assertTrue(os.path.exists(tmpfilename))
+        self.assertLessEqual(max(fig.pilImg.size), 50)
+        self.assertEqual(n1.shape(), shape)
+
+    @unittest.skipUnless(nansat.nansat.DASK_IS_INSTALLED, 'Dask is required')
+    def test_to_dask(self):
+        n = Nansat(self.test_file_gcps, log_level=40, mapper=self.default_mapper)
+        n.reproject(Domain(4326, '-te 28 70.5 29 71 -ts 30 20'))
+        array = n.to_dask(1, chunks=(7, 11))
+
+        self.assertEqual(array.shape, (20, 30))
+        self.assertEqual(array.chunks[0], (7, 7, 6))
+        self.assertTrue(np.allclose(array.compute(), n[1], equal_nan=True))
+
+    @unittest.skipUnless(nansat.nansat.XARRAY_IS_INSTALLED and nansat.nansat.DASK_IS_INSTALLED,
+                         'Xarray and dask are required')
+    def test_to_xarray(self):
+        n = Nansat(self.test_file_gcps, log_level=40, mapper=self.default_mapper)
+        ds = n.to_xarray(chunks=50)
+        lon, lat = n.get_geolocation_grids()
+
+        self.assertEqual(list(ds.data_vars), ['L_645', 'L_555', 'L_469'])
+        self.assertEqual(ds['L_555'].dims, ('y', 'x'))
+        self.assertEqual(ds['L_555'].attrs['name'], 'L_555')
+        self.assertTrue(np.allclose(ds['L_555'].values, n['L_555']))
+        self.assertTrue(np.allclose(ds['longitude'].values, lon))
+        self.assertTrue(np.allclose(ds['latitude'].values, lat))
+
+    def test_getitem_band_reader(self):
+        n = Nansat(self.test_file_gcps, log_level=40, mapper=self.default_mapper)
+        windows = []
+        def band_reader(band, window):
+            windows.append(window)
+            return np.ones((window[3], window[2]), np.float32)
+        n.vrt.band_readers = {'L_555': band_reader}
+
+        self.assertTrue(np.all(n['L_555'] == 1))
+        self.assertEqual(windows, [(0, 0, n.shape()[1], n.shape()[0])])
+        self.assertTrue(np.all(n['L_645'] == n.vrt.dataset.GetRasterBand(1).ReadAsArray()))
+
+    def test_init_header_only(self):
+        n1 = Nansat(self.test_file_gcps, log_level=40, mapper=self.default_mapper)
+        n2 = Nansat(self.test_file_gcps, log_level=40, mapper=self.default_mapper,
+                    header_only=True)
+
+        self.assertEqual(n2.bands(), {})
+        self.assertEqual(n2.vrt.dataset.RasterCount, 0)
+        self.assertEqual(n2.shape(), n1.shape())
+        self.assertEqual(n2.vrt.dataset.GetGCPCount(), n1.vrt.dataset.GetGCPCount())
+        self.assertEqual(n2.get_border_wkt(), n1.get_border_wkt())
+
+    def test_get_mapper_header_only_removes_bands(self):
+        n = Nansat.__new__(Nansat)
+        n._init_empty(self.test_file_gcps, 40)
+        mappers = {'mapper_bands': lambda *args, **kwargs: VRT.from_array(np.zeros((10, 10)))}
+        with patch.object(Nansat, '_get_dataset_metadata') as mock_get_dataset_metadata:
+            mock_get_dataset_metadata.return_value = (None, {})
+            with patch('nansat.nansat.nansatMappers', mappers):
+                vrt = n._get_mapper('bands', header_only=True)
+
+        self.assertEqual(vrt.dataset.RasterCount, 0)
+        self.assertEqual(vrt.band_readers, {})
+
+    def test_get_mapper_header_only_supported(self):
+        n = Nansat.__new__(Nansat)
+        n._init_empty(self.test_file_gcps, 40)
+        mapper_kwargs = {}
+        class HeaderMapper(VRT):
+            SUPPORTS_HEADER_ONLY = True
+            def __init__(self, filename, gdal_dataset, metadata, **kwargs):
+                mapper_kwargs.update(kwargs)
+                super(HeaderMapper, self).__init__(x_size=10, y_size=10)
+        mappers = {'mapper_header': HeaderMapper,
+                   'mapper_bands': Mock(spec=[], return_value=VRT.from_array(np.zeros((10, 10))))}
+        with patch.object(Nansat, '_get_dataset_metadata') as mock_get_dataset_metadata:
+            mock_get_dataset_metadata.return_value = (None, {})
+            with patch('nansat.nansat.nansatMappers', mappers):
+                n._get_mapper('header', header_only=True, quartile=1)
+                n._get_mapper('bands', header_only=True, quartile=1)
+
+        self.assertEqual(mapper_kwargs, {'header_only': True, 'quartile': 1})
+        mappers['mapper_bands'].assert_called_once_with(self.test_file_gcps, None, {}, quartile=1)
+
+    def test_get_mapper_header_only_keeps_geolocation_bands(self):
+        n = Nansat.__new__(Nansat)
+        n._init_empty(self.test_file_gcps, 40)
+        def mapper(*args, **kwargs):
+            vrt = VRT.from_array(np.zeros((10, 10)))
+            vrt.band_vrts = {'lon': VRT.from_array(np.zeros((10, 10)))}
+            vrt._add_geolocation(Geolocation(vrt.band_vrts['lon'], vrt))
+            return vrt
+        with patch.object(Nansat, '_get_dataset_metadata') as mock_get_dataset_metadata:
+            mock_get_dataset_metadata.return_value = (None, {})
+            with patch('nansat.nansat.nansatMappers', {'mapper_geolocation': mapper}):
+                vrt = n._get_mapper('geolocation', header_only=True)
+
+        self.assertEqual(vrt.dataset.RasterCount, 1)
+
     def test_init_no_arguments(self):
         """ No arguments should raise ValueError """
         self.assertRaises(ValueError, Nansat)
@@ -744,6 +987,50 @@ class NansatTest(NansatTestBase):
         self.assertIsInstance(n[1], np.ndarray)
         self.assertTrue(np.isnan(n[1][4]))
 
+    def test_read_band_out(self):
+        """ data should be read into the given array with inf and fill values replaced """
+        self.mock_pti['get_wkv_variable'].return_value=dict(short_name='newband')
+        d = Domain(4326, "-te 25 70 35 72 -ts 500 500")
+        arr = np.ones((500, 500), np.float32)
+        arr[0, :10] = np.inf
+        arr[1, :10] = -1
+        n = Nansat.from_domain(d, arr, {'_FillValue': '-1'})
+        out = np.zeros((500, 500), np.float32)
+
+        data = n.read_band(1, out=out)
+
+        self.assertIs(data, out)
+        self.assertTrue(np.all(np.isnan(out[:2, :10])))
+        self.assertEqual(np.isnan(out).sum(), 20)
+        self.assertTrue(np.all(out[2:] == 1))
+
+    def test_read_band_out_expression(self):
+        """ result of expression should be copied into the given array """
+        self.mock_pti['get_wkv_variable'].return_value=dict(short_name='newband')
+        d = Domain(4326, "-te 25 70 35 72 -ts 500 500")
+        n = Nansat.from_domain(d, np.zeros((500, 500)), {'expression': 'band_data + 2'})
+        out = np.zeros((500, 500))
+
+        with patch('nansat.nansat.compile', create=True, side_effect=compile) as mock_compile:
+            n.read_band(1, out=out)
+            data = n[1]
+
+        self.assertTrue(np.all(out == 2))
+        self.assertTrue(np.all(data == 2))
+        mock_compile.assert_called_once_with('band_data + 2', '<expression>', 'eval')
+
+    def test_set_invalid_to_nan(self):
+        data = np.array([[1, np.inf, 3, 4], [-np.inf, 5, 6, 7], [8, 9, 3, 1]])
+        swathmask = Mock()
+        swathmask.ReadAsArray.return_value = np.array([[1, 1, 1, 0], [1, 1, 1, 0], [1, 1, 1, 1]])
+
+        Nansat._set_invalid_to_nan(data, [3.], swathmask, (2, 5, 4, 3), block_size=2)
+
+        swathmask.ReadAsArray.assert_called_once_with(2, 5, 4, 3)
+        self.assertTrue(np.all(np.isnan(data) == np.array([[0, 1, 1, 1],
+                                                           [1, 0, 0, 1],
+                                                           [0, 0, 1, 0]], bool)))
+
     def test_repr_basic(self):
         """ repr should include some basic elements """
         d = Domain(4326, "-te 25 70 35 72 -ts 500 500")
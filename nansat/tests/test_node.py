@@ -14,6 +14,8 @@
 from __future__ import absolute_import
 import unittest
 import os
+import re
+import xml.dom.minidom as xdm
 from . import nansat_test_data as ntd
 from nansat.node import Node
 
@@ -70,6 +72,48 @@ class NodeTest(unittest.TestCase):
         rawElement = root.children[0]
         self.assertEqual(fileElement.xml(), rawElement.xml())
 
+    def test_create_string_whitespace(self):
+        contents = ('<?xml version="1.0" encoding="UTF-8"?>\n<Element attr="a  b">\n'
+                    '  <Subnode>  1 2\n   3  </Subnode>\n  <Empty>  </Empty>\n</Element>')
+        element = Node.create(contents)
+
+        self.assertEqual(element.tag, 'Element')
+        self.assertEqual(element.getAttribute('attr'), 'a b')
+        self.assertEqual(element['Subnode'], '1 2 3')
+        self.assertIsNone(element['Empty'])
+        self.assertIsNone(element.value)
+
+    def test_create_namespaces(self):
+        contents = ('<xfdu:XFDU xmlns:xfdu="urn:xfdu" xmlns:safe="urn:safe">'
+                    '<safe:platform safe:id="S1"><safe:number>A</safe:number></safe:platform>'
+                    '</xfdu:XFDU>')
+        element = Node.create(contents)
+
+        self.assertEqual(element.tag, 'xfdu:XFDU')
+        self.assertEqual(element.getAttribute('xmlns:safe'), 'urn:safe')
+        self.assertEqual(element.node('safe:platform').getAttribute('safe:id'), 'S1')
+        self.assertEqual(element.node('safe:platform')['safe:number'], 'A')
+
+    def test_create_tags(self):
+        test_file_element = os.path.join(ntd.test_data_path,
+                                         'some_xml_file.xml')
+        element = Node.create(test_file_element, tags=['FinalLayer'])
+
+        self.assertEqual(element.tagList(), ['Subnode2'])
+        self.assertEqual(element['FinalLayer'], 'Deep Value')
+        self.assertFalse(element.node('Subnode'))
+        self.assertEqual(element.getAttribute('attr'), 'attrValue')
+
+    def test_create_same_as_minidom(self):
+        test_file_element = os.path.join(ntd.test_data_path,
+                                         'some_xml_file.xml')
+        with open(test_file_element, 'r') as myfile:
+            contents = myfile.read()
+        element = Node.create(contents)
+        dom_element = Node.create(xdm.parseString(re.sub(r'>\s+<', '><', contents)))
+
+        self.assertEqual(element.rawxml(), dom_element.rawxml())
+
     def test_delete_attribute(self):
         tag = 'Root'
         value = '   Value   '
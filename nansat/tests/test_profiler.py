@@ -0,0 +1,96 @@
+#------------------------------------------------------------------------------
+# Name:         test_profiler.py
+# Purpose:      Test the Profiler class and instrumentation of Nansat
+# Licence:      This file is part of NANSAT. You can redistribute it or modify
+#               under the terms of GNU General Public License, v.3
+#               http://www.gnu.org/licenses/gpl-3.0.html
+#------------------------------------------------------------------------------
+import os
+import json
+import unittest
+
+from nansat import Nansat
+from nansat.profiler import Profiler, span, profiled, count
+from nansat.tests.nansat_test_base import NansatTestBase
+
+
+@profiled('test.function')
+def _function(value):
+    return value * 2
+
+
+class ProfilerTest(NansatTestBase):
+
+    def test_span_and_count(self):
+        with Profiler() as profiler:
+            with span('test.span', key='value'):
+                _function(1)
+            count('test.counter', 3)
+            count('test.counter')
+
+        self.assertEqual([s['name'] for s in profiler.spans], ['test.function', 'test.span'])
+        self.assertEqual(profiler.spans[1]['args'], {'key': 'value'})
+        self.assertEqual(profiler.counters, {'test.counter': 4})
+        summary = profiler.summary()
+        self.assertEqual(summary['test.span']['count'], 1)
+        self.assertGreaterEqual(summary['test.span']['total'],
+                                summary['test.function']['total'])
+
+    def test_disabled(self):
+        profiler = Profiler()
+        with span('test.span'):
+            self.assertEqual(_function(2), 4)
+        count('test.counter')
+
+        self.assertEqual(profiler.spans, [])
+        self.assertEqual(profiler.counters, {})
+
+    def test_callback(self):
+        names = []
+        with Profiler(callback=lambda s: names.append(s['name'])):
+            _function(1)
+
+        self.assertEqual(names, ['test.function'])
+
+    def test_span_exception(self):
+        with Profiler() as profiler:
+            with self.assertRaises(ValueError):
+                with span('test.span'):
+                    raise ValueError
+
+        self.assertEqual(len(profiler.spans), 1)
+
+    def test_to_json_and_chrome_trace(self):
+        filename = os.path.join(self.tmp_data_path, 'test_to_chrome_trace.json')
+        with Profiler() as profiler:
+            _function(1)
+            count('test.counter')
+        profiler.to_chrome_trace(filename)
+        with open(filename) as f:
+            trace = json.load(f)
+        data = json.loads(profiler.to_json())
+
+        self.assertEqual([e['ph'] for e in trace['traceEvents']], ['X', 'C'])
+        self.assertEqual(trace['traceEvents'][0]['name'], 'test.function')
+        self.assertEqual(data['counters'], {'test.counter': 1})
+        self.assertIn('test.function', data['summary'])
+
+    def test_nansat(self):
+        with Profiler() as profiler:
+            n = Nansat(self.test_file_gcps, log_level=40)
+            n[1]
+            n.export(os.path.join(self.tmp_data_path, 'test_profiler.nc'))
+        summary = profiler.summary()
+        mappers = [s['args']['mapper'] for s in profiler.spans
+                   if s['name'] == 'Nansat._get_mapper']
+
+        self.assertEqual(mappers[-1], 'mapper_' + n.mapper)
+        self.assertEqual(profiler.counters['mappers_tried'], len(mappers))
+        self.assertEqual(profiler.counters['pixels_read'], n.shape()[0] * n.shape()[1])
+        for name in ['Nansat.__getitem__', 'GDAL.ReadAsArray', 'VRT.copy',
+                     'Exporter.export', 'Exporter.CreateCopy']:
+            self.assertIn(name, summary)
+
+
+if __name__ == "__main__":
+    unittest.main()
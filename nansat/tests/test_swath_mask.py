@@ -0,0 +1,53 @@
+#------------------------------------------------------------------------------
+# Name:         test_swath_mask.py
+# Purpose:      Test the SwathMask class
+# Licence:      This file is part of NANSAT. You can redistribute it or modify
+#               under the terms of GNU General Public License, v.3
+#               http://www.gnu.org/licenses/gpl-3.0.html
+#------------------------------------------------------------------------------
+import unittest
+
+import numpy as np
+from mock import Mock
+
+from nansat.swath_mask import SwathMask
+
+
+class SwathMaskTest(unittest.TestCase):
+
+    def setUp(self):
+        rows, cols = np.mgrid[0:40, 0:50]
+        # slanted swath with a gap in one row and an empty row
+        self.mask = (cols >= rows // 2) & (cols < 30 + rows // 4)
+        self.mask[5, 10:12] = False
+        self.mask[7] = False
+
+    def test_from_array(self):
+        swath_mask = SwathMask.from_array(self.mask)
+
+        self.assertEqual(swath_mask.shape, (40, 50))
+        self.assertEqual(len(swath_mask), 40)
+        self.assertEqual(list(swath_mask.rows[:7]), [0, 1, 2, 3, 4, 5, 5])
+        self.assertTrue(np.all(swath_mask.get_window() == self.mask))
+
+    def test_get_window(self):
+        swath_mask = SwathMask.from_array(self.mask)
+
+        for window in [(0, 0, 50, 40), (5, 3, 10, 20), (40, 30, 10, 10), (0, 7, 50, 1)]:
+            x_offset, y_offset, x_size, y_size = window
+            self.assertTrue(np.all(swath_mask.get_window(window) ==
+                                   self.mask[y_offset:y_offset + y_size,
+                                             x_offset:x_offset + x_size]))
+
+    def test_from_band(self):
+        band = Mock(XSize=50, YSize=40)
+        band.ReadAsArray.side_effect = lambda x_off, y_off, x_size, y_size: (
+            self.mask[y_off:y_off + y_size, x_off:x_off + x_size].astype(np.uint8))
+        swath_mask = SwathMask.from_band(band, block_size=16)
+
+        self.assertEqual(band.ReadAsArray.call_count, 3)
+        self.assertTrue(np.all(swath_mask.get_window() == self.mask))
+
+
+if __name__ == "__main__":
+    unittest.main()
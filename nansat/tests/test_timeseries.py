@@ -0,0 +1,114 @@
+#------------------------------------------------------------------------------
+# Name:         test_timeseries.py
+# Purpose:      Test the TimeSeries class
+# Licence:      This file is part of NANSAT. You can redistribute it or modify
+#               under the terms of GNU General Public License, v.3
+#               http://www.gnu.org/licenses/gpl-3.0.html
+#------------------------------------------------------------------------------
+import os
+import datetime
+import unittest
+
+import numpy as np
+from netCDF4 import Dataset
+from mock import patch
+
+from nansat import Domain, Nansat
+from nansat.timeseries import TimeSeries
+from nansat.tests.nansat_test_base import NansatTestBase
+
+
+class TimeSeriesTest(NansatTestBase):
+
+    def setUp(self):
+        super(TimeSeriesTest, self).setUp()
+        self.domain = Domain(4326, '-te 25 70 35 72 -ts 53 37')
+        self.arrays = [np.random.randn(37, 53).astype(np.float32) for i in range(4)]
+        # layers are given in reversed time order
+        self.layers = [(datetime.datetime(2020, 1, 4 - i),
+                        Nansat.from_domain(self.domain, array, {'name': 'sst'}), {})
+                       for i, array in enumerate(self.arrays)]
+        self.stack = np.array(self.arrays[::-1])
+
+    def test_init(self):
+        ts = TimeSeries(self.layers)
+
+        self.assertEqual(len(ts), 4)
+        self.assertEqual(ts.shape(), (4, 37, 53))
+        self.assertEqual(ts.times[0], datetime.datetime(2020, 1, 1))
+        with self.assertRaises(ValueError):
+            TimeSeries([])
+
+    def test_getitem(self):
+        ts = TimeSeries(self.layers)
+        ts.TILE_SIZE = 16
+
+        self.assertTrue(np.allclose(ts['sst'], self.stack))
+        self.assertTrue(np.allclose(ts['sst', 1:3, 5:30, 10:50], self.stack[1:3, 5:30, 10:50]))
+        self.assertTrue(np.allclose(ts['sst', 2], self.stack[2]))
+        self.assertTrue(np.allclose(ts['sst', -1, 20, 7:9], self.stack[-1, 20, 7:9]))
+        with self.assertRaises(IndexError):
+            ts['sst', :, ::2]
+
+    def test_tiles_cache(self):
+        ts = TimeSeries(self.layers, cache_size=3)
+        ts.TILE_SIZE = 16
+        ts['sst', 0]
+        self.assertEqual(len(ts._tiles), 3)
+        with patch.object(Nansat, '_read_band') as mock_read_band:
+            ts['sst', 0, 32:, 32:]
+        self.assertFalse(mock_read_band.called)
+
+    def test_get_pixel_series(self):
+        ts = TimeSeries(self.layers)
+        times, values = ts.get_pixel_series('sst', 20, 40, '2020-01-02', '2020-01-03')
+
+        self.assertEqual(list(times), [datetime.datetime(2020, 1, 2),
+                                       datetime.datetime(2020, 1, 3)])
+        self.assertTrue(np.allclose(values, self.stack[1:3, 20, 40]))
+
+    def test_reduce(self):
+        ts = TimeSeries(self.layers)
+        ts.TILE_SIZE = 16
+
+        self.assertTrue(np.allclose(ts.reduce('sst'), self.stack.mean(axis=0)))
+        self.assertTrue(np.allclose(ts.reduce('sst', np.max, start_time='2020-01-03'),
+                                    self.stack[2:].max(axis=0)))
+        with self.assertRaises(ValueError):
+            ts.reduce('sst', start_time='2021-01-01')
+
+    def test_get_index(self):
+        ts = TimeSeries(self.layers)
+        self.assertEqual(ts.get_index('2020-01-02T20:00:00'), 2)
+
+    def test_from_files_netcdf_times(self):
+        filename = os.path.join(self.tmp_data_path, 'timeseries_times.nc')
+        with Dataset(filename, 'w') as ds:
+            ds.createDimension('time', 3)
+            time = ds.createVariable('time', 'f8', ('time',))
+            time.units = 'days since 2020-01-01 00:00:00'
+            time[:] = [2, 0, 1]
+        with patch('nansat.timeseries.Nansat') as mock_nansat:
+            ts = TimeSeries.from_files([filename], mapper='netcdf_cf')
+
+        self.assertFalse(mock_nansat.called)
+        self.assertEqual(len(ts), 3)
+        self.assertEqual(ts.times[0], datetime.datetime(2020, 1, 1))
+        self.assertEqual(ts.layers[0][2]['netcdf_dim']['time'],
+                         np.datetime64('2020-01-01T00:00:00'))
+        self.assertEqual(ts.layers[0][2]['mapper'], 'netcdf_cf')
+
+    def test_from_files_given_times(self):
+        filenames = []
+        for i, (time_value, n, kwargs) in enumerate(self.layers):
+            filenames.append(os.path.join(self.tmp_data_path, 'timeseries_%d.tif' % i))
+            n.export(filenames[-1], driver='GTiff')
+        ts = TimeSeries.from_files(filenames, times=[layer[0] for layer in self.layers],
+                                   max_open=2)
+
+        self.assertTrue(np.allclose(ts[1], self.stack))
+        self.assertEqual(len(ts._opened), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
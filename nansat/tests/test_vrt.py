@@ -26,6 +26,7 @@ import pythesint as pti
 from nansat.node import Node
 from nansat.nsr import NSR
 from nansat.vrt import VRT
+from nansat.lut import LUT
 from nansat.tests.nansat_test_base import NansatTestBase
 
 from nansat.exceptions import NansatProjectionError
@@ -126,6 +127,36 @@ class VRTTest(NansatTestBase):
         self.assertEqual(vrt.geolocation.y_vrt.filename, geo_metadata['Y_DATASET'])
         self.assertEqual(len(vrt.dataset.GetGCPs()), 25)
 
+    def test_lonlat2gcps(self):
+        lon, lat = np.meshgrid(np.linspace(0, 5, 10), np.linspace(10, 20, 30))
+        gcps = VRT._lonlat2gcps(lon, lat, n_gcps=25, pixel_step=2, line_offset=0.5)
+        self.assertEqual(len(gcps), 25)
+        self.assertEqual(gcps[-1].GCPPixel, 16)
+        self.assertEqual(gcps[-1].GCPLine, 24.5)
+        self.assertAlmostEqual(gcps[-1].GCPX, lon[24, 8])
+        self.assertAlmostEqual(gcps[-1].GCPY, lat[24, 8])
+
+    def test_lonlat2gcps_skip_invalid(self):
+        lon, lat = np.meshgrid(np.linspace(0, 5, 10), np.linspace(10, 20, 30))
+        lon[0, 0] = np.nan
+        lat[3, 0] = -999
+        gcps = VRT._lonlat2gcps(lon, lat)
+        self.assertEqual(len(gcps), 98)
+
+    def test_lonlat2gcps_max_error(self):
+        rows, cols = np.mgrid[0:200:, 0:100]
+        lat = 60 + rows / 200. * 25
+        lon = (cols - 50) / 100. * 30 / np.cos(np.radians(lat))
+        gcps0 = VRT._lonlat2gcps(lon, lat, n_gcps=25)
+        gcps1 = VRT._lonlat2gcps(lon, lat, n_gcps=25, max_error=10000)
+        gcps2 = VRT._lonlat2gcps(lon, lat, n_gcps=25, max_error=1000)
+        self.assertEqual(len(gcps0), 25)
+        self.assertGreater(len(gcps1), len(gcps0))
+        self.assertGreater(len(gcps2), len(gcps1))
+        # last row and column are always included
+        self.assertEqual(max(gcp.GCPLine for gcp in gcps1), 199)
+        self.assertEqual(max(gcp.GCPPixel for gcp in gcps1), 99)
+
     def test_from_lonlat_no_gcps(self):
         lon, lat = np.meshgrid(np.linspace(0, 5, 10), np.linspace(10, 20, 30))
         vrt = VRT.from_lonlat(lon, lat, add_gcps=False)
@@ -639,5 +670,32 @@ class VRTTest(NansatTestBase):
         self.assertEqual(round(vrt1.dataset.GetGCPs()[-1].GCPX), 556597)
         self.assertEqual(round(vrt1.dataset.GetGCPs()[-1].GCPY), 2096057)
 
+    def test_get_resize_coordinates(self):
+        coords = VRT.get_resize_coordinates(4, 1000)
+        coords_small = VRT.get_resize_coordinates(4, 10)
+
+        self.assertEqual(coords.size, VRT.LUT_SAMPLES * 3 + 1)
+        self.assertEqual(coords[0], -0.5)
+        self.assertEqual(coords[-1], 999.5)
+        self.assertEqual(coords_small.size, 10)
+
+    def test_vrts_from_luts_match_band_readers(self):
+        vrt = VRT(x_size=1000, y_size=800)
+        rows = np.array([-5., 150, 420, 799])
+        cols = np.r_[np.arange(0, 1000, 40), 999.]
+        luts = {
+            'sigmaNought_HH': LUT(rows, cols, 500 + np.add.outer(rows * 0.01, cols ** 2 * 1e-4)),
+            'incidenceAngle': LUT(rows, cols, 20 + np.add.outer(rows * 0, cols * 0.015), order=3),
+        }
+
+        vrts = vrt.vrts_from_luts(luts)
+
+        for name, lut in luts.items():
+            band = vrts[name].dataset.GetRasterBand(1)
+            reader_data = VRT.read_lut_band(band, (0, 0, 1000, 800), lut)
+            self.assertEqual(band.XSize, 1000)
+            self.assertEqual(band.YSize, 800)
+            self.assertTrue(np.allclose(band.ReadAsArray(), reader_data, rtol=1e-3))
+
 if __name__ == "__main__":
     unittest.main()
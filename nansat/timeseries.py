@@ -0,0 +1,356 @@
+# Name:    timeseries.py
+# Purpose: Container of TimeSeries class
+# Licence:
+# This file is part of NANSAT.
+# NANSAT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+# http://www.gnu.org/licenses/gpl-3.0.html
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+from __future__ import absolute_import, division
+
+import datetime
+from collections import OrderedDict
+
+import numpy as np
+from netCDF4 import Dataset, num2date
+
+from nansat.nansat import Nansat
+from nansat.utils import add_logger, parse_time
+
+
+def _to_datetime(time_value):
+    """Convert datetime-like object (or string) into naive datetime in UTC"""
+    if isinstance(time_value, np.datetime64):
+        time_value = time_value.astype('M8[us]').astype(datetime.datetime)
+    elif not hasattr(time_value, 'year'):
+        time_value = parse_time(time_value)
+    if getattr(time_value, 'tzinfo', None) is not None:
+        time_value = time_value.replace(tzinfo=None) - time_value.utcoffset()
+    return datetime.datetime(time_value.year, time_value.month, time_value.day,
+                             time_value.hour, time_value.minute, time_value.second,
+                             getattr(time_value, 'microsecond', 0))
+
+
+def _get_netcdf_times(filename):
+    """Get times from the time variable of a netCDF file (or None)"""
+    try:
+        ds = Dataset(filename)
+    except (IOError, OSError, RuntimeError):
+        return None
+    try:
+        for name, variable in ds.variables.items():
+            if name == 'time' or getattr(variable, 'standard_name', '') == 'time':
+                times = num2date(variable[:], variable.units,
+                                 getattr(variable, 'calendar', 'standard'))
+                return [_to_datetime(time_value) for time_value in np.atleast_1d(times)]
+    except (AttributeError, ValueError):
+        return None
+    finally:
+        ds.close()
+    return None
+
+
+class TimeSeries(object):
+    """Lazy stack of 2D layers from many files (or time slices) ordered by time
+
+    Layers are opened with Nansat only when data is requested. Data is read by
+    tiles of TILE_SIZE x TILE_SIZE pixels, and the decoded tiles are kept in an
+    LRU cache. Reads of (time, y, x) blocks, pixel time series and temporal
+    statistics therefore load only the needed parts of the needed files.
+    All layers must have the same raster size.
+
+    Parameters
+    -----------
+    layers : list of tuples
+        (time, source, kwargs) for each layer, where source is a filename or
+        a Nansat object and kwargs are arguments for opening of the file with
+        Nansat (e.g. netcdf_dim={'time': np.datetime64(...)})
+    cache_size : int
+        maximum number of decoded tiles kept in memory
+    max_open : int
+        maximum number of simultaneously opened files
+    log_level : int
+        level of logging
+
+    Examples
+    --------
+        >>> ts = TimeSeries.from_files(glob.glob('/data/sst_*.nc'), mapper='netcdf_cf')
+        >>> sst = ts['sst', :, 100:200, 300:400]  # (time, y, x) array
+        >>> pixel_sst = ts.get_pixel_series('sst', 150, 350)
+        >>> mean_sst = ts.reduce('sst', np.nanmean, start_time='2020-01-01', end_time='2020-02-01')
+
+    """
+    TILE_SIZE = 256
+
+    def __init__(self, layers, cache_size=256, max_open=16, log_level=30):
+        if len(layers) == 0:
+            raise ValueError('TimeSeries needs at least one layer')
+        self.layers = sorted([(_to_datetime(time_value), source, kwargs)
+                              for time_value, source, kwargs in layers],
+                             key=lambda layer: layer[0])
+        self.times = np.array([layer[0] for layer in self.layers])
+        self.cache_size = cache_size
+        self.max_open = max_open
+        self.log_level = log_level
+        self.logger = add_logger('Nansat', log_level)
+        self._tiles = OrderedDict()
+        self._opened = OrderedDict()
+        self._shape = None
+
+    @classmethod
+    def from_files(cls, filenames, times=None, cache_size=256, max_open=16, log_level=30,
+                   **kwargs):
+        """Create TimeSeries from files
+
+        If times are not given, they are read from the time variable of netCDF
+        files (without opening of the file with GDAL). Files with several times
+        give one layer per time (opened with netcdf_dim={'time': time}). Other
+        files are opened with Nansat to get time_coverage_start.
+
+        Parameters
+        -----------
+        filenames : list of str
+            names of the input files
+        times : list of datetime or None
+            time of each file
+        cache_size, max_open, log_level : see TimeSeries
+        **kwargs : dict
+            arguments for opening of files with Nansat (e.g. mapper)
+
+        Returns
+        --------
+        ts : TimeSeries
+
+        """
+        layers = []
+        for i, filename in enumerate(filenames):
+            if times is not None:
+                layers.append((times[i], filename, kwargs))
+                continue
+            file_times = _get_netcdf_times(filename)
+            if file_times is not None and len(file_times) > 1:
+                for time_value in file_times:
+                    layer_kwargs = dict(kwargs, netcdf_dim={'time': np.datetime64(time_value)})
+                    layers.append((time_value, filename, layer_kwargs))
+            elif file_times is not None:
+                layers.append((file_times[0], filename, kwargs))
+            else:
+                n = Nansat(filename, log_level=log_level, **kwargs)
+                layers.append((n.time_coverage_start, filename, kwargs))
+        return cls(layers, cache_size, max_open, log_level)
+
+    def __len__(self):
+        return len(self.layers)
+
+    def __repr__(self):
+        return 'TimeSeries: %d layers from %s to %s, shape %s' % (
+            len(self), self.times[0], self.times[-1], self.shape())
+
+    def shape(self):
+        """Get shape of the stack (time, rows, columns)"""
+        if self._shape is None:
+            self._shape = self.get_layer(0).shape()
+        return (len(self),) + tuple(self._shape)
+
+    def get_layer(self, index):
+        """Get Nansat object of a layer (opened files are kept in LRU cache)
+
+        Parameters
+        -----------
+        index : int
+            index of the layer
+
+        Returns
+        --------
+        n : Nansat
+
+        """
+        time_value, source, kwargs = self.layers[index]
+        if isinstance(source, Nansat):
+            return source
+        if index in self._opened:
+            n = self._opened.pop(index)
+        else:
+            n = Nansat(source, log_level=self.log_level, **kwargs)
+            if self._shape is not None and n.shape() != self._shape:
+                raise ValueError('Shape of %s %s differs from shape of the time series %s'
+                                 % (source, n.shape(), self._shape))
+        self._opened[index] = n
+        while len(self._opened) > self.max_open:
+            self._opened.popitem(last=False)
+        return n
+
+    def get_index(self, time_value):
+        """Get index of the layer with the closest time"""
+        time_value = _to_datetime(time_value)
+        return int(np.argmin([abs((t - time_value).total_seconds()) for t in self.times]))
+
+    def select(self, start_time=None, end_time=None):
+        """Get indices of layers within time window (inclusive)
+
+        Parameters
+        -----------
+        start_time, end_time : datetime or str or None
+            time window
+
+        Returns
+        --------
+        indices : numpy.ndarray
+
+        """
+        selected = np.ones(len(self), bool)
+        if start_time is not None:
+            selected *= self.times >= _to_datetime(start_time)
+        if end_time is not None:
+            selected *= self.times <= _to_datetime(end_time)
+        return np.nonzero(selected)[0]
+
+    def _get_tile(self, index, band, tile_row, tile_col):
+        """Get decoded tile of a layer (from cache or from file)"""
+        key = (index, band, tile_row, tile_col)
+        if key in self._tiles:
+            tile = self._tiles.pop(key)
+        else:
+            n = self.get_layer(index)
+            height, width = self.shape()[1:]
+            y_offset, x_offset = tile_row * self.TILE_SIZE, tile_col * self.TILE_SIZE
+            window = (x_offset, y_offset,
+                      min(self.TILE_SIZE, width - x_offset), min(self.TILE_SIZE, height - y_offset))
+            swathmask = None
+            if n.has_band('swathmask'):
+                swathmask = n.get_GDALRasterBand('swathmask')
+            tile = n._read_band(n.get_GDALRasterBand(band), swathmask, window)
+        self._tiles[key] = tile
+        while len(self._tiles) > self.cache_size:
+            self._tiles.popitem(last=False)
+        return tile
+
+    @staticmethod
+    def _get_range(index, size):
+        """Convert int or slice with step 1 into (start, stop)"""
+        if isinstance(index, slice):
+            start, stop, step = index.indices(size)
+            if step != 1:
+                raise IndexError('Only slices with step 1 are supported for rows and columns')
+            return start, max(start, stop)
+        index = int(index)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError('Index %d is out of range' % index)
+        return index, index + 1
+
+    def __getitem__(self, key):
+        """Read (time, y, x) array of a band
+
+        Parameters
+        -----------
+        key : str or int or tuple
+            band or (band, time, rows, columns). Time can be int, slice or list
+            of indices; rows and columns can be int or slice with step 1.
+
+        Returns
+        --------
+        a : numpy.ndarray
+            array with data (dimensions given by int are removed)
+
+        Examples
+        --------
+            >>> ts['sst', 0]  # first layer
+            >>> ts['sst', -5:, 100:200, 300:400]  # last five layers of a subset
+
+        """
+        if not isinstance(key, tuple):
+            key = (key,)
+        band, time_index, rows, cols = (key + (slice(None),) * 3)[:4]
+        n_times, height, width = self.shape()
+        indices = np.arange(n_times)[time_index]
+        row_start, row_stop = self._get_range(rows, height)
+        col_start, col_stop = self._get_range(cols, width)
+
+        data = None
+        for i, index in enumerate(np.atleast_1d(indices)):
+            for tile_row in range(row_start // self.TILE_SIZE,
+                                  (row_stop - 1) // self.TILE_SIZE + 1):
+                for tile_col in range(col_start // self.TILE_SIZE,
+                                      (col_stop - 1) // self.TILE_SIZE + 1):
+                    tile = self._get_tile(index, band, tile_row, tile_col)
+                    if data is None:
+                        data = np.empty((np.size(indices), row_stop - row_start,
+                                         col_stop - col_start), tile.dtype)
+                    y0, x0 = tile_row * self.TILE_SIZE, tile_col * self.TILE_SIZE
+                    tile_rows = slice(max(row_start, y0), min(row_stop, y0 + tile.shape[0]))
+                    tile_cols = slice(max(col_start, x0), min(col_stop, x0 + tile.shape[1]))
+                    data[i,
+                         tile_rows.start - row_start:tile_rows.stop - row_start,
+                         tile_cols.start - col_start:tile_cols.stop - col_start] = tile[
+                             tile_rows.start - y0:tile_rows.stop - y0,
+                             tile_cols.start - x0:tile_cols.stop - x0]
+
+        if data is None:
+            return np.empty((np.size(indices), row_stop - row_start, col_stop - col_start))
+        if np.ndim(indices) == 0:
+            data = data[0]
+        squeeze = tuple(axis for axis, index in zip([-2, -1], [rows, cols])
+                        if not isinstance(index, slice))
+        if squeeze:
+            data = np.squeeze(data, axis=squeeze)
+        return data
+
+    def get_pixel_series(self, band, row, col, start_time=None, end_time=None):
+        """Get time series of band values in one pixel
+
+        Parameters
+        -----------
+        band : str or int
+            name or number of band
+        row, col : int
+            pixel coordinates
+        start_time, end_time : datetime or str or None
+            time window
+
+        Returns
+        --------
+        times : numpy.ndarray
+            datetimes of the layers
+        values : numpy.ndarray
+            values of the band
+
+        """
+        indices = self.select(start_time, end_time)
+        return self.times[indices], self[band, list(indices), row, col]
+
+    def reduce(self, band, function=np.nanmean, start_time=None, end_time=None):
+        """Compute temporal statistics of a band block by block
+
+        Only one row of tiles from all selected layers is in memory at a time.
+
+        Parameters
+        -----------
+        band : str or int
+            name or number of band
+        function : callable
+            reducing function which accepts 3D array and axis=0 (e.g. np.nanmedian)
+        start_time, end_time : datetime or str or None
+            time window
+
+        Returns
+        --------
+        result : numpy.ndarray
+            2D array with result of the function
+
+        """
+        indices = list(self.select(start_time, end_time))
+        if len(indices) == 0:
+            raise ValueError('No layers between %s and %s' % (start_time, end_time))
+        height = self.shape()[1]
+        result = None
+        for row in range(0, height, self.TILE_SIZE):
+            block = function(self[band, indices, row:row + self.TILE_SIZE, :], axis=0)
+            if result is None:
+                result = np.empty((height,) + block.shape[1:], block.dtype)
+            result[row:row + block.shape[0]] = block
+        return result
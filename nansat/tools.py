@@ -35,7 +35,7 @@ else:
 from nansat.nansat import Nansat
 from nansat import utils
 
-def distance2coast(dst_domain, distance_src=None):
+def distance2coast(dst_domain, distance_src=None, cache_dir=None):
     """ Estimate distance to the nearest coast (in km) for each pixcel in the
     domain of interest. The method utilizes NASA's OBPG group Distance to the Nearest Coast
     product: https://oceancolor.gsfc.nasa.gov/docs/distfromcoast/. The product is stored in GeoTiff
@@ -47,6 +47,8 @@ def distance2coast(dst_domain, distance_src=None):
         destination domain
     distance_src : str
         path to the NASA Distance to the Nearest coast GeoTIFF product
+    cache_dir : str
+        directory for caching of reprojected distance (see Nansat.reproject_aux_layer)
 
     Returns
     --------
@@ -66,9 +68,8 @@ def distance2coast(dst_domain, distance_src=None):
         raise IOError('Distance to the nearest coast product does not exist - see Nansat '
                       'documentation to get it (the path is % s)' % distance_src)
     distance = Nansat(distance_src)
-    # Reproject the source file on the domain of interest
-    distance.reproject(dst_domain, addmask=False)
-    return distance
+    # Crop and reproject the source file on the domain of interest (or read from cache)
+    return distance.reproject_aux_layer(dst_domain, 'distance2coast', cache_dir)
 
 def get_domain_map(domain,
                    crs=None,
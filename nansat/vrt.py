@@ -30,6 +30,7 @@ from nansat.geolocation import Geolocation
 from nansat.utils import add_logger, numpy_to_gdal_type, gdal_type_to_offset, remove_keys, osr, gdal
 
 from nansat.exceptions import NansatProjectionError
+from nansat.profiler import profiled
 
 class VRT(object):
     """Wrapper around GDAL VRT-file
@@ -115,6 +116,12 @@ class VRT(object):
           </ReprojectionTransformer>
         </ReprojectTransformer> ''')
 
+    # mappers which skip creation of bands if header_only=True is given set it to True
+    SUPPORTS_HEADER_ONLY = False
+
+    # number of samples per interval between tie points in full size VRTs made from LUTs
+    LUT_SAMPLES = 8
+
     # instance attributes
     filename = ''
     vrt = None
@@ -852,6 +859,7 @@ class VRT(object):
             add_gcps = False
         return add_gcps
 
+    @profiled('VRT.copy')
     def copy(self):
         """Create and return a full copy of a VRT instance with new filenames
 
@@ -1032,6 +1040,7 @@ class VRT(object):
         # return name of the created band
         return dst['name']
 
+    @profiled('VRT.write_xml')
     def write_xml(self, vsi_file_content=None):
         """Write XML content into a VRT dataset
 
@@ -1072,6 +1081,7 @@ class VRT(object):
         """
         return [f[0] for f in gdal_dataset.GetSubDatasets()]
 
+    @profiled('VRT.get_warped_vrt')
     def get_warped_vrt(self, dst_srs, x_size, y_size, geo_transform,
                        resample_alg=0,
                        dst_gcps=[],
@@ -1204,10 +1214,7 @@ class VRT(object):
             band number
 
         """
-        node0 = Node.create(self.xml)
-        node0.delNode('VRTRasterBand', options={'band': band_num})
-        node0.delNode('BandMapping', options={'src': band_num})
-        self.write_xml(node0.rawxml())
+        self.delete_bands([band_num])
 
     def delete_bands(self, band_nums):
         """ Delete bands
@@ -1217,10 +1224,16 @@ class VRT(object):
         bandNums : list
             elements are int
 
+        Note
+        -----
+        XML of the VRT is parsed and written only once for all bands
+
         """
-        band_nums.sort(reverse=True)
-        for i in band_nums:
-            self.delete_band(i)
+        node0 = Node.create(self.xml)
+        for band_num in sorted(band_nums, reverse=True):
+            node0.delNode('VRTRasterBand', options={'band': band_num})
+            node0.delNode('BandMapping', options={'src': band_num})
+        self.write_xml(node0.rawxml())
 
     def get_shifted_vrt(self, shift_degree):
         """ Roll data in bands westwards or eastwards
@@ -1396,6 +1409,7 @@ class VRT(object):
 
         return subsamp_vrt
 
+    @profiled('VRT.transform_points')
     def transform_points(self, col_vector, row_vector, dst2src=0,
                          dst_srs=None, dst_ds=None, options=None):
         """Transform input pixel/line coordinates into lon/lat (or opposite)
@@ -1700,6 +1714,50 @@ class VRT(object):
         gdal.VSIFCloseL(vsi_file)
         return str(vsi_file_content.decode())
 
+    @staticmethod
+    def read_lut_band(band, window, lut):
+        """Read window of a band from <lut:nansat.lut.LUT> (for band_readers of mappers)"""
+        return lut.get_block(*window)
+
+    def vrts_from_luts(self, luts):
+        """Convert input dict with LUTs into dict with full size VRTs
+
+        Each LUT is evaluated on a regular grid of LUT_SAMPLES points per interval between
+        tie points, exactly at the positions where VRT.get_resized_vrt places the source pixels,
+        and the grid is resized to full size with bilinear interpolation. Bands of the VRTs
+        therefore match the band readers (see VRT.read_lut_band) within the error of
+        bilinear interpolation between the samples.
+
+        Parameters
+        ----------
+        luts : dict
+            nansat.lut.LUT objects
+
+        Returns
+        -------
+        vrts : dict with full size VRTs (same keys as in luts)
+
+        """
+        x_size, y_size = self.dataset.RasterXSize, self.dataset.RasterYSize
+        vrts = {}
+        for name, lut in luts.items():
+            rows = self.get_resize_coordinates(lut.rows.size, y_size)
+            cols = self.get_resize_coordinates(lut.cols.size, x_size)
+            vrts[name] = VRT.from_array(lut.get_grid(rows, cols)).get_resized_vrt(x_size,
+                                                                                   y_size, 1)
+        return vrts
+
+    @classmethod
+    def get_resize_coordinates(cls, n_tie_points, size):
+        """Get coordinates of source pixels of a VRT resized to <size> (see VRT.vrts_from_luts)
+
+        VRT.get_resized_vrt maps the centers of the first and the last source pixels to the
+        outer edges of the full size image.
+
+        """
+        n_samples = max(2, min(size, cls.LUT_SAMPLES * (n_tie_points - 1) + 1))
+        return np.arange(n_samples) * size / (n_samples - 1.) - 0.5
+
     @staticmethod
     def _make_source_bands_xml(src_in):
         """Check parameters of band source, set defaults and generate XML for VRT
@@ -1775,10 +1833,13 @@ class VRT(object):
         return options
 
     @staticmethod
-    def _lonlat2gcps(lon, lat, n_gcps=100, **kwargs):
+    def _lonlat2gcps(lon, lat, n_gcps=100, max_error=None, steps=None,
+                     pixel_step=1, line_step=1, pixel_offset=0, line_offset=0, **kwargs):
         """ Create list of GCPs from given grids of latitude and longitude
 
         take <n_gcps> regular pixels from inpt <lat> and <lon> grids
+        If <max_error> is given, add rows and columns of GCPs where the lon/lat grids
+        deviate from linear interpolation between GCPs by more than <max_error>
         Create GCPs from these pixels
         Create latlong GCPs projection
 
@@ -1789,7 +1850,16 @@ class VRT(object):
         lon : Numpy grid
             array of longitudes (should be the same size as lat)
         n_gcps : int, optional, default = 100
-            number of GCPs to create
+            number of GCPs to create on the initial regular grid
+        max_error : float, optional
+            maximum allowed deviation (in meters) of the lon/lat grids from linear
+            interpolation between GCPs. If None, only the regular grid is used.
+        steps : tuple of two int, optional
+            steps of the initial regular grid along rows and columns (override n_gcps)
+        pixel_step, line_step : float
+            step of lon/lat grids in pixels/lines of the dataset
+        pixel_offset, line_offset : float
+            offset of lon/lat grids in pixels/lines of the dataset
 
         Returns
         --------
@@ -1797,21 +1867,89 @@ class VRT(object):
 
         """
         # estimate step of GCPs
-        gcp_size = np.sqrt(n_gcps)
-        step0 = max(1, int(float(lat.shape[0]) / gcp_size))
-        step1 = max(1, int(float(lat.shape[1]) / gcp_size))
+        if steps is None:
+            gcp_size = np.sqrt(n_gcps)
+            steps = (max(1, int(float(lat.shape[0]) / gcp_size)),
+                     max(1, int(float(lat.shape[1]) / gcp_size)))
+        rows = np.arange(0, lat.shape[0], steps[0])
+        cols = np.arange(0, lat.shape[1], steps[1])
+
+        # add rows/columns of GCPs where geometry is not linear enough
+        if max_error is not None:
+            xyz = VRT._lonlat2xyz(lon, lat)
+            rows = VRT._refine_gcp_indices(xyz, np.append(rows, lat.shape[0] - 1), 0, max_error)
+            cols = VRT._refine_gcp_indices(xyz, np.append(cols, lat.shape[1] - 1), 1, max_error)
+
+        # get values at GCPs and keep only valid ones
+        rows, cols = np.meshgrid(rows, cols, indexing='ij')
+        gcp_lon = lon[rows, cols].astype(float).flatten()
+        gcp_lat = lat[rows, cols].astype(float).flatten()
+        gcp_pix = cols.flatten() * pixel_step + pixel_offset
+        gcp_lin = rows.flatten() * line_step + line_offset
+        gpi = (np.isfinite(gcp_lon) * np.isfinite(gcp_lat) *
+               (gcp_lon >= -180) * (gcp_lon <= 360) * (np.abs(gcp_lat) <= 90))
 
         # generate list of GCPs
-        gcps = []
-        k = 0
-        for i0 in range(0, lat.shape[0], step0):
-            for i1 in range(0, lat.shape[1], step1):
-                # create GCP with X,Y,pixel,line from lat/lon matrices
-                gcp = gdal.GCP(float(lon[i0, i1]), float(lat[i0, i1]), 0, i1, i0)
-                gcps.append(gcp)
-                k += 1
-
-        return gcps
+        return [gdal.GCP(x, y, 0, p, l) for x, y, p, l in zip(gcp_lon[gpi].tolist(),
+                                                              gcp_lat[gpi].tolist(),
+                                                              gcp_pix[gpi].tolist(),
+                                                              gcp_lin[gpi].tolist())]
+
+    @staticmethod
+    def _lonlat2xyz(lon, lat):
+        """Convert lon/lat grids into 3D array with cartesian coordinates on unit sphere"""
+        rlon, rlat = np.radians(lon), np.radians(lat)
+        return np.array([np.cos(rlat) * np.cos(rlon),
+                         np.cos(rlat) * np.sin(rlon),
+                         np.sin(rlat)])
+
+    @staticmethod
+    def _refine_gcp_indices(xyz, indices, axis, max_error):
+        """Add indices of GCP rows (or columns) where linear interpolation is not accurate
+
+        The interval between each pair of neighbouring indices is tested in the middle:
+        if cartesian coordinates (free from dateline and pole singularities) deviate from
+        linear interpolation between the pair by more than <max_error> the middle index is
+        added. Testing is repeated for all new intervals until the error is small or the
+        intervals cannot be split anymore.
+
+        Parameters
+        ----------
+        xyz : numpy.ndarray
+            3 x rows x cols array with coordinates on unit sphere
+        indices : numpy.ndarray
+            initial indices of rows (axis=0) or columns (axis=1)
+        axis : int
+            0 for rows, 1 for columns
+        max_error : float
+            maximum allowed deviation in meters
+
+        Returns
+        -------
+        indices : numpy.ndarray
+            sorted unique indices with added rows (or columns)
+
+        """
+        earth_radius = 6371000.
+        indices = np.unique(indices)
+        while True:
+            i0, i1 = indices[:-1], indices[1:]
+            gpi = (i1 - i0) > 1
+            if not gpi.any():
+                break
+            i0, i1 = i0[gpi], i1[gpi]
+            im = (i0 + i1) // 2
+            # shape of weights allows broadcasting along the tested axis
+            w_shape = [1, 1, 1]
+            w_shape[axis + 1] = im.size
+            w = ((im - i0) / (i1 - i0).astype(float)).reshape(w_shape)
+            xyz_lin = (1 - w) * xyz.take(i0, axis=axis + 1) + w * xyz.take(i1, axis=axis + 1)
+            error = np.sqrt(np.sum((xyz.take(im, axis=axis + 1) - xyz_lin) ** 2, axis=0))
+            error = np.nan_to_num(error).max(axis=1 - axis) * earth_radius
+            if not (error > max_error).any():
+                break
+            indices = np.union1d(indices, im[error > max_error])
+        return indices
 
     @staticmethod
     def _put_metadata(raster_band, metadata_dict):